@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core import signing
+from django.utils.crypto import constant_time_compare
+
+from .identity import resolve
+
+User = get_user_model()
+
+DEFERRED = "deferred"
+IMMEDIATE = "immediate"
+
+
+def provisioning_mode():
+    """
+    deferred: حساب‌های خودکار با رمز غیرقابل استفاده ساخته می‌شوند و رمز واقعی
+    هنگام فعال‌سازی تعیین می‌شود. immediate: رفتار قبلی (رمز = کد ملی).
+    """
+    return getattr(settings, "API_ACCOUNT_PROVISIONING", DEFERRED)
+
+
+def provision_user(user_data):
+    """
+    ساخت کاربر برای ثبت‌نام‌های خودکار بدون هزینه هش رمز در حالت deferred.
+    """
+    password = user_data["national_code"] if provisioning_mode() == IMMEDIATE else None
+    # create_user برای رمز None یک رمز غیرقابل استفاده ثبت می‌کند
+    return User.objects.create_user(password=password, **user_data)
+
+
+def get_or_provision_user(user_data):
+    identity = resolve(user_data["national_code"])
+    if identity is not None:
+        return identity.user
+    return provision_user(user_data)
+
+
+ACTIVATION_SALT = "api.accounts.activation"
+
+
+def make_activation_token(user):
+    """
+    توکن امضا شده شامل کد ملی و توکن default_token_generator. امضا و انقضا بدون
+    کوئری بررسی می‌شوند و توکن داخلی پس از تعیین رمز خودبه‌خود باطل می‌شود.
+    """
+    payload = {"n": user.national_code, "t": default_token_generator.make_token(user)}
+    return signing.dumps(payload, salt=ACTIVATION_SALT, compress=True)
+
+
+def read_activation_token(national_code, token):
+    """
+    توکن داخلی اگر امضا معتبر، منقضی نشده و متعلق به همین کد ملی باشد؛ وگرنه None.
+    """
+    try:
+        payload = signing.loads(token, salt=ACTIVATION_SALT, max_age=settings.PASSWORD_RESET_TIMEOUT)
+    except signing.BadSignature:
+        return None
+    if not isinstance(payload, dict) or not constant_time_compare(str(payload.get("n")), national_code):
+        return None
+    return payload.get("t")
+
+
+def activation_user(national_code, token):
+    """
+    کاربر صاحب توکن فعال‌سازی؛ برای کد ملی ناموجود و توکن نامعتبر هر دو None تا
+    پاسخ، ثبت بودن کد ملی را آشکار نکند. پایگاه داده فقط با توکن امضا شده خوانده می‌شود.
+    """
+    inner = read_activation_token(national_code, token)
+    if inner is None:
+        return None
+    user = User.objects.filter(national_code=national_code).first()
+    if user is None or not default_token_generator.check_token(user, inner):
+        return None
+    return user
+
+
+def activate_user(user, password):
+    """
+    تعیین رمز واقعی؛ پس از تغییر رمز، توکن دعوت خودبه‌خود باطل می‌شود.
+    """
+    user.set_password(password)
+    user.save(update_fields=["password"])
@@ -0,0 +1,148 @@
+import math
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .models import patient
+from .pagination import StandardResultsSetPagination
+from .renderers import FastJSONRenderer
+from .representations import ValuesRepresentation
+from .serializers import PatientSerializer
+
+User = get_user_model()
+
+_renderer = FastJSONRenderer()
+
+
+def json_response(data, status=200):
+    return HttpResponse(_renderer.render(data), content_type="application/json", status=status)
+
+
+def _positive_int(value, default, cutoff=None):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return default
+    if number <= 0:
+        return default
+    return min(number, cutoff) if cutoff else number
+
+
+class AsyncAPIView(View):
+    """
+    ویو async با احراز هویت JWT مشابه DRF؛ توکن بدون I/O بررسی و کاربر با ORM
+    async خوانده می‌شود، پس درخواست در ASGI به thread منتقل نمی‌شود.
+    """
+
+    authentication = JWTAuthentication()
+
+    async def authenticate(self, request):
+        header = self.authentication.get_header(request)
+        raw_token = self.authentication.get_raw_token(header) if header else None
+        if raw_token is None:
+            return None
+        validated = self.authentication.get_validated_token(raw_token)
+        user_id = validated[jwt_settings.USER_ID_CLAIM]
+        user = await User.objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).afirst()
+        if user is None or not user.is_active:
+            raise AuthenticationFailed("User not found or inactive", code="user_not_found")
+        return user
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            user = await self.authenticate(request)
+        except AuthenticationFailed as e:
+            detail = e.detail if isinstance(e.detail, dict) else {"detail": e.detail}
+            return json_response(detail, status=401)
+        if user is None:
+            return json_response({"detail": "Authentication credentials were not provided."}, status=401)
+        request.user = user
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncDirectoryView(AsyncAPIView):
+    """
+    نسخه async مسیرهای list و retrieve یک ViewSet دایرکتوری با همان خروجی
+    (نمایش values()، صفحه‌بندی شماره صفحه و ?fields=/?omit=). جستجو، کش پاسخ و
+    درخواست‌های شرطی فقط در نسخه همگام هستند.
+    """
+
+    viewset = None
+    pagination_class = StandardResultsSetPagination
+
+    def get_serializer(self, request):
+        return self.viewset.serializer_class(context={"request": Request(request)})
+
+    async def get(self, request, pk=None):
+        queryset = self.viewset.queryset.all()
+        serializer = self.get_serializer(request)
+        representation = ValuesRepresentation.compile(serializer, queryset.model)
+        if pk is not None:
+            return await self.retrieve(request, queryset.filter(pk=pk), serializer, representation)
+        return await self.list(request, queryset, serializer, representation)
+
+    async def retrieve(self, request, queryset, serializer, representation):
+        if representation is None:
+            instance = await queryset.afirst()
+            data = serializer.to_representation(instance) if instance is not None else None
+        else:
+            row = await queryset.values(*representation.paths).afirst()
+            data = representation.row(row, request) if row is not None else None
+        if data is None:
+            message = f"No {queryset.model._meta.object_name} matches the given query."
+            return json_response({"detail": message}, status=404)
+        return json_response({"ok": True, "data": data})
+
+    async def list(self, request, queryset, serializer, representation):
+        pagination = self.pagination_class
+        page_size = _positive_int(
+            request.GET.get(pagination.page_size_query_param),
+            pagination.page_size,
+            pagination.max_page_size,
+        )
+        total = await queryset.acount()
+        total_pages = max(math.ceil(total / page_size), 1)
+        page = _positive_int(request.GET.get("page", 1), 0)
+        if not 1 <= page <= total_pages:
+            return json_response({"detail": "Invalid page."}, status=404)
+
+        window = slice((page - 1) * page_size, page * page_size)
+        if representation is None:
+            data = [serializer.to_representation(obj) async for obj in queryset[window]]
+        else:
+            rows = queryset.values(*representation.paths)[window]
+            data = [representation.row(row, request) async for row in rows]
+        return json_response(
+            {
+                "ok": True,
+                "data": data,
+                "pagination": {
+                    "total_count": total,
+                    "page_size": page_size,
+                    "current_page": page,
+                    "total_pages": total_pages,
+                },
+            }
+        )
+
+
+class AsyncPatientByNationalCodeView(AsyncAPIView):
+    async def get(self, request, national_code):
+        try:
+            patient_obj = await patient.objects.select_related("national_code").aget(
+                national_code__national_code=national_code
+            )
+        except patient.DoesNotExist:
+            if not await User.objects.filter(national_code=national_code).aexists():
+                return json_response(
+                    {"ok": False, "message": "کاربر با این کد ملی یافت نشد"}, status=404
+                )
+            return json_response(
+                {"ok": False, "message": "این کد ملی متعلق به بیمار نیست"}, status=404
+            )
+        return json_response({"ok": True, "data": PatientSerializer(patient_obj).data})
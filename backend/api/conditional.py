@@ -0,0 +1,150 @@
+import hashlib
+
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+
+
+class ConditionalRequestMixin:
+    """
+    ETag و Last-Modified برای list و retrieve.
+
+    برای retrieve، فقط وقتی درخواست شرطی است (If-None-Match یا If-Modified-Since)
+    updated_at همان رکورد پیش از هر کار دیگری خوانده و 304 برگردانده می‌شود؛ در غیر
+    این صورت اعتبارسنج‌ها از همان نمونه‌ای ساخته می‌شوند که retrieve خوانده است. برای list کوئری جداگانه‌ای اجرا نمی‌شود:
+    ETag از ردیف‌های همان صفحه (شناسه و updated_at) و اطلاعات صفحه‌بندی (از جمله
+    تعداد کل که paginator شمرده است) ساخته می‌شود و 304 پیش از سریالایز کردن
+    برگردانده می‌شود.
+    """
+
+    # فیلدهای FK که تغییر رکورد مرتبط (مثلا کاربر) در خروجی دیده می‌شود
+    conditional_related = ()
+
+    def _version_fields(self):
+        return ["updated_at"] + [f"{name}__updated_at" for name in self.conditional_related]
+
+    def get_list_value_keys(self):
+        return super().get_list_value_keys() + self._version_fields()
+
+    @staticmethod
+    def _row_value(row, path):
+        # ردیف‌های values() کلید مسیر کامل دارند؛ نمونه‌های مدل از select_related خوانده می‌شوند
+        if isinstance(row, dict):
+            return row.get(path)
+        for name in path.split("__"):
+            row = getattr(row, name, None)
+        return row
+
+    def get_page_validators(self, rows):
+        paths = ["pk"] + self._version_fields()
+        values = [[self._row_value(row, path) for path in paths] for row in rows]
+        meta = self.paginator.get_pagination_meta() if self.paginator is not None else None
+        identity = f"{meta}:{[row[0] for row in values]}"
+        return identity, [version for row in values for version in row[1:]]
+
+    def get_object_validators(self, queryset):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        filter_kwargs = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        row = queryset.filter(**filter_kwargs).values_list("pk", *self._version_fields()).first()
+        if row is None:
+            return None, []
+        return str(row[0]), list(row[1:])
+
+    def _instance_versions(self, instance):
+        """
+        مقادیر فیلدهای نسخه از نمونه خوانده شده، یا None اگر خواندن آن‌ها کوئری تازه‌ای
+        لازم دارد (فیلد deferred با only() یا رابطه‌ای که select_related نشده).
+        """
+        versions = []
+        for path in self._version_fields():
+            *relations, name = path.split("__")
+            target = instance
+            for relation in relations:
+                if not target._meta.get_field(relation).is_cached(target):
+                    return None
+                target = getattr(target, relation)
+                if target is None:
+                    break
+            if target is not None and name in target.get_deferred_fields():
+                return None
+            versions.append(getattr(target, name, None))
+        return versions
+
+    def _conditional_validators(self, request, identity, versions):
+        versions = [v for v in versions if v is not None]
+        last_modified = max(versions) if versions else None
+        stamp = ",".join(v.isoformat() for v in versions)
+        digest = hashlib.md5(
+            f"{request.get_full_path()}:{request.accepted_media_type}:{identity}:{stamp}".encode()
+        ).hexdigest()
+        return quote_etag(digest), last_modified
+
+    def _check_conditional(self, request, identity, versions):
+        etag, last_modified = self._conditional_validators(request, identity, versions)
+        self._conditional = (etag, last_modified)
+        if self._is_not_modified(request, etag, last_modified):
+            raise NotModified()
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if self.request.method in ("GET", "HEAD") and self.action == "list":
+            # بدون صفحه‌بندی، list همین queryset ارزیابی شده را سریالایز می‌کند
+            rows = page if page is not None else queryset
+            self._check_conditional(self.request, *self.get_page_validators(rows))
+        return page
+
+    def _is_not_modified(self, request, etag, last_modified):
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return etag in etags or "*" in etags
+        # برای لیست‌ها حذف رکورد زمان تغییر را جلو نمی‌برد؛ پس فقط ETag معتبر است
+        if self.action == "retrieve" and last_modified is not None:
+            since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+            return since is not None and int(last_modified.timestamp()) <= since
+        return False
+
+    def _is_conditional(self, request):
+        return bool(request.headers.get("If-None-Match") or request.headers.get("If-Modified-Since"))
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._conditional = None
+        if request.method not in ("GET", "HEAD") or self.action != "retrieve":
+            return
+        if not self._is_conditional(request):
+            # اعتبارسنج‌ها در get_object از همان رکورد ساخته می‌شوند
+            return
+        identity, versions = self.get_object_validators(self.filter_queryset(self.get_queryset()))
+        if identity is not None:
+            self._check_conditional(request, identity, versions)
+
+    def get_object(self):
+        instance = super().get_object()
+        if self.request.method in ("GET", "HEAD") and self.action == "retrieve" and self._conditional is None:
+            versions = self._instance_versions(instance)
+            if versions is None:
+                identity, versions = self.get_object_validators(self.filter_queryset(self.get_queryset()))
+            else:
+                identity = str(instance.pk)
+            self._conditional = self._conditional_validators(self.request, identity, versions)
+        return instance
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        conditional = getattr(self, "_conditional", None)
+        if conditional is not None and response.status_code in (200, 304):
+            etag, last_modified = conditional
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified.timestamp())
+        return super().finalize_response(request, response, *args, **kwargs)
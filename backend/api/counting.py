@@ -0,0 +1,128 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+
+def _cache():
+    return caches[getattr(settings, "API_COUNT_CACHE_ALIAS", "default")]
+
+
+def _generation_key(model):
+    return f"api:count-gen:{model._meta.label_lower}"
+
+
+def invalidate_model_counts(model):
+    """
+    با افزایش شماره نسل، همه شمارش‌های کش شده یک مدل باطل می‌شوند.
+    """
+    key = _generation_key(model)
+    try:
+        _cache().incr(key)
+    except ValueError:
+        _cache().set(key, 1, None)
+
+
+class ExactCount:
+    def count(self, queryset):
+        return queryset.count()
+
+
+class CachedCount(ExactCount):
+    """
+    شمارش دقیق که برای مدت ttl ثانیه کش می‌شود و با ایجاد/حذف رکورد باطل می‌گردد.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+
+    def count(self, queryset):
+        try:
+            sql = str(queryset.query)
+        except Exception:
+            return super().count(queryset)
+
+        cache = _cache()
+        generation = cache.get_or_set(_generation_key(queryset.model), 1, None)
+        digest = hashlib.md5(f"{queryset.db}:{sql}".encode()).hexdigest()
+        key = f"api:count:{queryset.model._meta.label_lower}:{generation}:{digest}"
+        value = cache.get(key)
+        if value is None:
+            value = super().count(queryset)
+            cache.set(key, value, self.ttl)
+        return value
+
+
+class EstimatedCount(ExactCount):
+    """
+    تخمین تعداد ردیف‌ها از آمار جدول (pg_class / sqlite_stat1 / information_schema).
+    برای کوئری‌های فیلتر شده، جداول کوچک یا نبود آمار به شمارش دقیق برمی‌گردد.
+    """
+
+    def __init__(self, threshold=1000):
+        self.threshold = threshold
+
+    def count(self, queryset):
+        if queryset.query.has_filters() or queryset.query.distinct:
+            return super().count(queryset)
+        estimate = self.table_estimate(queryset.model, queryset.db)
+        if estimate is None or estimate < self.threshold:
+            return super().count(queryset)
+        return estimate
+
+    def table_estimate(self, model, using):
+        connection = connections[using]
+        table = model._meta.db_table
+        if connection.vendor == "postgresql":
+            sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass"
+        elif connection.vendor == "sqlite":
+            sql = "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1"
+        elif connection.vendor == "mysql":
+            sql = (
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s"
+            )
+        else:
+            return None
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [table])
+                row = cursor.fetchone()
+        except DatabaseError:
+            return None
+        if not row or row[0] is None:
+            return None
+        # در sqlite_stat1 اولین عدد ستون stat تعداد ردیف‌هاست
+        value = int(str(row[0]).split()[0])
+        return value if value >= 0 else None
+
+
+COUNT_STRATEGIES = {
+    "exact": ExactCount,
+    "cached": CachedCount,
+    "estimate": EstimatedCount,
+}
+
+
+def get_count_strategy(strategy):
+    if strategy is None:
+        return ExactCount()
+    if isinstance(strategy, str):
+        return COUNT_STRATEGIES[strategy]()
+    return strategy
+
+
+class StrategyPaginator(Paginator):
+    def __init__(self, *args, count_strategy=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_strategy = count_strategy
+
+    @cached_property
+    def count(self):
+        if self.count_strategy is None or not hasattr(self.object_list, "query"):
+            return super().count
+        return self.count_strategy.count(self.object_list)
@@ -0,0 +1,107 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from . import metrics
+
+PRIMARY = "default"
+
+# فقط درخواست‌های خواندنی که به primary سنجاق نشده‌اند از replica می‌خوانند؛
+# بیرون از درخواست (دستورات مدیریتی، سیگنال‌ها) همیشه primary استفاده می‌شود
+_read_from_replica = ContextVar("api_read_from_replica", default=False)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != PRIMARY]
+
+
+@contextmanager
+def read_from_replicas(enabled=True):
+    token = _read_from_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    خواندن از یکی از replicaها در درخواست‌های GET/HEAD/OPTIONS و نوشتن همیشه در
+    primary. داخل تراکنش باز روی primary، خواندن‌ها هم از primary است تا داده‌های
+    commit نشده همان تراکنش دیده شوند.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if not replicas or not _read_from_replica.get():
+            return PRIMARY
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {PRIMARY, *replica_aliases()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicaها از primary تکثیر می‌شوند و جدول جداگانه‌ای نمی‌سازند
+        return db == PRIMARY
+
+
+def _heartbeat(alias):
+    from .models import ReplicaHeartbeat
+
+    return ReplicaHeartbeat.objects.using(alias).filter(pk=1).values_list("beat_at", flat=True).first()
+
+
+def beat():
+    """
+    به‌روزرسانی ردیف heartbeat روی primary (بدون سیگنال‌های save).
+    """
+    from .models import ReplicaHeartbeat
+
+    now = timezone.now()
+    if not ReplicaHeartbeat.objects.using(PRIMARY).filter(pk=1).update(beat_at=now):
+        ReplicaHeartbeat.objects.using(PRIMARY).bulk_create([ReplicaHeartbeat(pk=1, beat_at=now)])
+    return now
+
+
+def replica_lag(alias):
+    """
+    تاخیر replica به ثانیه. PostgreSQL از زمان آخرین تراکنش اعمال شده و بقیه از
+    اختلاف heartbeat با primary استفاده می‌کنند؛ بدون heartbeat مقدار None است.
+    """
+    connection = connections[alias]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+                " ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+            )
+            return float(cursor.fetchone()[0] or 0)
+    primary_beat, replica_beat = _heartbeat(PRIMARY), _heartbeat(alias)
+    if primary_beat is None or replica_beat is None:
+        return None
+    return max((primary_beat - replica_beat).total_seconds(), 0.0)
+
+
+def replica_lags():
+    # فقط خواندن؛ heartbeat را دستور replica_heartbeat (یا sync_sqlite_replicas) می‌نویسد
+    lags = {}
+    for alias in replica_aliases():
+        lag = replica_lag(alias)
+        if lag is not None:
+            lags[(alias,)] = lag
+    return lags
+
+
+metrics.registry.scrape_callback(metrics.REPLICA_LAG, replica_lags)
@@ -0,0 +1,122 @@
+import csv
+import tempfile
+from datetime import date, datetime
+
+from django.contrib.auth import get_user_model
+from django.http import FileResponse, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+User = get_user_model()
+
+# فیلدهای کاربر که برای رکوردهای وابسته به کاربر در خروجی join می‌شوند
+USER_EXPORT_FIELDS = (
+    "first_name", "last_name", "phone_number", "gender", "state", "city",
+    "county", "homeAddress", "education", "userType",
+)
+EXPORT_FORMATS = ("csv", "xlsx")
+CHUNK_SIZE = 2000
+
+
+def export_columns(model):
+    """
+    ستون‌های خروجی به صورت (عنوان، مسیر values) ؛ فیلدهای کاربر با join خوانده می‌شوند.
+    """
+    columns = []
+    for field in model._meta.concrete_fields:
+        if field.is_relation and field.related_model is User:
+            columns.append((field.name, f"{field.name}__national_code"))
+            columns += [(f"user_{name}", f"{field.name}__{name}") for name in USER_EXPORT_FIELDS]
+        elif field.is_relation:
+            columns.append((field.name, field.attname))
+        else:
+            columns.append((field.name, field.name))
+    return columns
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def iter_rows(queryset):
+    """
+    سطرها به صورت جریانی با cursor سمت سرور (در Postgres) و بدون ساخت نمونه مدل.
+    """
+    columns = export_columns(queryset.model)
+    yield [title for title, _ in columns]
+    rows = queryset.values_list(*[path for _, path in columns])
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield [_cell(value) for value in row]
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def iter_csv(queryset):
+    writer = csv.writer(_Echo())
+    # BOM برای نمایش درست متن فارسی در Excel
+    yield "\ufeff"
+    for row in iter_rows(queryset):
+        yield writer.writerow(row)
+
+
+def write_csv(queryset, stream):
+    for line in iter_csv(queryset):
+        stream.write(line)
+
+
+def write_xlsx(queryset, stream):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(queryset.model._meta.model_name)
+    for row in iter_rows(queryset):
+        sheet.append(row)
+    workbook.save(stream)
+
+
+def export_response(queryset, filename, file_format):
+    if file_format == "xlsx":
+        # حالت write_only در openpyxl سطرها را روی دیسک نگه می‌دارد نه حافظه
+        buffer = tempfile.TemporaryFile()
+        write_xlsx(queryset, buffer)
+        buffer.seek(0)
+        return FileResponse(buffer, as_attachment=True, filename=f"{filename}.xlsx")
+
+    response = StreamingHttpResponse(iter_csv(queryset), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+class ExportMixin:
+    """
+    افزودن اکشن GET .../export/?file_format=csv|xlsx به ViewSet؛ فیلتر جستجو اعمال می‌شود.
+    """
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request, *args, **kwargs):
+        file_format = request.query_params.get("file_format", "csv")
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {"ok": False, "message": f"فرمت خروجی باید یکی از {', '.join(EXPORT_FORMATS)} باشد"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if file_format == "xlsx":
+            try:
+                import openpyxl  # noqa: F401
+            except ImportError:
+                return Response(
+                    {"ok": False, "message": "خروجی XLSX نیازمند نصب openpyxl است"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        queryset = self.filter_queryset(self.get_queryset())
+        filename = queryset.model._meta.model_name
+        return export_response(queryset, filename, file_format)
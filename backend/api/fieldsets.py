@@ -0,0 +1,117 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+def _requested(request, name):
+    value = request.query_params.get(name, "") if request is not None else ""
+    return {item.strip() for item in value.split(",") if item.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    انتخاب فیلدهای خروجی با ?fields=a,b یا حذف آنها با ?omit=c فقط برای درخواست‌های
+    خواندنی. فیلدهای ناشناخته نادیده گرفته می‌شوند.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if request is None or request.method not in ("GET", "HEAD"):
+            return
+        # سریالایزرهای تو در تو (مثل user) context درخواست را در سازنده ندارند
+        fields, omit = _requested(request, "fields"), _requested(request, "omit")
+        if fields:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+        for name in omit & set(self.fields):
+            self.fields.pop(name)
+
+
+def _column(model, attrs):
+    """
+    نام ستون قابل استفاده در only() برای مسیر source؛ None اگر فیلد ذخیره شده نباشد.
+    """
+    try:
+        field = model._meta.get_field(attrs[0])
+    except FieldDoesNotExist:
+        return None
+    if not field.concrete or field.many_to_many:
+        return None
+    return field
+
+
+def serializer_columns(serializer, model):
+    """
+    ستون‌های مورد نیاز سریالایزر به شکل مسیرهای only()؛ None اگر فیلدی مقدار خود را از
+    متد، property یا کل شیء (source='*') بخواند و محدود کردن ستون‌ها امن نباشد.
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    columns = [model._meta.pk.name]
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        attrs = field.source_attrs
+        if not attrs or isinstance(field, serializers.SerializerMethodField):
+            return None
+        model_field = _column(model, attrs)
+        if model_field is None:
+            return None
+        if not model_field.is_relation:
+            if len(attrs) > 1:
+                return None
+            columns.append(model_field.name)
+            continue
+        if isinstance(field, serializers.ModelSerializer):
+            nested = serializer_columns(field, model_field.related_model)
+            if nested is None:
+                columns.append(model_field.name)
+            else:
+                columns += [f"{model_field.name}__{column}" for column in nested]
+        elif len(attrs) == 1:
+            columns.append(model_field.name)
+        else:
+            return None
+    return columns
+
+
+class SparseQuerysetMixin:
+    """
+    محدود کردن ستون‌های خوانده شده با only() بر اساس فیلدهای باقی مانده در سریالایزر،
+    تا ستون‌های درخواست نشده (مثلا متن‌های طولانی) از پایگاه داده خوانده نشوند.
+    """
+
+    sparse_actions = ("list", "retrieve")
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = getattr(self, "request", None)
+        if getattr(self, "action", None) not in self.sparse_actions or not (
+            _requested(request, "fields") or _requested(request, "omit")
+        ):
+            return queryset
+
+        columns = serializer_columns(self.get_serializer(), queryset.model)
+        if columns is None:
+            return queryset
+        # فیلدهای مرتب‌سازی برای صفحه‌بندی cursor لازم‌اند
+        columns += [
+            name.lstrip("-")
+            for name in queryset.query.order_by
+            if isinstance(name, str) and "__" not in name
+        ]
+
+        select_related = queryset.query.select_related
+        joined = set(select_related) if isinstance(select_related, dict) else set()
+        # ستون‌های مدل مرتبط فقط وقتی معنا دارند که رابطه با join خوانده شود
+        columns = [
+            column if column.split("__", 1)[0] in joined else column.split("__", 1)[0]
+            for column in columns
+        ]
+        # select_related برای رابطه‌ای که خوانده نمی‌شود با only() ناسازگار است
+        relations = {column.split("__", 1)[0] for column in columns if "__" in column}
+        if joined - relations:
+            queryset = queryset.select_related(None)
+            if relations:
+                queryset = queryset.select_related(*relations)
+        return queryset.only(*dict.fromkeys(columns))
@@ -0,0 +1,217 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import OuterRef, Subquery
+
+from .db_router import read_from_replicas
+from .models import benefactorPerson, doctor, healthAssistPerson, patient
+from .response_cache import is_shared_cache
+
+User = get_user_model()
+
+# نقش‌هایی که با کد ملی به کاربر متصل‌اند؛ کلید همان نام نقش در پاسخ است
+ROLE_MODELS = {
+    "patient": patient,
+    "doctor": doctor,
+    "benefactor": benefactorPerson,
+    "health_assist": healthAssistPerson,
+}
+USER_FIELDS = ("id", "national_code", "first_name", "last_name", "userType", "is_active")
+
+
+# مقادیر پیش‌فرض؛ با API_IDENTITY_CACHE در settings قابل تغییرند
+DEFAULTS = {
+    "alias": "default",
+    "timeout": 300,
+    "local_size": 1024,
+    "local_ttl": 5,
+}
+
+
+def _setting(name):
+    return getattr(settings, "API_IDENTITY_CACHE", {}).get(name, DEFAULTS[name])
+
+
+def max_lookup_codes():
+    return getattr(settings, "API_LOOKUP_MAX_CODES", 500)
+
+
+def _role_subquery(model):
+    """
+    شناسه آخرین پروفایل نقش برای کاربر بیرونی؛ ستون مقصد از خود ForeignKey خوانده
+    می‌شود تا با to_field یا بدون آن درست بماند.
+    """
+    field = model._meta.get_field("national_code")
+    profiles = model.objects.filter(**{field.name: OuterRef(field.target_field.attname)})
+    return Subquery(profiles.order_by("-created_at", "-pk").values("pk")[:1])
+
+
+def with_roles(queryset):
+    return queryset.annotate(
+        **{f"{role}_id": _role_subquery(model) for role, model in ROLE_MODELS.items()}
+    )
+
+
+def _identity(row):
+    return {
+        "user": {name: row[name] for name in USER_FIELDS},
+        "roles": {role: row[f"{role}_id"] for role in ROLE_MODELS},
+    }
+
+
+def lookup_national_codes(codes):
+    """
+    کاربر و شناسه آخرین پروفایل هر نقش برای چند کد ملی در یک کوئری (زیرکوئری برای هر نقش).
+    خروجی: {"found": {کد: {"user", "roles"}}, "missing": [کد]} به ترتیب ورودی.
+    """
+    codes = list(dict.fromkeys(codes))
+    rows = with_roles(User.objects.filter(national_code__in=codes)).values(
+        *USER_FIELDS, *(f"{role}_id" for role in ROLE_MODELS)
+    )
+    by_code = {row["national_code"]: _identity(row) for row in rows}
+    return {
+        "found": {code: by_code[code] for code in codes if code in by_code},
+        "missing": [code for code in codes if code not in by_code],
+    }
+
+
+class Identity:
+    """
+    کاربر یک کد ملی به همراه شناسه پروفایل‌های نقش او (یا None).
+    """
+
+    def __init__(self, user, roles):
+        self.user = user
+        self.roles = roles
+
+    def has_role(self, role):
+        return self.roles.get(role) is not None
+
+
+class LocalIdentityCache:
+    """
+    LRU محدود درون فرایند. عمر کوتاه ورودی‌ها کهنگی بین فرایندها را محدود می‌کند؛
+    باطل‌سازی صریح فقط در همین فرایند و در کش مشترک انجام می‌شود.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalIdentityCache(_setting("local_size"), _setting("local_ttl"))
+
+
+def _shared():
+    """
+    کش مشترک بین workerها؛ None اگر backend محلی هر فرایند باشد، چون حذف کلید در یک
+    worker به بقیه نمی‌رسد و تنها LRU کوتاه‌مدت فرایند باقی می‌ماند.
+    """
+    alias = _setting("alias")
+    return caches[alias] if is_shared_cache(alias) else None
+
+
+def _key(national_code):
+    return f"api:identity:{national_code}"
+
+
+# رمز عبور در کش نگهداری نمی‌شود و در صورت نیاز از پایگاه داده خوانده می‌شود
+_CACHED_USER_FIELDS = [f.attname for f in User._meta.concrete_fields if f.attname != "password"]
+
+
+def _load(national_code):
+    # آنچه کش می‌شود از primary خوانده می‌شود تا داده قدیمی replica پس از باطل‌سازی
+    # دوباره در کش ننشیند
+    with read_from_replicas(False):
+        user = (
+            with_roles(User.objects.filter(national_code=national_code))
+            .only(*_CACHED_USER_FIELDS)
+            .first()
+        )
+    if user is None:
+        return None
+    roles = {role: user.__dict__.pop(f"{role}_id") for role in ROLE_MODELS}
+    return {"user": [getattr(user, name) for name in _CACHED_USER_FIELDS], "roles": roles}
+
+
+def _build(payload):
+    user = User.from_db("default", _CACHED_USER_FIELDS, payload["user"])
+    return Identity(user, payload["roles"])
+
+
+def resolve(national_code):
+    """
+    Identity برای کد ملی یا None: ابتدا LRU فرایند، سپس کش مشترک و در نهایت یک
+    کوئری که کاربر و نقش‌ها را با هم می‌خواند. کدهای ناموجود کش نمی‌شوند.
+    """
+    payload = local_cache.get(national_code)
+    if payload is None:
+        shared = _shared()
+        payload = shared.get(_key(national_code)) if shared is not None else None
+        if payload is None:
+            payload = _load(national_code)
+            if payload is None:
+                return None
+            if shared is not None:
+                shared.set(_key(national_code), payload, _setting("timeout"))
+        local_cache.set(national_code, payload)
+    # نمونه جدید برای هر فراخوانی تا تغییرات یک درخواست به درخواست دیگر نرسد
+    return _build(payload)
+
+
+def invalidate_identity(national_code):
+    local_cache.discard(national_code)
+    shared = _shared()
+    if shared is not None:
+        shared.delete(_key(national_code))
+
+
+def national_code_of(instance):
+    """
+    کد ملی کاربر یا پروفایل نقش، برای باطل‌سازی کش؛ None اگر کاربر دیگر وجود نداشته باشد.
+    """
+    if isinstance(instance, User):
+        return instance.national_code
+    field = instance._meta.get_field("national_code")
+    if field.target_field.name == "national_code":
+        return getattr(instance, field.attname)
+    try:
+        return getattr(instance, field.name).national_code
+    except ObjectDoesNotExist:
+        return None
@@ -0,0 +1,219 @@
+import csv
+import io
+import os
+from functools import partial
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.serializers import as_serializer_error
+
+from .counting import invalidate_model_counts
+from .identity import invalidate_identity
+from .models import benefactorPerson, patient
+from .serializers import BenefactorPersonSerializer, PatientSerializer, pop_user_data
+
+User = get_user_model()
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def read_rows(fileobj, filename):
+    """
+    ردیف‌های فایل CSV یا XLSX را به صورت جریانی و به شکل دیکشنری برمی‌گرداند.
+    """
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension == ".xlsx":
+        return _read_xlsx(fileobj)
+    if extension in (".csv", ""):
+        return _read_csv(fileobj)
+    raise ImportFormatError(f"Unsupported file type: {extension}")
+
+
+def _read_csv(fileobj):
+    if isinstance(fileobj, io.TextIOBase):
+        text = fileobj
+    else:
+        text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    for row in csv.DictReader(text):
+        yield {key.strip(): value for key, value in row.items() if key}
+
+
+def _read_xlsx(fileobj):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFormatError("XLSX import requires the openpyxl package")
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else "" for cell in next(rows, ())]
+        for values in rows:
+            if not any(value is not None for value in values):
+                continue
+            yield {
+                key: ("" if value is None else value)
+                for key, value in zip(header, values)
+                if key
+            }
+    finally:
+        workbook.close()
+
+
+class BulkImporter:
+    """
+    ثبت گروهی پروفایل‌های شخص.
+
+    هر ردیف با سریالایزر ثبت همان منبع اعتبارسنجی می‌شود؛ سپس در هر دسته
+    کاربران موجود با یک کوئری بر اساس کد ملی پیدا شده و کاربران و پروفایل‌های
+    جدید با bulk_create ساخته می‌شوند. کاربران جدید رمز عبور غیرقابل استفاده
+    دارند تا هزینه هش رمز برای هر ردیف پرداخت نشود.
+    """
+
+    def __init__(self, model, serializer_class, chunk_size=500):
+        self.model = model
+        self.serializer_class = serializer_class
+        self.chunk_size = chunk_size
+
+    def run(self, rows):
+        report = {"total_rows": 0, "created": 0, "users_created": 0, "failed": 0, "errors": []}
+        # شماره ردیف با احتساب سطر عنوان
+        numbered = enumerate(rows, start=2)
+        # یک نمونه سریالایزر برای همه ردیف‌ها تا فیلدها فقط یک بار ساخته شوند
+        validator = self.serializer_class()
+        while True:
+            chunk = list(islice(numbered, self.chunk_size))
+            if not chunk:
+                break
+            report["total_rows"] += len(chunk)
+            valid = []
+            for row_number, row in chunk:
+                try:
+                    valid.append((row_number, dict(validator.run_validation(row))))
+                except ValidationError as e:
+                    self._fail(report, row_number, as_serializer_error(e))
+            if valid:
+                self._import_chunk(valid, report)
+
+        if report["created"]:
+            invalidate_model_counts(self.model)
+        if report["users_created"]:
+            invalidate_model_counts(User)
+        return report
+
+    def _fail(self, report, row_number, errors):
+        report["failed"] += 1
+        report["errors"].append({"row": row_number, "errors": errors})
+
+    def _import_chunk(self, valid, report):
+        codes = {data["national_code"] for _, data in valid}
+        users = {
+            user.national_code: user
+            for user in User.objects.filter(national_code__in=codes).only("id", "national_code")
+        }
+
+        new_users = {}
+        profiles = []
+        for row_number, data in valid:
+            user_data = pop_user_data(data)
+            code = user_data["national_code"]
+            if code not in users and code not in new_users:
+                user = User(**user_data)
+                user.set_unusable_password()
+                new_users[code] = user
+            profiles.append((row_number, code, data))
+
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(new_users.values(), batch_size=self.chunk_size)
+                users.update(new_users)
+                self.model.objects.bulk_create(
+                    [self.model(national_code=users[code], **data) for _, code, data in profiles],
+                    batch_size=self.chunk_size,
+                )
+        except IntegrityError:
+            # برخورد با رکوردهای موجود (مثلا نام کاربری تکراری)؛ ثبت تک‌تک برای گزارش دقیق
+            self._import_rows(profiles, new_users, users, report)
+            return
+
+        report["users_created"] += len(new_users)
+        report["created"] += len(profiles)
+        self._invalidate_identities(code for _, code, _ in profiles)
+
+    @staticmethod
+    def _invalidate_identities(codes):
+        # bulk_create سیگنال post_save ندارد؛ نقش‌های کش شده این کدها پس از commit پاک می‌شوند
+        for code in set(codes):
+            transaction.on_commit(partial(invalidate_identity, code))
+
+    def _import_rows(self, profiles, new_users, users, report):
+        for code in new_users:
+            users.pop(code, None)
+        for row_number, code, data in profiles:
+            try:
+                with transaction.atomic():
+                    user = users.get(code)
+                    if user is None:
+                        user = new_users[code]
+                        user.pk = None
+                        user.save()
+                        users[code] = user
+                        report["users_created"] += 1
+                    self.model.objects.create(national_code=user, **data)
+                report["created"] += 1
+                self._invalidate_identities([code])
+            except IntegrityError as e:
+                self._fail(report, row_number, {"error": str(e)})
+
+
+IMPORTERS = {
+    "patients": (patient, PatientSerializer),
+    "benefactors": (benefactorPerson, BenefactorPersonSerializer),
+}
+
+
+def get_importer(resource, chunk_size=500):
+    model, serializer_class = IMPORTERS[resource]
+    return BulkImporter(model, serializer_class, chunk_size=chunk_size)
+
+
+class BulkImportMixin:
+    """
+    افزودن اکشن POST .../import/ به ViewSet برای بارگذاری فایل CSV/XLSX در فیلد file.
+    """
+
+    import_resource = None
+
+    @action(detail=False, methods=["post"], url_path="import", parser_classes=[MultiPartParser])
+    def bulk_import(self, request, *args, **kwargs):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"ok": False, "message": "فایل (file) ارسال نشده است"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            rows = read_rows(upload, upload.name)
+            report = get_importer(self.import_resource).run(rows)
+        except ImportFormatError as e:
+            return Response(
+                {"ok": False, "message": f"خطا در خواندن فایل: {e}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            {
+                "ok": report["failed"] == 0,
+                "data": report,
+                "message": f"{report['created']} رکورد از {report['total_rows']} ردیف ثبت شد",
+            }
+        )
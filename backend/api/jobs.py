@@ -0,0 +1,107 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from . import metrics
+from .models import Job
+
+logger = logging.getLogger("api.jobs")
+
+# kind -> تابع اجرا کننده؛ با دکوراتور job ثبت می‌شود
+HANDLERS = {}
+
+# مقادیر پیش‌فرض؛ با API_JOBS در settings قابل تغییرند
+DEFAULTS = {
+    "max_attempts": 3,
+    "retry_delay": 30,
+    "lock_timeout": 600,
+    "poll_interval": 1.0,
+}
+
+
+def job_setting(name):
+    return getattr(settings, "API_JOBS", {}).get(name, DEFAULTS[name])
+
+
+def job(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+
+    return register
+
+
+def enqueue(kind, **payload):
+    """
+    ثبت کار در همان تراکنش جاری؛ اگر تراکنش برگردد کار هم ثبت نمی‌شود.
+    """
+    return Job.objects.create(kind=kind, payload=payload)
+
+
+def pending_count(kind=None):
+    jobs = Job.objects.filter(status__in=[Job.PENDING, Job.RUNNING])
+    if kind is not None:
+        jobs = jobs.filter(kind=kind)
+    return jobs.count()
+
+
+def requeue_stale():
+    """
+    کارهایی که worker آن‌ها پیش از پایان متوقف شده دوباره در صف قرار می‌گیرند.
+    """
+    cutoff = timezone.now() - timedelta(seconds=job_setting("lock_timeout"))
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff).update(
+        status=Job.PENDING, locked_at=None
+    )
+
+
+def claim(batch=10):
+    """
+    برداشتن قدیمی‌ترین کار آماده. به‌روزرسانی شرطی تضمین می‌کند که هر کار فقط به
+    یک worker برسد، بدون نیاز به SELECT ... FOR UPDATE (که SQLite ندارد).
+    """
+    now = timezone.now()
+    ready = Job.objects.filter(status=Job.PENDING, run_after__lte=now).order_by("run_after", "pk")
+    for pk in ready.values_list("pk", flat=True)[:batch]:
+        claimed = Job.objects.filter(pk=pk, status=Job.PENDING).update(
+            status=Job.RUNNING, locked_at=now, attempts=F("attempts") + 1
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run(job):
+    labels = {"kind": job.kind}
+    try:
+        handler = HANDLERS.get(job.kind)
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind {job.kind!r}")
+        handler(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job_setting("max_attempts"):
+            # تاخیر هر تلاش دو برابر تلاش قبلی
+            delay = job_setting("retry_delay") * 2 ** (job.attempts - 1)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.PENDING,
+                locked_at=None,
+                run_after=timezone.now() + timedelta(seconds=delay),
+                last_error=error,
+            )
+            result = "retry"
+        else:
+            Job.objects.filter(pk=job.pk).update(status=Job.FAILED, locked_at=None, last_error=error)
+            result = "failed"
+        logger.warning(
+            "job failed", extra={"job": job.pk, "kind": job.kind, "attempt": job.attempts, "error": error}
+        )
+    else:
+        Job.objects.filter(pk=job.pk).delete()
+        result = "done"
+    metrics.registry.inc(metrics.JOBS, dict(labels, result=result))
+    return result
@@ -0,0 +1,198 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from . import metrics
+
+# کلیدهایی که مقدارشان هرگز نباید در لاگ نوشته شود
+REDACTED_KEYS = frozenset(
+    {
+        "national_code", "presenterNationalCode", "bankCardNumber", "password",
+        "phone_number", "lineNumber", "familiar1PhoneNumber", "familiar2PhoneNumber",
+    }
+)
+REDACTED = "***"
+
+# کارت بانکی ۱۶ رقمی، موبایل (09xxxxxxxxx یا +989xxxxxxxxx) و کد ملی ۱۰ رقمی داخل متن آزاد
+_SENSITIVE_RE = re.compile(r"(?<!\d)(?:\d{4}[- ]?\d{4}[- ]?\d{4}[- ]?\d{4}|(?:\+98|0098|0)9\d{9}|\d{10})(?!\d)")
+
+# ویژگی‌های استاندارد LogRecord؛ بقیه از extra آمده‌اند و به صورت فیلد JSON نوشته می‌شوند
+_RECORD_ATTRS = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", (), None)).keys() | {"message", "asctime"}
+)
+
+
+def redact_text(value):
+    return _SENSITIVE_RE.sub(REDACTED, value)
+
+
+def redact(value, key=None):
+    """
+    حذف مقادیر حساس از داده‌های تو در تو پیش از ثبت در لاگ.
+    """
+    if key in REDACTED_KEYS:
+        return REDACTED
+    if isinstance(value, dict):
+        return {k: redact(v, k) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    if isinstance(value, str):
+        return redact_text(value)
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if hasattr(value, "method") and hasattr(value, "path"):
+        # HttpRequest که django.request به عنوان extra می‌فرستد
+        return f"{value.method} {value.path}"
+    if hasattr(value, "read"):
+        # فایل‌های آپلود شده فقط با نام و حجم ثبت می‌شوند
+        return {"file": getattr(value, "name", None), "size": getattr(value, "size", None)}
+    return redact_text(str(value))
+
+
+def summarize_payload(data):
+    """
+    خلاصه امن request.data: نام فیلدها و فایل‌ها بدون مقدار.
+    """
+    keys = list(data.keys()) if hasattr(data, "keys") else []
+    files = [k for k in keys if hasattr(data.get(k), "read")]
+    return {"fields": sorted(k for k in keys if k not in files), "files": sorted(files)}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    هر رکورد در یک خط JSON؛ فیلدهای extra و متن پیام پیش از نوشتن پاک‌سازی می‌شوند.
+    """
+
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact_text(record.getMessage()),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = redact(value, key)
+        if record.exc_info:
+            payload["exc"] = redact_text(self.formatException(record.exc_info))
+        elif record.exc_text:
+            payload["exc"] = redact_text(record.exc_text)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    نمونه‌برداری از رکوردهای پرتکرار زیر سطح WARNING؛ هشدارها و خطاها همیشه ثبت می‌شوند.
+    """
+
+    def __init__(self, rate=1.0, level=logging.WARNING, name=""):
+        super().__init__(name)
+        self.rate = float(rate)
+        self.level = logging._checkLevel(level)
+
+    def filter(self, record):
+        if record.levelno >= self.level or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    نوشتن لاگ در یک صف محدود و خالی کردن آن در thread جداگانه، تا workerها
+    پشت stdout منتظر نمانند. اگر صف پر باشد رکورد کنار گذاشته، در متریک
+    api_log_records_dropped_total شمرده و تعداد آن با اولین رکورد بعدی گزارش می‌شود.
+
+    thread شنونده در fork (مثلا gunicorn --preload) به فرزند منتقل نمی‌شود؛ فرزند صف
+    تازه‌ای می‌گیرد و شنونده خود را با اولین رکورد راه می‌اندازد.
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._unreported = 0
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._ensure_listener()
+        atexit.register(self._stop_listener)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self.listener = QueueListener(self.queue, self.target, respect_handler_level=False)
+                self.listener.start()
+                self._pid = os.getpid()
+
+    def _after_fork(self):
+        # رکوردهای مانده در صف را پروسه والد می‌نویسد؛ قفل‌های صف هم ممکن است هنگام
+        # fork در اختیار thread شنونده والد بوده باشند
+        self.queue = queue.Queue(self.maxsize)
+        self.listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._unreported = 0
+
+    def setFormatter(self, fmt):
+        # قالب‌بندی JSON در thread شنونده انجام می‌شود
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # پیام با args ترکیب می‌شود تا اشیای قابل تغییر در صف باقی نمانند
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+            metrics.registry.inc(metrics.LOG_DROPPED)
+            return
+        if self._unreported:
+            self._report_dropped()
+
+    def _report_dropped(self):
+        dropped, self._unreported = self._unreported, 0
+        report = logging.LogRecord(
+            "api.log", logging.WARNING, __file__, 0, "log records dropped, queue was full", None, None
+        )
+        report.dropped = dropped
+        try:
+            self.queue.put_nowait(report)
+        except queue.Full:
+            self._unreported += dropped
+
+    def _stop_listener(self):
+        if self._pid != os.getpid() or self.listener._thread is None:
+            return
+        # QueueListener.stop با صف پر خطای queue.Full می‌دهد؛ sentinel با انتظار گذاشته می‌شود
+        # تا شنونده رکوردهای مانده را بنویسد و جا باز کند
+        self.queue.put(self.listener._sentinel)
+        self.listener._thread.join()
+        self.listener._thread = None
+
+    def close(self):
+        self._stop_listener()
+        super().close()
@@ -0,0 +1,138 @@
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .loadtest import benchmark_user, percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests/sec and p99 latency of the sync endpoints under WSGI (thread "
+        "pool, like gunicorn gthread) with the async endpoints under ASGI (one event "
+        "loop, like uvicorn), both driven in-process by the same number of concurrent "
+        "clients. Latency includes the time a client waits for a free worker thread."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--wsgi-url", default="/api/service-centers/")
+        parser.add_argument("--asgi-url", default="/api/async/service-centers/")
+        parser.add_argument("--clients", type=int, default=500)
+        parser.add_argument("--requests", type=int, default=5000)
+        parser.add_argument("--threads", type=int, default=32, help="WSGI worker threads.")
+        parser.add_argument("--user", help="national_code of the user to authenticate as.")
+
+    def handle(self, *args, **options):
+        self.token = str(RefreshToken.for_user(benchmark_user(options["user"])).access_token)
+        clients = options["clients"]
+        per_client = max(options["requests"] // clients, 1)
+        self.stdout.write(
+            f"{clients} clients x{per_client} requests, {options['threads']} WSGI threads, "
+            f"{connections['default'].vendor}"
+        )
+
+        with ThreadPoolExecutor(options["threads"]) as pool:
+            wsgi = self.wsgi_client(urlsplit(options["wsgi_url"]), pool)
+            self.report("WSGI", options["wsgi_url"], asyncio.run(self.drive(wsgi, clients, per_client)))
+
+        asgi = self.asgi_client(urlsplit(options["asgi_url"]))
+        self.report("ASGI", options["asgi_url"], asyncio.run(self.drive(asgi, clients, per_client)))
+
+    async def drive(self, request, clients, per_client):
+        async def client():
+            results = []
+            for _ in range(per_client):
+                start = time.perf_counter()
+                status = await request()
+                results.append((time.perf_counter() - start, status))
+            return results
+
+        start = time.perf_counter()
+        batches = await asyncio.gather(*(client() for _ in range(clients)))
+        return time.perf_counter() - start, [result for batch in batches for result in batch]
+
+    def wsgi_client(self, url, pool):
+        handler = WSGIHandler()
+
+        def request():
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "PATH_INFO": url.path,
+                "QUERY_STRING": url.query,
+                "SERVER_NAME": "127.0.0.1",
+                "SERVER_PORT": "80",
+                "HTTP_HOST": "127.0.0.1",
+                "HTTP_AUTHORIZATION": f"Bearer {self.token}",
+                "wsgi.input": io.BytesIO(b""),
+                "wsgi.url_scheme": "http",
+                "wsgi.errors": io.StringIO(),
+            }
+            status = []
+            response = handler(environ, lambda s, headers, exc_info=None: status.append(int(s[:3])))
+            b"".join(response)
+            response.close()
+            return status[0]
+
+        async def send():
+            return await asyncio.get_running_loop().run_in_executor(pool, request)
+
+        return send
+
+    def asgi_client(self, url):
+        handler = ASGIHandler()
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": url.path,
+            "raw_path": url.path.encode(),
+            "query_string": url.query.encode(),
+            "root_path": "",
+            "headers": [
+                (b"host", b"127.0.0.1"),
+                (b"authorization", f"Bearer {self.token}".encode()),
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": ("127.0.0.1", 80),
+        }
+
+        async def send():
+            status = []
+            request_sent = False
+
+            async def receive():
+                nonlocal request_sent
+                if not request_sent:
+                    request_sent = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                # اتصال تا پایان پاسخ باز می‌ماند
+                await asyncio.Future()
+
+            async def respond(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+
+            await handler(dict(scope), receive, respond)
+            return status[0]
+
+        return send
+
+    def report(self, label, url, run):
+        elapsed, results = run
+        latencies = [duration * 1000 for duration, _ in results]
+        failures = sum(1 for _, status in results if not 200 <= status < 300)
+        self.stdout.write(
+            f"{label} GET {url:<32} {len(results) / elapsed:8.1f} req/s   "
+            f"p50 {statistics.median(latencies):8.2f} ms   "
+            f"p99 {percentile(latencies, 0.99):8.2f} ms   non-2xx {failures}"
+        )
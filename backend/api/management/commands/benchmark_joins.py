@@ -0,0 +1,98 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+# دو جدول پروفایل یکسان که فقط در نوع کلید خارجی به کاربر تفاوت دارند
+SCHEMA = (
+    "CREATE TEMPORARY TABLE bench_user ("
+    " id INTEGER PRIMARY KEY, national_code VARCHAR(11) NOT NULL UNIQUE,"
+    " first_name VARCHAR(150) NOT NULL, last_name VARCHAR(150) NOT NULL)",
+    "CREATE TEMPORARY TABLE bench_profile_code ("
+    " id INTEGER PRIMARY KEY, user_ref VARCHAR(11) NOT NULL, age INTEGER NOT NULL)",
+    "CREATE TEMPORARY TABLE bench_profile_id ("
+    " id INTEGER PRIMARY KEY, user_ref INTEGER NOT NULL, age INTEGER NOT NULL)",
+    "CREATE INDEX bench_profile_code_user ON bench_profile_code (user_ref)",
+    "CREATE INDEX bench_profile_id_user ON bench_profile_id (user_ref)",
+)
+TEARDOWN = ("DROP TABLE bench_profile_code", "DROP TABLE bench_profile_id", "DROP TABLE bench_user")
+
+QUERIES = {
+    "page": (
+        "SELECT p.id, p.age, u.first_name, u.last_name, u.national_code"
+        " FROM {profile} p INNER JOIN bench_user u ON u.{target} = p.user_ref"
+        " ORDER BY p.id DESC LIMIT 20 OFFSET %s"
+    ),
+    "join count": (
+        "SELECT COUNT(*) FROM {profile} p INNER JOIN bench_user u ON u.{target} = p.user_ref"
+    ),
+    "user profiles": (
+        "SELECT u.id, p.id FROM bench_user u INNER JOIN {profile} p ON u.{target} = p.user_ref"
+        " WHERE u.national_code IN ({codes})"
+    ),
+}
+
+
+def timed(cursor, sql, params, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        cursor.execute(sql, params)
+        cursor.fetchall()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare join cost of profile -> user foreign keys on the 11-char national code "
+        "versus the integer user id, using temporary tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        users, repeat = options["users"], options["repeat"]
+        connection = connections[options["database"]]
+        national_codes = random.Random(0).sample(range(10**9, 10**10), users)
+        user_rows = [(i + 1, str(code), "علی", "رضایی") for i, code in enumerate(national_codes)]
+
+        with connection.cursor() as cursor:
+            for sql in SCHEMA:
+                cursor.execute(sql)
+            try:
+                cursor.executemany("INSERT INTO bench_user VALUES (%s, %s, %s, %s)", user_rows)
+                cursor.executemany(
+                    "INSERT INTO bench_profile_code VALUES (%s, %s, %s)",
+                    [(pk, code, pk % 90) for pk, code, _, _ in user_rows],
+                )
+                cursor.executemany(
+                    "INSERT INTO bench_profile_id VALUES (%s, %s, %s)",
+                    [(pk, pk, pk % 90) for pk, _, _, _ in user_rows],
+                )
+                lookup = [row[1] for row in user_rows[:: max(users // 100, 1)]][:100]
+                codes = ", ".join(["%s"] * len(lookup))
+                params = {"page": [users // 2], "join count": [], "user profiles": lookup}
+
+                self.stdout.write(f"{users} users/profiles, {repeat} iterations, {connection.vendor}")
+                for label, template in QUERIES.items():
+                    query_params = params[label]
+                    by_code = timed(
+                        cursor,
+                        template.format(profile="bench_profile_code", target="national_code", codes=codes),
+                        query_params, repeat,
+                    )
+                    by_id = timed(
+                        cursor,
+                        template.format(profile="bench_profile_id", target="id", codes=codes),
+                        query_params, repeat,
+                    )
+                    self.stdout.write(
+                        f"{label:<14} national_code {by_code:8.3f} ms   id {by_id:8.3f} ms   "
+                        f"x{by_code / by_id:.1f}"
+                    )
+            finally:
+                for sql in TEARDOWN:
+                    cursor.execute(sql)
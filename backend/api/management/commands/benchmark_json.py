@@ -0,0 +1,97 @@
+import io
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.models import patient
+from api.renderers import FastJSONParser, FastJSONRenderer, orjson
+from api.serializers import PatientSerializer
+
+User = get_user_model()
+
+
+def sample_patients(rows):
+    """
+    بیماران ذخیره نشده با متن فارسی و کاربر تو در تو، مشابه یک صفحه از patients/.
+    """
+    patients = []
+    for i in range(rows):
+        user = User(
+            username=f"{i:010d}", national_code=f"{i:010d}", first_name="محمدرضا",
+            last_name="حسین‌زاده", email=f"{i:010d}@example.com", phone_number="09120000000",
+            gender="مرد", state="خراسان رضوی", city="مشهد", county="مرکزی",
+            homeAddress="بلوار وکیل‌آباد، کوچه بهار ۱۲، پلاک ۴", howKnow="معرفی دوستان",
+            education="کارشناسی", userType="بیمار",
+        )
+        patients.append(
+            patient(
+                id=i + 1, national_code=user, fatherName="علی", age=40 + i % 30,
+                maritalStatus="متاهل", headHouseHold=True, numberDependents=3,
+                familyStatus="سرپرست خانوار با سه فرزند محصل", jobStatus=False,
+                skill="خیاطی", homeStatus="استیجاری", lineNumber="05138000000", organ="کمیته امداد",
+                bankCardNumber="6037990000000000", insurance="تامین اجتماعی",
+                sicknessDescription="دیابت نوع دو و نیاز به داروی ماهانه",
+                familiar1Name="زهرا", familiar1FamilyName="احمدی", familiar1PhoneNumber="09150000000",
+                familiar2Name="حسن", familiar2FamilyName="کریمی", familiar2PhoneNumber="09350000000",
+            )
+        )
+    return patients
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's JSONRenderer/JSONParser with FastJSONRenderer/FastJSONParser "
+        "on a page of PatientSerializer output."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=200)
+        parser.add_argument(
+            "--from-db",
+            action="store_true",
+            help="Serialize the latest patients from the database instead of generated rows.",
+        )
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        if options["from_db"]:
+            instances = list(
+                patient.objects.select_related("national_code").order_by("-created_at")[:rows]
+            )
+        else:
+            instances = sample_patients(rows)
+        data = {"ok": True, "data": PatientSerializer(instances, many=True).data}
+
+        backend = "orjson" if orjson is not None else "json (stdlib fallback)"
+        self.stdout.write(f"{len(instances)} patients, {repeat} iterations, backend: {backend}")
+
+        default_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+        default_body = default_renderer.render(data)
+        fast_body = fast_renderer.render(data)
+        if JSONParser().parse(io.BytesIO(default_body)) != FastJSONParser().parse(io.BytesIO(fast_body)):
+            self.stderr.write(self.style.ERROR("Rendered payloads differ"))
+            return
+
+        results = [
+            ("render", timed(lambda: default_renderer.render(data), repeat),
+             timed(lambda: fast_renderer.render(data), repeat)),
+            ("parse", timed(lambda: JSONParser().parse(io.BytesIO(default_body)), repeat),
+             timed(lambda: FastJSONParser().parse(io.BytesIO(fast_body)), repeat)),
+        ]
+        self.stdout.write(f"payload: {len(default_body)} bytes (DRF), {len(fast_body)} bytes (fast)")
+        for label, default_ms, fast_ms in results:
+            self.stdout.write(
+                f"{label:<7} DRF {default_ms:8.3f} ms   fast {fast_ms:8.3f} ms   "
+                f"x{default_ms / fast_ms:.1f}"
+            )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.query_plan import full_scans, plan_checks
+
+
+class Command(BaseCommand):
+    help = (
+        "Explain the list query of every registered viewset and the hot filter "
+        "lookups, and fail when any of them falls back to a full table scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=10)
+        parser.add_argument("--verbose-plans", action="store_true")
+
+    def handle(self, *args, **options):
+        failures = []
+        for label, queryset in plan_checks(options["page_size"]):
+            scans, plan = full_scans(queryset)
+            if options["verbose_plans"]:
+                self.stdout.write(f"{label}\n{plan}\n")
+            if scans:
+                failures.append(f"{label}: full scan of {', '.join(scans)}")
+                self.stdout.write(self.style.ERROR(failures[-1]))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{label}: ok"))
+
+        if failures:
+            raise CommandError(f"{len(failures)} query plan(s) fall back to a full table scan")
@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exports import EXPORT_FORMATS, write_csv, write_xlsx
+from api.urls import router
+
+
+def registries():
+    return {prefix: viewset.queryset.model for prefix, viewset, _ in router.registry}
+
+
+class Command(BaseCommand):
+    help = "Stream a full registry (e.g. patients, doctors, charity-centers) to CSV or XLSX."
+
+    def add_arguments(self, parser):
+        parser.add_argument("resource", choices=sorted(registries()))
+        parser.add_argument("--file-format", choices=EXPORT_FORMATS, default="csv")
+        parser.add_argument("--output", "-o", help="Output path; CSV defaults to stdout.")
+
+    def handle(self, *args, **options):
+        model = registries()[options["resource"]]
+        queryset = model.objects.order_by("pk")
+        output = options["output"]
+
+        if options["file_format"] == "xlsx":
+            if not output:
+                raise CommandError("--output is required for XLSX exports")
+            with open(output, "wb") as stream:
+                write_xlsx(queryset, stream)
+        elif output:
+            with open(output, "w", encoding="utf-8", newline="") as stream:
+                write_csv(queryset, stream)
+        else:
+            write_csv(queryset, sys.stdout)
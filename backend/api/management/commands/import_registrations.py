@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.imports import IMPORTERS, ImportFormatError, get_importer, read_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk import patients or benefactors from a CSV or XLSX file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("resource", choices=sorted(IMPORTERS))
+        parser.add_argument("path")
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument(
+            "--max-errors", type=int, default=50, help="Number of row errors to print."
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        importer = get_importer(options["resource"], chunk_size=options["chunk_size"])
+        try:
+            with open(options["path"], "rb") as fileobj:
+                report = importer.run(read_rows(fileobj, options["path"]))
+        except (OSError, ImportFormatError) as e:
+            raise CommandError(str(e))
+
+        for error in report["errors"][: options["max_errors"]]:
+            self.stdout.write(self.style.ERROR(f"row {error['row']}: {error['errors']}"))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{report['created']}/{report['total_rows']} rows imported, "
+                f"{report['users_created']} users created, {report['failed']} failed "
+                f"in {time.monotonic() - started:.1f}s"
+            )
+        )
@@ -0,0 +1,124 @@
+import io
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework_simplejwt.tokens import RefreshToken
+
+User = get_user_model()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def benchmark_user(national_code):
+    users = User.objects.all()
+    users = users.filter(national_code=national_code) if national_code else users.filter(is_superuser=True)
+    user = users.first()
+    if user is None:
+        raise CommandError("No user to authenticate as; pass --user or create a superuser.")
+    return user
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the WSGI handler in-process from concurrent threads and compare request "
+        "latency for different CONN_MAX_AGE values. Connections are opened and closed "
+        "exactly as under a real WSGI server (close_old_connections at request end)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", nargs="?", default="/api/service-centers/")
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--conn-max-age",
+            type=int,
+            nargs="+",
+            default=[0, 60],
+            help="CONN_MAX_AGE values to compare (0 = new connection per request).",
+        )
+        parser.add_argument("--user", help="national_code of the user to authenticate as.")
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        url = urlsplit(options["url"])
+        token = str(RefreshToken.for_user(benchmark_user(options["user"])).access_token)
+        handler = WSGIHandler()
+        alias = options["database"]
+
+        opened = []
+        lock = threading.Lock()
+
+        def count_connection(sender, connection, **kwargs):
+            if connection.alias == alias:
+                with lock:
+                    opened.append(connection)
+
+        def request():
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "PATH_INFO": url.path,
+                "QUERY_STRING": url.query,
+                "SERVER_NAME": "127.0.0.1",
+                "SERVER_PORT": "80",
+                "HTTP_HOST": "127.0.0.1",
+                "HTTP_AUTHORIZATION": f"Bearer {token}",
+                "wsgi.input": io.BytesIO(b""),
+                "wsgi.url_scheme": "http",
+                "wsgi.errors": io.StringIO(),
+            }
+            status = []
+            start = time.perf_counter()
+            response = handler(environ, lambda s, headers, exc_info=None: status.append(s))
+            b"".join(response)
+            # مانند سرور WSGI: close سیگنال request_finished را می‌فرستد
+            response.close()
+            return time.perf_counter() - start, status[0]
+
+        def worker(count):
+            try:
+                return [request() for _ in range(count)]
+            finally:
+                connections.close_all()
+
+        connection_created.connect(count_connection)
+        original = connections.settings[alias].get("CONN_MAX_AGE", 0)
+        try:
+            concurrency = options["concurrency"]
+            per_thread = max(options["requests"] // concurrency, 1)
+            self.stdout.write(
+                f"GET {options['url']} x{per_thread * concurrency}, {concurrency} threads, "
+                f"{connections[alias].vendor}"
+            )
+            for max_age in options["conn_max_age"]:
+                connections.settings[alias]["CONN_MAX_AGE"] = max_age
+                opened.clear()
+                start = time.perf_counter()
+                with ThreadPoolExecutor(concurrency) as pool:
+                    results = [
+                        result
+                        for batch in pool.map(worker, [per_thread] * concurrency)
+                        for result in batch
+                    ]
+                elapsed = time.perf_counter() - start
+                latencies = [duration * 1000 for duration, _ in results]
+                failures = sum(1 for _, status in results if not status.startswith("2"))
+                self.stdout.write(
+                    f"CONN_MAX_AGE={max_age:<4} {len(results) / elapsed:8.1f} req/s   "
+                    f"p50 {statistics.median(latencies):7.2f} ms   "
+                    f"p99 {percentile(latencies, 0.99):7.2f} ms   "
+                    f"connections opened {len(opened)}   non-2xx {failures}"
+                )
+        finally:
+            connections.settings[alias]["CONN_MAX_AGE"] = original
+            connection_created.disconnect(count_connection)
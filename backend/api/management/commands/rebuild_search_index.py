@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = "Install the full-text search backend and rebuild the index for the directory models."
+
+    def handle(self, *args, **options):
+        search.install_backend()
+        backend = search.get_backend()
+        total = search.rebuild_index()
+        self.stdout.write(
+            self.style.SUCCESS(f"Indexed {total} records with {type(backend).__name__}")
+        )
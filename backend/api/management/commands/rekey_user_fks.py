@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from api.models import benefactorPerson, doctor, healthAssistPerson, patient, patientServicRequest
+
+User = get_user_model()
+
+REKEYED_MODELS = (patient, benefactorPerson, healthAssistPerson, doctor, patientServicRequest)
+
+
+class Command(BaseCommand):
+    help = (
+        "Rewrite profile foreign keys from customUser.national_code to customUser.id "
+        "before migrating the national_code ForeignKeys away from to_field."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many rows still reference national codes.",
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        user_table = User._meta.db_table
+        qn = connection.ops.quote_name
+        id_as_text = "CHAR" if connection.vendor == "mysql" else "VARCHAR(11)"
+
+        # بدون این کار SQLite هنگام commit ارجاع به national_code را بررسی می‌کند
+        with connection.constraint_checks_disabled():
+            for model in REKEYED_MODELS:
+                table = model._meta.db_table
+                column = model._meta.get_field("national_code").column
+                with connection.cursor() as cursor:
+                    constraints = connection.introspection.get_constraints(cursor, table)
+                foreign_keys = {
+                    name: info["foreign_key"]
+                    for name, info in constraints.items()
+                    if info["foreign_key"] and info["columns"] == [column]
+                }
+                if (user_table, "id") in foreign_keys.values():
+                    self.stdout.write(f"{table}: already keyed on {user_table}.id")
+                    continue
+
+                match = (
+                    f"{qn(column)} IN (SELECT {qn('national_code')} FROM {qn(user_table)})"
+                )
+                with connection.cursor() as cursor:
+                    cursor.execute(f"SELECT COUNT(*) FROM {qn(table)} WHERE {match}")
+                    pending = cursor.fetchone()[0]
+                if options["dry_run"]:
+                    self.stdout.write(f"{table}: {pending} rows to rekey")
+                    continue
+
+                with transaction.atomic(using=connection.alias):
+                    # قید قدیمی به ستون national_code اشاره می‌کند؛ migrate قید جدید را می‌سازد
+                    if connection.vendor != "sqlite":
+                        with connection.schema_editor(atomic=False) as editor:
+                            for name in foreign_keys:
+                                editor.execute(
+                                    editor.sql_delete_fk % {"table": qn(table), "name": qn(name)}
+                                )
+                    with connection.cursor() as cursor:
+                        cursor.execute(
+                            f"UPDATE {qn(table)} SET {qn(column)} = ("
+                            f"SELECT CAST(u.{qn('id')} AS {id_as_text}) FROM {qn(user_table)} u "
+                            f"WHERE u.{qn('national_code')} = {qn(table)}.{qn(column)}"
+                            f") WHERE {match}"
+                        )
+                self.stdout.write(f"{table}: rekeyed {pending} rows")
+
+        if not options["dry_run"]:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    "Done. Now run makemigrations api and migrate to convert the columns to integers."
+                )
+            )
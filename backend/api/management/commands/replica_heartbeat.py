@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+
+from api import db_router
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the replica heartbeat row on the primary. Replicas without a built-in lag "
+        "measure (anything but PostgreSQL) report api_replica_lag_seconds as the age of the "
+        "heartbeat they have replicated, so run this next to the workers, e.g. with --interval 5."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=0, help="Repeat every N seconds.")
+
+    def handle(self, *args, **options):
+        if not any(connections[alias].vendor != "postgresql" for alias in db_router.replica_aliases()):
+            raise CommandError("No replica needs a heartbeat; set DB_REPLICAS.")
+
+        while True:
+            close_old_connections()
+            self.stdout.write(f"beat {db_router.beat().isoformat()}")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background jobs from the database queue (upload post-processing). Start "
+        "as many workers as needed; each job is claimed by exactly one of them. With "
+        "--once the worker exits when the queue is empty."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit when no job is ready.")
+        parser.add_argument("--max-jobs", type=int, default=0, help="Exit after N jobs.")
+        parser.add_argument("--interval", type=float, help="Seconds to sleep when the queue is empty.")
+
+    def handle(self, *args, **options):
+        interval = options["interval"] or jobs.job_setting("poll_interval")
+        processed = 0
+        while not options["max_jobs"] or processed < options["max_jobs"]:
+            # مانند پایان هر درخواست، اتصال‌های قدیمی یا خراب بسته می‌شوند
+            close_old_connections()
+            jobs.requeue_stale()
+            job = jobs.claim()
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(interval)
+                continue
+            result = jobs.run(job)
+            processed += 1
+            self.stdout.write(f"{job.kind}#{job.pk} {result}")
+        self.stdout.write(f"processed {processed} jobs")
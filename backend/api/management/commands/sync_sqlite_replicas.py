@@ -0,0 +1,41 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.db_router import PRIMARY, beat, replica_aliases
+
+
+def copy_database(source, target):
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite primary into every SQLite replica file, standing in for streaming "
+        "replication when testing read routing locally. With --interval the copy repeats, "
+        "so replicas lag the primary by up to that many seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=0, help="Repeat every N seconds.")
+
+    def handle(self, *args, **options):
+        databases = settings.DATABASES
+        if databases[PRIMARY]["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("Only SQLite replicas can be synced with this command.")
+        replicas = [alias for alias in replica_aliases() if databases[alias]["ENGINE"] == databases[PRIMARY]["ENGINE"]]
+        if not replicas:
+            raise CommandError("No replicas configured; set DB_REPLICAS.")
+
+        while True:
+            # heartbeat همراه داده کپی می‌شود تا تاخیر replica اندازه‌گیری شود
+            beat()
+            for alias in replicas:
+                copy_database(str(databases[PRIMARY]["NAME"]), str(databases[alias]["NAME"]))
+            self.stdout.write(f"synced {', '.join(replicas)}")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
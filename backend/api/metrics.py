@@ -0,0 +1,316 @@
+import atexit
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+
+class Counter(Metric):
+    type = "counter"
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+
+class MetricsRegistry:
+    """
+    نگهداری مقادیر متریک‌ها در حافظه پروسه.
+
+    اگر API_METRICS_DIR تنظیم شده باشد، هر پروسه (worker در gunicorn) مقادیر خود را
+    به صورت دوره‌ای در فایلی جداگانه در آن پوشه می‌نویسد و خروجی /api/metrics
+    مجموع همه فایل‌ها را گزارش می‌کند. فایل هر worker هنگام خروج و فایل پروسه‌های
+    متوقف شده هنگام خواندن حذف می‌شوند.
+    """
+
+    flush_interval = 5.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._values = {}
+        self._gauge_callbacks = {}
+        self._scrape_callbacks = {}
+        self._last_flush = 0.0
+        self._exit_hook_pid = None
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def gauge_callback(self, metric, callback):
+        """
+        گیج‌هایی که مقدارشان هنگام خواندن محاسبه می‌شود (مثلا طول صف).
+        """
+        self._gauge_callbacks[metric.name] = callback
+
+    def scrape_callback(self, metric, callback):
+        """
+        گیج‌هایی که فقط هنگام پاسخ به /metrics و در همان پروسه محاسبه می‌شوند و جمع
+        پروسه‌ها برایشان معنا ندارد (مثلا تاخیر replica که با کوئری خوانده می‌شود).
+        """
+        self._scrape_callbacks[metric.name] = callback
+
+    def inc(self, metric, labels=None, amount=1):
+        key = (metric.name, metric.key(labels or {}))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self._maybe_flush()
+
+    def set(self, metric, value, labels=None):
+        with self._lock:
+            self._values[(metric.name, metric.key(labels or {}))] = value
+        self._maybe_flush()
+
+    def observe(self, metric, value, labels=None):
+        key = (metric.name, metric.key(labels or {}))
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {"buckets": [0] * len(metric.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(metric.buckets):
+                if value <= bound:
+                    entry["buckets"][index] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+        self._maybe_flush()
+
+    # --- ذخیره مشترک بین پروسه‌ها ---
+
+    @property
+    def directory(self):
+        return getattr(settings, "API_METRICS_DIR", None)
+
+    def _maybe_flush(self):
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _collect_callbacks(self):
+        for name, callback in self._gauge_callbacks.items():
+            try:
+                values = callback()
+            except Exception:
+                continue
+            if not isinstance(values, dict):
+                values = {(): values}
+            for labels, value in values.items():
+                self._values[(name, tuple(labels))] = value
+
+    def _serializable(self):
+        with self._lock:
+            self._collect_callbacks()
+            return [[name, list(labels), value] for (name, labels), value in self._values.items()]
+
+    def snapshot_path(self):
+        return os.path.join(self.directory, f"api_metrics_{os.getpid()}.json")
+
+    def flush(self):
+        directory = self.directory
+        os.makedirs(directory, exist_ok=True)
+        path = self.snapshot_path()
+        if self._exit_hook_pid != os.getpid():
+            # فایل این پروسه هنگام خروج worker حذف می‌شود (پس از fork دوباره ثبت می‌شود)
+            atexit.register(_remove, path)
+            self._exit_hook_pid = os.getpid()
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as stream:
+            json.dump({"pid": os.getpid(), "values": self._serializable()}, stream)
+        # جایگزینی اتمیک تا خواننده هرگز فایل نیمه‌کاره نبیند
+        os.replace(tmp, path)
+        self._last_flush = time.monotonic()
+
+    def _load_all(self):
+        if not self.directory:
+            return [self._serializable()]
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "api_metrics_*.json")):
+            try:
+                with open(path) as stream:
+                    data = json.load(stream)
+            except (OSError, ValueError):
+                continue
+            if not _pid_alive(data["pid"]):
+                # پروسه‌ای که بدون پاک کردن فایل خود متوقف شده (مثلا kill -9)؛ با هر
+                # راه‌اندازی مجدد pid جدید است و جمع شمارنده‌ها نباید همیشه رشد کند
+                _remove(path)
+                continue
+            snapshots.append(data["values"])
+        return snapshots
+
+    def aggregate(self):
+        totals = {}
+        for snapshot in self._load_all():
+            for name, labels, value in snapshot:
+                if name not in self._metrics:
+                    continue
+                key = (name, tuple(labels))
+                current = totals.get(key)
+                if isinstance(value, dict):
+                    if current is None:
+                        current = totals[key] = {"buckets": [0] * len(value["buckets"]), "sum": 0.0, "count": 0}
+                    current["buckets"] = [a + b for a, b in zip(current["buckets"], value["buckets"])]
+                    current["sum"] += value["sum"]
+                    current["count"] += value["count"]
+                else:
+                    totals[key] = (current or 0) + value
+        for name, callback in self._scrape_callbacks.items():
+            try:
+                values = callback()
+            except Exception:
+                continue
+            if not isinstance(values, dict):
+                values = {(): values}
+            for labels, value in values.items():
+                totals[(name, tuple(labels))] = value
+        return totals
+
+    def exposition(self):
+        """
+        خروجی متنی با قالب Prometheus (text/plain; version=0.0.4).
+        """
+        totals = self.aggregate()
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for (metric_name, labels), value in sorted(totals.items()):
+                if metric_name != name:
+                    continue
+                pairs = list(zip(metric.labelnames, labels))
+                if metric.type == "histogram":
+                    for bound, count in zip(metric.buckets, value["buckets"]):
+                        lines.append(f"{name}_bucket{_labels(pairs + [('le', _number(bound))])} {count}")
+                    lines.append(f"{name}_bucket{_labels(pairs + [('le', '+Inf')])} {value['count']}")
+                    lines.append(f"{name}_sum{_labels(pairs)} {_number(value['sum'])}")
+                    lines.append(f"{name}_count{_labels(pairs)} {value['count']}")
+                else:
+                    lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.register(
+    Counter(
+        "api_requests_total",
+        "API requests by viewset, action, method and status.",
+        ("viewset", "action", "method", "status"),
+    )
+)
+REQUEST_DURATION = registry.register(
+    Histogram(
+        "api_request_duration_seconds",
+        "API request latency by viewset and action.",
+        ("viewset", "action"),
+    )
+)
+VALIDATION_FAILURES = registry.register(
+    Counter(
+        "api_validation_failures_total",
+        "Requests rejected by serializer validation.",
+        ("viewset", "action"),
+    )
+)
+DB_QUERIES = registry.register(
+    Histogram(
+        "api_db_queries",
+        "Database queries per request by viewset and action.",
+        ("viewset", "action"),
+        buckets=QUERY_BUCKETS,
+    )
+)
+DB_DURATION = registry.register(
+    Histogram(
+        "api_db_duration_seconds",
+        "Database time per request by viewset and action.",
+        ("viewset", "action"),
+    )
+)
+RESPONSE_CACHE = registry.register(
+    Counter(
+        "api_response_cache_total",
+        "Response cache lookups by viewset, action and result (hit/miss).",
+        ("viewset", "action", "result"),
+    )
+)
+REPLICA_LAG = registry.register(
+    Gauge(
+        "api_db_replica_lag_seconds",
+        "Replication delay of each read replica, measured when /metrics is scraped.",
+        ("alias",),
+    )
+)
+UPLOAD_QUEUE = registry.register(
+    Gauge("api_upload_queue_size", "Uploaded files waiting for post-processing by the job worker.")
+)
+JOBS = registry.register(
+    Counter(
+        "api_jobs_total",
+        "Background jobs run by the worker, by kind and result (done/retry/failed).",
+        ("kind", "result"),
+    )
+)
+LOG_DROPPED = registry.register(
+    Counter("api_log_records_dropped_total", "Log records discarded because the log queue was full.")
+)
@@ -0,0 +1,250 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from . import metrics
+from .db_router import read_from_replicas, replica_aliases
+from .profiling import QueryRecorder, RequestProfile, profiling_setting, store
+from .response_cache import is_shared_cache
+
+logger = logging.getLogger("api.profiling")
+
+
+class AsyncCapableMiddleware:
+    """
+    پایه میان‌افزارهای API که در ASGI بدون پرش به thread اجرا می‌شوند تا ویوهای
+    async واقعا async بمانند. زیرکلاس‌ها __call__ (همگام) و __acall__ را پیاده می‌کنند.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+
+class RequestProfilingMiddleware(AsyncCapableMiddleware):
+    """
+    زمان کل، زمان پایگاه داده، تعداد کوئری و کوئری‌های تکراری هر درخواست را
+    ثبت کرده و بر اساس نام مسیر تجمیع می‌کند.
+    """
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not profiling_setting("ENABLED"):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with self.recording(recorder):
+            response = self.get_response(request)
+        return self.record(request, response, recorder, start)
+
+    async def __acall__(self, request):
+        if not profiling_setting("ENABLED"):
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with self.recording(recorder):
+            response = await self.get_response(request)
+        return self.record(request, response, recorder, start)
+
+    @staticmethod
+    def recording(recorder):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    def record(self, request, response, recorder, start):
+        wall_ms = (time.perf_counter() - start) * 1000
+
+        match = getattr(request, "resolver_match", None)
+        profile = RequestProfile(
+            route=(match.url_name or match.view_name) if match else "<unresolved>",
+            method=request.method,
+            status=response.status_code,
+            wall_ms=wall_ms,
+            db_ms=recorder.duration * 1000,
+            queries=recorder.count,
+            duplicates=recorder.duplicates,
+            statements=recorder.statements,
+        )
+        request.api_profile = profile
+        store.record(profile)
+
+        if profiling_setting("HEADER"):
+            response["X-Query-Profile"] = profile.header_value()
+        if profile.over_budget():
+            logger.warning(
+                "Slow request %s %s (%s): %s\n%s",
+                request.method,
+                request.path,
+                profile.route,
+                profile.header_value(),
+                "\n".join(f"[{ms:.1f}ms] {sql}" for sql, ms in profile.statements),
+            )
+        return response
+
+
+def _view_labels(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return {"viewset": "<unresolved>", "action": ""}
+    view_class = getattr(match.func, "cls", None) or getattr(match.func, "view_class", None)
+    actions = getattr(match.func, "actions", None) or {}
+    return {
+        "viewset": view_class.__name__ if view_class else match.view_name,
+        "action": actions.get(request.method.lower(), request.method.lower()),
+    }
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """
+    جمع‌آوری متریک‌های Prometheus برای هر درخواست؛ باید بیرون از
+    RequestProfilingMiddleware قرار گیرد تا آمار کوئری‌ها در دسترس باشد.
+    """
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        return self.record(request, response, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        return self.record(request, response, time.perf_counter() - start)
+
+    def record(self, request, response, elapsed):
+        labels = _view_labels(request)
+        registry = metrics.registry
+        registry.inc(
+            metrics.REQUESTS,
+            dict(labels, method=request.method, status=response.status_code),
+        )
+        registry.observe(metrics.REQUEST_DURATION, elapsed, labels)
+
+        profile = getattr(request, "api_profile", None)
+        if profile is not None:
+            registry.observe(metrics.DB_QUERIES, profile.queries, labels)
+            registry.observe(metrics.DB_DURATION, profile.db_ms / 1000, labels)
+
+        # با log_validation_failure علامت می‌خورد (خطای سریالایزر یا ValidationError)
+        if getattr(request, "api_validation_failed", False):
+            registry.inc(metrics.VALIDATION_FAILURES, labels)
+        return response
+
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+PRIMARY_PIN_COOKIE = "api_primary_until"
+
+
+def _primary_pin_key(user_id):
+    return f"api:primary-pin:{user_id}"
+
+
+class ReplicaRoutingMiddleware(AsyncCapableMiddleware):
+    """
+    درخواست‌های خواندنی از replica خوانده می‌شوند. پس از هر درخواست نوشتنی، کوکی
+    کوتاه مدتی تنظیم می‌شود تا خواندن‌های بعدی همان کاربر تا پایان این بازه از
+    primary انجام شوند و تغییرات خودش را ببیند (read-after-write).
+
+    کلاینت‌هایی که کوکی نگه نمی‌دارند (اپ موبایل، اسکریپت‌ها) با شناسه کاربر توکن
+    JWT در کش مشترک سنجاق می‌شوند؛ این کار فقط با وجود replica و کش مشترک انجام
+    می‌شود.
+    """
+
+    def pin_seconds(self):
+        return getattr(settings, "API_REPLICA_PIN_SECONDS", 5)
+
+    def pin_cache(self):
+        if not replica_aliases():
+            return None
+        alias = getattr(settings, "API_RESPONSE_CACHE_ALIAS", "default")
+        return caches[alias] if is_shared_cache(alias) else None
+
+    def token_user_id(self, request):
+        # فقط امضا و انقضای توکن بررسی می‌شود و کوئری ندارد؛ احراز هویت اصلی در ویو است.
+        # نوشتن با همین توکن انجام می‌شود، پس شناسه آن برای سنجاق کردن کافی است
+        authentication = JWTAuthentication()
+        header = authentication.get_header(request)
+        raw_token = authentication.get_raw_token(header) if header else None
+        if raw_token is None:
+            return None
+        try:
+            return authentication.get_validated_token(raw_token).get(jwt_settings.USER_ID_CLAIM)
+        except InvalidToken:
+            return None
+
+    def user_pin_key(self, request):
+        user_id = self.token_user_id(request)
+        return _primary_pin_key(user_id) if user_id is not None else None
+
+    def cookie_pinned(self, request):
+        try:
+            return float(request.COOKIES.get(PRIMARY_PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def pinned(self, request):
+        if self.cookie_pinned(request):
+            return True
+        cache = self.pin_cache()
+        key = self.user_pin_key(request) if cache is not None else None
+        return key is not None and cache.get(key) is not None
+
+    async def apinned(self, request):
+        if self.cookie_pinned(request):
+            return True
+        cache = self.pin_cache()
+        key = self.user_pin_key(request) if cache is not None else None
+        return key is not None and await cache.aget(key) is not None
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        safe = request.method in SAFE_METHODS
+        with read_from_replicas(safe and not self.pinned(request)):
+            response = self.get_response(request)
+        cache = None if safe else self.pin_cache()
+        key = self.user_pin_key(request) if cache is not None else None
+        if key is not None:
+            cache.set(key, 1, self.pin_seconds())
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        safe = request.method in SAFE_METHODS
+        with read_from_replicas(safe and not await self.apinned(request)):
+            response = await self.get_response(request)
+        cache = None if safe else self.pin_cache()
+        key = self.user_pin_key(request) if cache is not None else None
+        if key is not None:
+            await cache.aset(key, 1, self.pin_seconds())
+        return self.pin(request, response)
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS:
+            pin = self.pin_seconds()
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE,
+                f"{time.time() + pin:.3f}",
+                max_age=pin,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from django.utils import timezone
 
 class customUser(AbstractUser):
 
@@ -31,9 +32,10 @@ class customUser(AbstractUser):
     howKnow = models.CharField(max_length=128)
     education = models.CharField(max_length=128)
     userType = models.CharField(max_length=128)
+    updated_at = models.DateTimeField(auto_now=True)
 
 class patient(models.Model) :
-    national_code = models.ForeignKey(customUser,to_field="national_code",on_delete=models.CASCADE)
+    national_code = models.ForeignKey(customUser,on_delete=models.CASCADE)
     presenterNationalCode = models.CharField(max_length=11,null=True,blank=True)
     presenterFirstName = models.CharField(max_length=11,null=True,blank=True)
     presenterLastName = models.CharField(max_length=11,null=True,blank=True)
@@ -60,15 +62,28 @@ class patient(models.Model) :
     nationalCardImage = models.FileField(upload_to="patient/",null=True)
     nationalCertificateImage = models.FileField(upload_to="patient/",null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="patient_created_idx"),
+            models.Index(fields=["presenterNationalCode"], name="patient_presenter_idx"),
+        ]
 
 class benefactorPerson(models.Model) :
-    national_code = models.ForeignKey(customUser,to_field="national_code",on_delete=models.CASCADE)
+    national_code = models.ForeignKey(customUser,on_delete=models.CASCADE)
     landLineNumber = models.CharField(max_length=15)
     contribution = models.CharField(max_length=512)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="benefactor_created_idx"),
+        ]
 
 class healthAssistPerson(models.Model) :
-    national_code = models.ForeignKey(customUser,to_field="national_code",on_delete=models.CASCADE)
+    national_code = models.ForeignKey(customUser,on_delete=models.CASCADE)
     presenterNationalCode = models.CharField(max_length=11,null=True,blank=True)
     presenterFirstName = models.CharField(max_length=11,null=True,blank=True)
     presenterLastName = models.CharField(max_length=11,null=True,blank=True)
@@ -76,9 +91,15 @@ class healthAssistPerson(models.Model) :
     assistType = models.CharField(max_length=512)
     assiteDescription = models.CharField(max_length=128)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="healthassist_created_idx"),
+        ]
 
 class doctor(models.Model) :
-    national_code = models.ForeignKey(customUser,to_field="national_code",on_delete=models.CASCADE)
+    national_code = models.ForeignKey(customUser,on_delete=models.CASCADE)
     fatherName = models.CharField(max_length=128)
     medicalCode = models.IntegerField()
     secPhoneNumber = models.CharField(max_length=15)
@@ -87,6 +108,12 @@ class doctor(models.Model) :
     collabType = models.CharField(max_length=128)
     contribution = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="doctor_created_idx"),
+        ]
 
 class privateCompany(models.Model):
     name = models.CharField(max_length=256)
@@ -116,16 +143,28 @@ class privateCompany(models.Model):
     activityLicense = models.FileField(upload_to="company/",null=True,blank=True)
     collectionLogo = models.FileField(upload_to="company/",null=True,blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="company_created_idx"),
+        ]
 
 
 class patientServicRequest(models.Model):
-    national_code = models.ForeignKey(customUser,to_field="national_code",on_delete=models.CASCADE)
+    national_code = models.ForeignKey(customUser,on_delete=models.CASCADE)
     usingResidence = models.BooleanField()
     numberOfWoman = models.IntegerField()
     numberOfMan = models.IntegerField()
     explain = models.CharField(max_length=512)
     neededService = models.CharField(max_length=512)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="servicerequest_created_idx"),
+        ]
 
 # class patientConsultationRequest(models.Model):
 #     national_code = models.ForeignKey(customUser, to_field="national_code", on_delete=models.CASCADE)
@@ -160,6 +199,16 @@ class ServiceCenter(models.Model):
     description = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=50, default='در انتظار تایید') # e.g., 'فعال', 'غیرفعال', 'در انتظار تایید'
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="servicecenter_created_idx"),
+            models.Index(fields=["status", "-created_at"], name="servicecenter_status_idx"),
+            models.Index(fields=["state", "city"], name="servicecenter_state_city_idx"),
+            models.Index(fields=["name"], name="servicecenter_name_idx"),
+            models.Index(fields=["serviceCategory"], name="servicecenter_servicecateg_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -183,6 +232,16 @@ class MedicalCenter(models.Model):
     description = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=50, default='در انتظار تایید')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="medicalcenter_created_idx"),
+            models.Index(fields=["status", "-created_at"], name="medicalcenter_status_idx"),
+            models.Index(fields=["state", "city"], name="medicalcenter_state_city_idx"),
+            models.Index(fields=["name"], name="medicalcenter_name_idx"),
+            models.Index(fields=["type"], name="medicalcenter_type_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -212,6 +271,16 @@ class CharityCenter(models.Model):
     description = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=50, default='در انتظار تایید')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="charitycenter_created_idx"),
+            models.Index(fields=["status", "-created_at"], name="charitycenter_status_idx"),
+            models.Index(fields=["state", "city"], name="charitycenter_state_city_idx"),
+            models.Index(fields=["name"], name="charitycenter_name_idx"),
+            models.Index(fields=["type"], name="charitycenter_type_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -238,6 +307,16 @@ class GovernmentOrganization(models.Model):
     logo = models.FileField(upload_to="gov_orgs/logos/", blank=True, null=True)
     status = models.CharField(max_length=50, default='فعال')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="govorg_created_idx"),
+            models.Index(fields=["status", "-created_at"], name="govorg_status_idx"),
+            models.Index(fields=["state", "city"], name="govorg_state_city_idx"),
+            models.Index(fields=["name"], name="govorg_name_idx"),
+            models.Index(fields=["type"], name="govorg_type_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -265,6 +344,16 @@ class Association(models.Model):
     description = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=50, default='فعال')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="association_created_idx"),
+            models.Index(fields=["status", "-created_at"], name="association_status_idx"),
+            models.Index(fields=["state", "city"], name="association_state_city_idx"),
+            models.Index(fields=["name"], name="association_name_idx"),
+            models.Index(fields=["type"], name="association_type_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -290,6 +379,92 @@ class ConsultationRequest(models.Model):
     preferredTime = models.CharField(max_length=20, blank=True, null=True)
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='در انتظار بررسی')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="consultation_created_idx"),
+            models.Index(fields=["status", "-created_at"], name="consultation_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"درخواست مشاوره برای {self.user.get_full_name()} - موضوع: {self.subject}"
+
+
+class SearchDocument(models.Model):
+    """
+    سند نمایه جستجو؛ متن نرمال شده هر رکورد قابل جستجو در body نگهداری می‌شود.
+    """
+    kind = models.CharField(max_length=64)
+    object_id = models.BigIntegerField()
+    title = models.CharField(max_length=512)
+    state = models.CharField(max_length=256, blank=True)
+    city = models.CharField(max_length=256, blank=True)
+    body = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="searchdoc_kind_object_uniq"),
+        ]
 
     def __str__(self):
-        return f"درخواست مشاوره برای {self.user.get_full_name()} - موضوع: {self.subject}"
\ No newline at end of file
+        return f"{self.kind}:{self.object_id}"
+
+
+class ReplicaHeartbeat(models.Model):
+    """
+    یک ردیف که زمان آن روی primary به‌روز می‌شود؛ اختلاف آن با همان ردیف روی replica
+    تاخیر تکثیر را نشان می‌دهد (برای پایگاه‌هایی که معیار داخلی ندارند).
+    """
+    beat_at = models.DateTimeField()
+
+
+class Job(models.Model):
+    """
+    کار پس‌زمینه در صف پایگاه داده؛ با `manage.py run_jobs` اجرا می‌شود. کارهای موفق
+    حذف و کارهای ناموفق پس از آخرین تلاش با وضعیت failed نگه داشته می‌شوند.
+    """
+    PENDING = "pending"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "در انتظار"),
+        (RUNNING, "در حال اجرا"),
+        (FAILED, "ناموفق"),
+    ]
+
+    kind = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="job_status_run_after_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}#{self.pk} ({self.status})"
+
+
+class StoredFile(models.Model):
+    """
+    نتیجه پردازش یک فایل آپلود شده (اعتبارسنجی، checksum و تصویر کوچک) با کلید نام
+    فایل در storage.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    content_type = models.CharField(max_length=64, blank=True)
+    thumbnail = models.CharField(max_length=255, blank=True)
+    is_valid = models.BooleanField(default=True)
+    error = models.CharField(max_length=255, blank=True)
+    processed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
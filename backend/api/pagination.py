@@ -0,0 +1,168 @@
+import base64
+import json
+from datetime import datetime
+from functools import partial
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+from .counting import StrategyPaginator, get_count_strategy
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    """
+    صفحه‌بندی پیش‌فرض API.
+
+    حالت پیش‌فرض شماره صفحه است. با ارسال ?pagination=cursor یا ?cursor=...
+    صفحه‌بندی keyset روی (created_at, id) فعال می‌شود که نه COUNT اجرا می‌کند
+    و نه OFFSET؛ بنابراین هزینه صفحه‌های عمیق ثابت می‌ماند.
+
+    روش شمارش کل با ویژگی count_strategy روی ViewSet تعیین می‌شود
+    ("exact"، "cached" یا "estimate") و ?count=none شمارش را کاملا حذف می‌کند.
+    """
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    mode_query_param = "pagination"
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.mode = "page"
+        if (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == "cursor"
+        ):
+            self.mode = "cursor"
+            return self.paginate_cursor_queryset(queryset, request)
+        if request.query_params.get(self.count_query_param) == "none":
+            self.mode = "uncounted"
+            return self.paginate_uncounted_queryset(queryset, request)
+
+        self.django_paginator_class = partial(
+            StrategyPaginator,
+            count_strategy=get_count_strategy(getattr(view, "count_strategy", None)),
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.mode != "page":
+            return Response({"results": data, "pagination": self.get_pagination_meta()})
+        return Response(
+            {
+                "count": self.page.paginator.count,
+                "total_pages": self.page.paginator.num_pages,
+                "current_page": self.page.number,
+                "page_size": self.page.paginator.per_page,
+                "results": data,
+                "pagination": self.get_pagination_meta(),
+            }
+        )
+
+    def get_pagination_meta(self):
+        if self.mode == "cursor":
+            return {
+                "mode": "cursor",
+                "page_size": self.cursor_page_size,
+                "next_cursor": self.next_cursor,
+                "prev_cursor": self.prev_cursor,
+                "has_next": self.next_cursor is not None,
+                "has_previous": self.prev_cursor is not None,
+            }
+        if self.mode == "uncounted":
+            return {
+                "total_count": None,
+                "page_size": self.uncounted_page_size,
+                "current_page": self.uncounted_page_number,
+                "total_pages": None,
+                "has_next": self.uncounted_has_next,
+            }
+        return {
+            "total_count": self.page.paginator.count,
+            "page_size": self.page.paginator.per_page,
+            "current_page": self.page.number,
+            "total_pages": self.page.paginator.num_pages,
+        }
+
+    def paginate_uncounted_queryset(self, queryset, request):
+        page_size = self.get_page_size(request)
+        raw_page = request.query_params.get(self.page_query_param, 1)
+        try:
+            page_number = int(raw_page)
+            if page_number < 1:
+                raise ValueError(raw_page)
+        except ValueError:
+            raise NotFound(
+                self.invalid_page_message.format(page_number=raw_page, message="")
+            )
+
+        offset = (page_number - 1) * page_size
+        rows = list(queryset[offset : offset + page_size + 1])
+        self.uncounted_page_size = page_size
+        self.uncounted_page_number = page_number
+        self.uncounted_has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    # --- keyset ---
+
+    def paginate_cursor_queryset(self, queryset, request):
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        reverse = position is not None and position[2] == "prev"
+
+        if position is None:
+            queryset = queryset.order_by("-created_at", "-id")
+        elif reverse:
+            created_at, pk, _ = position
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            ).order_by("created_at", "id")
+        else:
+            created_at, pk, _ = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            ).order_by("-created_at", "-id")
+
+        # یک ردیف اضافه برای تشخیص وجود صفحه بعد
+        rows = list(queryset[: page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        self.cursor_page_size = page_size
+        self.next_cursor = self.encode_cursor(rows[-1], "next") if rows and has_next else None
+        self.prev_cursor = self.encode_cursor(rows[0], "prev") if rows and has_previous else None
+        return rows
+
+    def encode_cursor(self, row, direction):
+        # ردیف‌ها ممکن است نمونه مدل یا dict حاصل از values() باشند
+        if isinstance(row, dict):
+            created_at, pk = row["created_at"], row["pk"]
+        else:
+            created_at, pk = row.created_at, row.pk
+        payload = {"c": created_at.isoformat(), "i": pk, "d": direction}
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            payload = json.loads(raw)
+            direction = payload["d"]
+            if direction not in ("next", "prev"):
+                raise ValueError(direction)
+            return datetime.fromisoformat(payload["c"]), int(payload["i"]), direction
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
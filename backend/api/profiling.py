@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+DEFAULTS = {
+    "ENABLED": True,
+    # هدر X-Query-Profile در پاسخ
+    "HEADER": False,
+    # تعداد درخواست‌های نگهداری شده برای هر مسیر
+    "WINDOW": 500,
+    # آستانه‌های ثبت لاگ همراه با SQL
+    "SLOW_MS": 500,
+    "MAX_QUERIES": 20,
+}
+
+
+def profiling_setting(name):
+    return getattr(settings, "API_PROFILING", {}).get(name, DEFAULTS[name])
+
+
+class QueryRecorder:
+    """
+    execute_wrapper که زمان و متن هر کوئری را ثبت می‌کند؛ مستقل از DEBUG.
+    """
+
+    max_statements = 200
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = []
+        self._seen = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            self._seen[(sql, repr(params))] += 1
+            if len(self.statements) < self.max_statements:
+                self.statements.append((sql, elapsed * 1000))
+
+    @property
+    def duplicates(self):
+        return sum(n - 1 for n in self._seen.values() if n > 1)
+
+
+@dataclass
+class RequestProfile:
+    route: str
+    method: str
+    status: int
+    wall_ms: float
+    db_ms: float
+    queries: int
+    duplicates: int
+    statements: list = field(default_factory=list, repr=False)
+
+    def header_value(self):
+        return (
+            f"wall={self.wall_ms:.1f}ms;db={self.db_ms:.1f}ms;"
+            f"queries={self.queries};dupes={self.duplicates}"
+        )
+
+    def over_budget(self):
+        return self.wall_ms > profiling_setting("SLOW_MS") or self.queries > profiling_setting(
+            "MAX_QUERIES"
+        )
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class ProfileStore:
+    """
+    پنجره چرخشی آخرین درخواست‌های هر مسیر (مثلا patient-list) در حافظه پروسه.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(self._new_window)
+
+    def _new_window(self):
+        return deque(maxlen=profiling_setting("WINDOW"))
+
+    def record(self, profile):
+        sample = (
+            profile.wall_ms,
+            profile.db_ms,
+            profile.queries,
+            profile.duplicates,
+            profile.status,
+        )
+        with self._lock:
+            self._samples[f"{profile.method} {profile.route}"].append(sample)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def snapshot(self):
+        with self._lock:
+            samples = {route: list(window) for route, window in self._samples.items()}
+
+        report = {}
+        for route, rows in sorted(samples.items()):
+            walls = sorted(row[0] for row in rows)
+            count = len(rows)
+            report[route] = {
+                "requests": count,
+                "wall_ms": {
+                    "mean": round(sum(walls) / count, 2),
+                    "p50": round(_percentile(walls, 0.5), 2),
+                    "p95": round(_percentile(walls, 0.95), 2),
+                    "max": round(walls[-1], 2),
+                },
+                "db_ms_mean": round(sum(row[1] for row in rows) / count, 2),
+                "queries_mean": round(sum(row[2] for row in rows) / count, 2),
+                "queries_max": max(row[2] for row in rows),
+                "duplicates_mean": round(sum(row[3] for row in rows) / count, 2),
+                "errors": sum(1 for row in rows if row[4] >= 500),
+            }
+        return report
+
+
+store = ProfileStore()
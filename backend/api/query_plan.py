@@ -0,0 +1,150 @@
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+
+from .models import (
+    Association,
+    CharityCenter,
+    ConsultationRequest,
+    GovernmentOrganization,
+    MedicalCenter,
+    ServiceCenter,
+    patient,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# فیلترهای پرتکرار که باید از ایندکس استفاده کنند
+INDEXED_LOOKUPS = [
+    (model, {"status": "فعال"})
+    for model in (
+        ServiceCenter,
+        MedicalCenter,
+        CharityCenter,
+        GovernmentOrganization,
+        Association,
+        ConsultationRequest,
+    )
+] + [
+    (model, {"state": "تهران", "city": "تهران"})
+    for model in (
+        ServiceCenter,
+        MedicalCenter,
+        CharityCenter,
+        GovernmentOrganization,
+        Association,
+    )
+] + [
+    (patient, {"presenterNationalCode": "0000000000"}),
+]
+
+
+def full_scans(queryset):
+    """
+    جداولی که در پلن اجرای کوئری به صورت کامل پیمایش می‌شوند.
+    """
+    vendor = connections[queryset.db].vendor
+    plan = queryset.explain()
+    scans = []
+    for line in plan.splitlines():
+        if vendor == "sqlite":
+            # SCAN بدون USING یعنی پیمایش کامل جدول
+            detail = line.split("SCAN ", 1)
+            if len(detail) == 2 and " USING " not in detail[1]:
+                scans.append(detail[1].split()[0])
+        elif vendor == "postgresql" and "Seq Scan on " in line:
+            scans.append(line.split("Seq Scan on ", 1)[1].split()[0])
+    return scans, plan
+
+
+def plan_checks(page_size=10):
+    """
+    (برچسب، کوئری) برای کوئری لیست هر ViewSet ثبت شده و فیلترهای پرتکرار.
+    """
+    from .urls import router
+
+    checks = []
+    for prefix, viewset, basename in router.registry:
+        view = viewset(action="list", request=None, args=(), kwargs={}, format_kwarg=None)
+        checks.append((f"{prefix}/ list", view.get_queryset()[:page_size]))
+    for model, lookup in INDEXED_LOOKUPS:
+        queryset = model.objects.filter(**lookup).order_by("-created_at")[:page_size]
+        checks.append((f"{model._meta.label} {sorted(lookup)}", queryset))
+    return checks
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def assert_max_queries(budget, using=None):
+    """
+    تعداد کوئری‌های اجرا شده داخل بلاک را با بودجه مقایسه می‌کند.
+    برای استفاده در تست‌ها و اسکریپت‌های بررسی کارایی.
+    """
+    conn = connection if using is None else connections[using]
+    with CaptureQueriesContext(conn) as ctx:
+        yield ctx
+    if len(ctx) > budget:
+        sql = "\n".join(q["sql"] for q in ctx.captured_queries)
+        raise QueryBudgetExceeded(
+            f"{len(ctx)} queries executed, budget is {budget}:\n{sql}"
+        )
+
+
+class QueryPlanMixin:
+    """
+    لایه برنامه‌ریزی کوئری برای ViewSetها.
+
+    select_related_map و prefetch_related_map بر اساس action تعریف می‌شوند؛
+    کلید "*" برای همه actionها اعمال می‌شود.
+    query_budget سقف تعداد کوئری هر action است و در صورت فعال بودن
+    QUERY_BUDGET_ENFORCE (پیش‌فرض: DEBUG) تجاوز از آن لاگ می‌شود.
+    """
+
+    select_related_map = {}
+    prefetch_related_map = {}
+    query_budget = {}
+
+    def _planned(self, mapping):
+        action = getattr(self, "action", None)
+        fields = list(mapping.get("*", ()))
+        fields += [f for f in mapping.get(action, ()) if f not in fields]
+        return fields
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        select_related = self._planned(self.select_related_map)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        prefetch_related = self._planned(self.prefetch_related_map)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+    def get_query_budget(self):
+        return self.query_budget.get(getattr(self, "action", None))
+
+    def dispatch(self, request, *args, **kwargs):
+        if not getattr(settings, "QUERY_BUDGET_ENFORCE", settings.DEBUG):
+            return super().dispatch(request, *args, **kwargs)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = super().dispatch(request, *args, **kwargs)
+
+        # action فقط پس از initialize_request مشخص می‌شود
+        budget = self.get_query_budget()
+        if budget is not None and len(ctx) > budget:
+            logger.warning(
+                "Query budget exceeded for %s.%s: %d queries (budget %d)",
+                self.__class__.__name__,
+                self.action,
+                len(ctx),
+                budget,
+            )
+        return response
@@ -0,0 +1,62 @@
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - وابستگی اختیاری
+    orjson = None
+
+# تاریخ‌ها و Decimal به encoder خود DRF سپرده می‌شوند تا خروجی با JSONRenderer یکسان بماند
+_ORJSON_OPTIONS = (
+    (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer سریع‌تر: با orjson در صورت نصب بودن و در غیر این صورت json استاندارد
+    بدون escape کردن متن فارسی. خروجی همیشه UTF-8 خام و فشرده است.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        renderer_context = renderer_context or {}
+        # خروجی با تورفتگی (مثلا Browsable API) همان مسیر قبلی DRF را می‌رود
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if orjson is not None:
+            return orjson.dumps(data, default=self._default, option=_ORJSON_OPTIONS)
+        return json.dumps(
+            data,
+            cls=self.encoder_class,
+            ensure_ascii=False,
+            separators=(",", ":"),
+            allow_nan=not self.strict,
+        ).encode("utf-8")
+
+    def _default(self, obj):
+        return self.encoder_class().default(obj)
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        try:
+            body = stream.read()
+            if encoding.lower().replace("-", "") != "utf8":
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
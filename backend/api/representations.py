@@ -0,0 +1,204 @@
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# فیلدهایی که مقدار values() را بدون تغییر برمی‌گردانند
+PASSTHROUGH_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.ChoiceField,
+    serializers.FloatField,
+)
+# فیلدهایی که to_representation آنها روی مقدار خام ستون درست کار می‌کند
+CONVERTED_FIELDS = (
+    serializers.DateTimeField,
+    serializers.DateField,
+    serializers.TimeField,
+    serializers.DecimalField,
+    serializers.UUIDField,
+)
+
+
+def _file_converter(field, model_field):
+    storage = model_field.storage
+
+    def convert(name, request):
+        if not name:
+            return None
+        if not getattr(field, "use_url", True):
+            return name
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    return convert
+
+
+def _field_converter(field):
+    to_representation = field.to_representation
+
+    def convert(value, request):
+        return to_representation(value)
+
+    return convert
+
+
+def _datetime_converter(field):
+    """
+    همان خروجی DateTimeField.to_representation؛ منطقه زمانی یک بار برای هر درخواست
+    خوانده می‌شود نه برای هر مقدار.
+    """
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return _field_converter(field)
+    to_representation = field.to_representation
+
+    def convert(value, request):
+        if not isinstance(value, datetime) or value.tzinfo is None:
+            return to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+    return convert
+
+
+class ValuesRepresentation:
+    """
+    نمایش فشرده لیست که یک بار از سریالایزر کامل ساخته می‌شود و سپس ردیف‌های
+    values() را بدون ساخت نمونه مدل و بدون فراخوانی فیلدهای DRF به dict تبدیل می‌کند.
+    خروجی (کلیدها، ترتیب و قالب مقادیر) با سریالایزر کامل یکسان است.
+    """
+
+    def __init__(self, paths, columns):
+        self.paths = paths
+        self.columns = columns
+
+    @classmethod
+    def compile(cls, serializer, model, prefix=""):
+        """
+        None اگر سریالایزر فیلدی داشته باشد که از values() قابل ساخت نیست
+        (SerializerMethodField، property، source='*' و ...).
+        """
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        paths, columns = [], []
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            attrs = field.source_attrs
+            if len(attrs) != 1 or isinstance(field, serializers.SerializerMethodField):
+                return None
+            try:
+                model_field = model._meta.get_field(attrs[0])
+            except FieldDoesNotExist:
+                return None
+            if not model_field.concrete or model_field.many_to_many:
+                return None
+            path = prefix + model_field.name
+
+            if isinstance(field, serializers.ModelSerializer):
+                nested = cls.compile(field, model_field.related_model, prefix=f"{path}__")
+                if nested is None:
+                    return None
+                paths.append(path)
+                paths += nested.paths
+                columns.append((field.field_name, path, nested))
+                continue
+
+            if isinstance(field, serializers.FileField):
+                converter = _file_converter(field, model_field)
+            elif isinstance(field, serializers.PrimaryKeyRelatedField):
+                if field.pk_field is not None:
+                    return None
+                converter = None
+            elif isinstance(field, PASSTHROUGH_FIELDS):
+                converter = None
+            elif isinstance(field, serializers.DateTimeField):
+                converter = _datetime_converter(field)
+            elif isinstance(field, CONVERTED_FIELDS):
+                converter = _field_converter(field)
+            else:
+                return None
+            paths.append(path)
+            columns.append((field.field_name, path, converter))
+        return cls(paths, columns)
+
+    def row(self, values, request):
+        data = {}
+        for name, path, converter in self.columns:
+            value = values[path]
+            if value is None:
+                data[name] = None
+            elif isinstance(converter, ValuesRepresentation):
+                data[name] = converter.row(values, request)
+            elif converter is None:
+                data[name] = value
+            else:
+                data[name] = converter(value, request)
+        return data
+
+
+class _RepresentedRows:
+    def __init__(self, representation, rows, request):
+        self.representation = representation
+        self.rows = rows
+        self.request = request
+
+    @property
+    def data(self):
+        return [self.representation.row(values, self.request) for values in self.rows]
+
+
+class ListRepresentationMixin:
+    """
+    در action لیست، queryset پیش از صفحه‌بندی به values() تبدیل می‌شود و
+    get_serializer(page, many=True) به جای سریالایزر کامل نمایش فشرده را برمی‌گرداند.
+    برای ایجاد، ویرایش و جزئیات همان سریالایزر کامل استفاده می‌شود.
+    """
+
+    use_list_representation = True
+
+    def get_list_representation(self):
+        if not hasattr(self, "_list_representation"):
+            representation = None
+            if self.use_list_representation and getattr(self, "action", None) == "list":
+                representation = ValuesRepresentation.compile(
+                    super().get_serializer(), self.get_queryset().model
+                )
+            self._list_representation = representation
+        return self._list_representation
+
+    def get_list_value_keys(self):
+        """
+        ستون‌هایی که جدا از نمایش در ردیف‌های values() لازم‌اند؛ در خروجی نمی‌آیند.
+        """
+        return []
+
+    def _as_values(self, queryset, representation):
+        # کلیدهای صفحه‌بندی cursor هم در ردیف‌ها لازم‌اند
+        keys = ["pk"]
+        if any(f.name == "created_at" for f in queryset.model._meta.concrete_fields):
+            keys.append("created_at")
+        keys += self.get_list_value_keys()
+        return queryset.values(*dict.fromkeys(keys + representation.paths))
+
+    def paginate_queryset(self, queryset):
+        representation = self.get_list_representation()
+        if representation is not None and isinstance(queryset, QuerySet):
+            queryset = self._as_values(queryset, representation)
+        return super().paginate_queryset(queryset)
+
+    def get_serializer(self, *args, **kwargs):
+        representation = self.get_list_representation() if kwargs.get("many") else None
+        if representation is None or not args:
+            return super().get_serializer(*args, **kwargs)
+        rows = args[0]
+        if isinstance(rows, QuerySet):
+            rows = self._as_values(rows, representation)
+        elif rows and not isinstance(rows[0], dict):
+            return super().get_serializer(*args, **kwargs)
+        return _RepresentedRows(representation, rows, self.request)
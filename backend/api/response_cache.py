@@ -0,0 +1,155 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import metrics
+from .db_router import read_from_replicas
+
+CACHED_ACTIONS = ("list", "retrieve")
+# اعتبارسنج‌های ConditionalRequestMixin همراه پاسخ کش می‌شوند
+CACHED_HEADERS = ("ETag", "Last-Modified")
+
+# این backendها به یک فرایند محدودند؛ نسلی که یک worker افزایش می‌دهد به بقیه نمی‌رسد
+PROCESS_LOCAL_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def _alias():
+    return getattr(settings, "API_RESPONSE_CACHE_ALIAS", "default")
+
+
+def _cache():
+    return caches[_alias()]
+
+
+def is_shared_cache(alias):
+    """
+    آیا backend کش بین همه workerها مشترک است (Redis، فایل، Memcached و ...).
+    """
+    return settings.CACHES.get(alias, {}).get("BACKEND") not in PROCESS_LOCAL_BACKENDS
+
+
+def response_cache_enabled():
+    return is_shared_cache(_alias())
+
+
+def _list_generation_key(model):
+    return f"api:resp-gen:{model._meta.label_lower}"
+
+
+def _object_generation_key(model, pk):
+    return f"api:resp-gen:{model._meta.label_lower}:{pk}"
+
+
+def _bump(key):
+    cache = _cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def invalidate_model_responses(model, pk=None):
+    """
+    باطل کردن پاسخ‌های کش شده: همه لیست‌های مدل و در صورت وجود pk، جزئیات همان رکورد.
+    """
+    if not response_cache_enabled():
+        return
+    _bump(_list_generation_key(model))
+    if pk is not None:
+        _bump(_object_generation_key(model, pk))
+
+
+class _CachedResponse(Exception):
+    def __init__(self, data):
+        self.data = data
+
+
+class ResponseCacheMixin:
+    """
+    کش پاسخ‌های list و retrieve برای کاربران احراز هویت شده.
+
+    کلید شامل شماره نسل مدل (برای list) یا نسل رکورد (برای retrieve) و آدرس کامل
+    درخواست با پارامترهای جستجو و صفحه است؛ سیگنال‌های post_save/post_delete
+    نسل‌ها را افزایش می‌دهند و نیازی به حذف تک‌تک کلیدها نیست. با backend محلی هر
+    فرایند (LocMem) کش غیرفعال است، چون باطل‌سازی به workerهای دیگر نمی‌رسد.
+
+    پاسخی که در کش ذخیره می‌شود از primary خوانده می‌شود؛ در غیر این صورت داده
+    قدیمی replica پس از افزایش نسل زیر نسل جدید کش می‌شد.
+    """
+
+    response_cache_timeout = None
+
+    def get_response_cache_timeout(self):
+        if self.response_cache_timeout is not None:
+            return self.response_cache_timeout
+        return getattr(settings, "API_RESPONSE_CACHE_TIMEOUT", 300)
+
+    def dispatch(self, request, *args, **kwargs):
+        if not response_cache_enabled():
+            return super().dispatch(request, *args, **kwargs)
+        with read_from_replicas(False):
+            return super().dispatch(request, *args, **kwargs)
+
+    def _response_cache_key(self, request):
+        model = self.get_queryset().model
+        cache = _cache()
+        if self.action == "retrieve":
+            lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+            generation_key = _object_generation_key(model, lookup)
+        else:
+            generation_key = _list_generation_key(model)
+        generation = cache.get_or_set(generation_key, 1, None)
+        digest = hashlib.md5(
+            f"{request.get_host()}{request.get_full_path()}:{request.accepted_media_type}".encode()
+        ).hexdigest()
+        return f"api:response:{model._meta.label_lower}:{self.action}:{generation}:{digest}"
+
+    def _record_cache_result(self, result):
+        metrics.registry.inc(
+            metrics.RESPONSE_CACHE,
+            {"viewset": type(self).__name__, "action": self.action, "result": result},
+        )
+
+    def initial(self, request, *args, **kwargs):
+        # پس از احراز هویت و بررسی مجوز؛ پاسخ کش شده هرگز به کاربر ناشناس داده نمی‌شود
+        super().initial(request, *args, **kwargs)
+        self._response_cache_key_value = None
+        if request.method != "GET" or self.action not in CACHED_ACTIONS or not response_cache_enabled():
+            return
+        key = self._response_cache_key(request)
+        data = _cache().get(key)
+        if data is not None:
+            self._record_cache_result("hit")
+            raise _CachedResponse(data)
+        self._record_cache_result("miss")
+        self._response_cache_key_value = key
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _CachedResponse):
+            data, headers = exc.data
+            etags = parse_etags(self.request.headers.get("If-None-Match", ""))
+            if "ETag" in headers and (headers["ETag"] in etags or "*" in etags):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = Response(data)
+            for name, value in headers.items():
+                response[name] = value
+            response["X-Cache"] = "HIT"
+            return response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, "_response_cache_key_value", None)
+        if key is not None and response.status_code == 200 and not response.exception:
+            headers = {name: response[name] for name in CACHED_HEADERS if response.has_header(name)}
+            _cache().set(key, (response.data, headers), self.get_response_cache_timeout())
+            response["X-Cache"] = "MISS"
+        return response
@@ -0,0 +1,390 @@
+import logging
+import re
+from collections import namedtuple
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import BooleanField, F, FloatField, Func, OuterRef, Subquery, Value
+from django.utils.module_loading import import_string
+from rest_framework.filters import SearchFilter
+
+from .models import (
+    Association,
+    CharityCenter,
+    GovernmentOrganization,
+    MedicalCenter,
+    SearchDocument,
+    ServiceCenter,
+    privateCompany,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# --- نرمال‌سازی متن فارسی ---
+
+_CHAR_MAP = str.maketrans(
+    {
+        "ي": "ی",
+        "ى": "ی",
+        "ئ": "ی",
+        "ك": "ک",
+        "ة": "ه",
+        "ۀ": "ه",
+        "أ": "ا",
+        "إ": "ا",
+        "آ": "ا",
+        "ؤ": "و",
+        **{chr(0x06F0 + i): str(i) for i in range(10)},  # ارقام فارسی
+        **{chr(0x0660 + i): str(i) for i in range(10)},  # ارقام عربی
+    }
+)
+# اعراب، تطویل و کاراکترهای کنترلی بدون عرض (از جمله نیم‌فاصله)
+_STRIP_RE = re.compile("[\u064B-\u065F\u0670\u0640\u200B-\u200F\u2066-\u2069\uFEFF]")
+_NON_WORD_RE = re.compile(r"[^\w\s]+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(value):
+    """
+    یکسان‌سازی ی/ک عربی و فارسی، حذف اعراب و نیم‌فاصله و تبدیل ارقام.
+    متن نمایه و عبارت جستجو هر دو با همین تابع نرمال می‌شوند.
+    """
+    if not value:
+        return ""
+    value = _STRIP_RE.sub("", str(value).translate(_CHAR_MAP)).lower()
+    value = _NON_WORD_RE.sub(" ", value)
+    return _SPACE_RE.sub(" ", value).strip()
+
+
+def tokenize(value):
+    return normalize_text(value).split()
+
+
+# --- ثبت مدل‌های قابل جستجو ---
+
+
+@dataclass(frozen=True)
+class SearchSpec:
+    kind: str
+    title_field: str
+    fields: tuple
+
+
+SEARCH_REGISTRY = {}
+
+
+def register(model, kind, fields, title_field="name"):
+    SEARCH_REGISTRY[model] = SearchSpec(kind=kind, title_field=title_field, fields=tuple(fields))
+
+
+register(
+    ServiceCenter,
+    "service-center",
+    ["name", "serviceCategory", "detailedServices", "state", "city", "county"],
+)
+register(MedicalCenter, "medical-center", ["name", "type", "services", "state", "city", "county"])
+register(
+    CharityCenter,
+    "charity-center",
+    ["name", "type", "mainActivityArea", "state", "city", "county"],
+)
+register(
+    GovernmentOrganization,
+    "government-organization",
+    ["name", "parentMinistryOrBody", "type", "activityArea", "state", "city", "county"],
+)
+register(Association, "association", ["name", "type", "mainActivityArea", "state", "city", "county"])
+register(
+    privateCompany,
+    "private-company",
+    ["name", "activity", "specializedArea", "scopeActivity", "state", "city", "county"],
+)
+
+
+def document_body(instance, spec):
+    return normalize_text(" ".join(str(getattr(instance, f) or "") for f in spec.fields))
+
+
+# --- موتورهای جستجو ---
+
+SearchHit = namedtuple("SearchHit", ["kind", "object_id", "score", "title", "state", "city"])
+
+
+class SQLFragment(Func):
+    """
+    قطعه SQL خام که عبارت‌های ORM در آن با {0}، {1}، ... جای‌گذاری می‌شوند؛ نام جدول
+    عبارت‌ها هنگام استفاده در زیرکوئری (U0 و ...) درست برچسب‌گذاری می‌شود.
+    """
+
+    def __init__(self, sql, *expressions, output_field):
+        super().__init__(*expressions, output_field=output_field)
+        self.sql = sql
+
+    def as_sql(self, compiler, connection, **extra_context):
+        parts, params = [], []
+        for expression in self.get_source_expressions():
+            sql, expression_params = compiler.compile(expression)
+            parts.append(sql)
+            params.extend(expression_params)
+        return self.sql.format(*parts), params
+
+
+class DatabaseSearchBackend:
+    """
+    موتور پایه که روی هر پایگاه داده‌ای کار می‌کند؛ جستجو روی متن نرمال شده
+    جدول SearchDocument انجام می‌شود ولی از ایندکس متنی بهره نمی‌برد.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        self.connection = connections[using]
+
+    def setup(self):
+        """
+        ساخت جدول یا ایندکس موتور؛ فقط بعد از migrate و در rebuild_search_index اجرا
+        می‌شود، نه هنگام درخواست‌ها.
+        """
+
+    def is_available(self):
+        return True
+
+    def index_document(self, document):
+        pass
+
+    def remove_documents(self, ids):
+        pass
+
+    def documents(self, term, kinds=None):
+        """
+        سندهای منطبق با امتیاز rank (بزرگتر یعنی مرتبط‌تر). خروجی QuerySet است تا
+        بدون سقف تعداد نتایج به عنوان زیرکوئری در فیلتر مدل‌ها استفاده شود.
+        """
+        tokens = tokenize(term)
+        queryset = SearchDocument.objects.using(self.using)
+        if not tokens:
+            return queryset.none()
+        if kinds:
+            queryset = queryset.filter(kind__in=kinds)
+        return self.match(queryset, tokens)
+
+    def match(self, queryset, tokens):
+        for token in tokens:
+            queryset = queryset.filter(body__contains=token)
+        return queryset.annotate(rank=Value(0.0, output_field=FloatField()))
+
+    def search(self, term, kinds=None, limit=100):
+        rows = self.documents(term, kinds).order_by("-rank", "-created_at").values_list(
+            "kind", "object_id", "rank", "title", "state", "city"
+        )[:limit]
+        return [SearchHit(*row) for row in rows]
+
+
+class SQLiteFTS5Backend(DatabaseSearchBackend):
+    table = f"{SearchDocument._meta.db_table}_fts"
+
+    def setup(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                "USING fts5(body, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+
+    def is_available(self):
+        with self.connection.cursor() as cursor:
+            return self.table in self.connection.introspection.table_names(cursor)
+
+    def index_document(self, document):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [document.pk])
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, body) VALUES (%s, %s)",
+                [document.pk, document.body],
+            )
+
+    def remove_documents(self, ids):
+        if not ids:
+            return
+        placeholders = ", ".join(["%s"] * len(ids))
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})", ids)
+
+    def match(self, queryset, tokens):
+        # هر توکن به صورت پیشوندی و همه توکن‌ها با AND
+        query = Value(" ".join(f'"{token}"*' for token in tokens))
+        table = self.table
+        matched = SQLFragment(
+            "{0} IN (SELECT rowid FROM %s WHERE %s MATCH {1})" % (table, table),
+            F("id"),
+            query,
+            output_field=BooleanField(),
+        )
+        # bm25 هرچه کوچکتر، مرتبط‌تر
+        rank = SQLFragment(
+            "(SELECT -bm25(%s) FROM %s WHERE %s MATCH {1} AND rowid = {0})" % (table, table, table),
+            F("id"),
+            query,
+            output_field=FloatField(),
+        )
+        return queryset.filter(matched).annotate(rank=rank)
+
+
+class PostgresSearchBackend(DatabaseSearchBackend):
+    config = "simple"
+
+    def setup(self):
+        table = SearchDocument._meta.db_table
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_body_tsv ON {table} "
+                f"USING gin (to_tsvector('{self.config}', body))"
+            )
+
+    def match(self, queryset, tokens):
+        query = Value(" & ".join(f"{token}:*" for token in tokens))
+        vector = f"to_tsvector('{self.config}', {{0}})"
+        tsquery = f"to_tsquery('{self.config}', {{1}})"
+        matched = SQLFragment(f"{vector} @@ {tsquery}", F("body"), query, output_field=BooleanField())
+        rank = SQLFragment(f"ts_rank({vector}, {tsquery})", F("body"), query, output_field=FloatField())
+        return queryset.filter(matched).annotate(rank=rank)
+
+
+VENDOR_BACKENDS = {
+    "sqlite": SQLiteFTS5Backend,
+    "postgresql": PostgresSearchBackend,
+}
+
+_backends = {}
+
+
+def _backend_class(using):
+    path = getattr(settings, "API_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)
+    return VENDOR_BACKENDS.get(connections[using].vendor, DatabaseSearchBackend)
+
+
+def install_backend(using=None):
+    """
+    ساخت جدول FTS5 یا ایندکس GIN برای پایگاه داده using؛ از post_migrate و دستور
+    rebuild_search_index صدا زده می‌شود.
+    """
+    using = using or router.db_for_write(SearchDocument)
+    backend_class = _backend_class(using)
+    try:
+        backend_class(using).setup()
+    except DatabaseError:
+        logger.warning("%s could not be installed on %s", backend_class.__name__, using)
+    _backends.pop(using, None)
+
+
+def get_backend(using=None):
+    """
+    موتور جستجو بر اساس تنظیم API_SEARCH_BACKEND یا نوع پایگاه داده انتخاب می‌شود.
+    اگر موتور اختصاصی نصب نشده باشد (migrate اجرا نشده یا SQLite بدون FTS5) از موتور
+    پایه استفاده می‌شود. اینجا هیچ DDL اجرا نمی‌شود.
+    """
+    using = using or router.db_for_write(SearchDocument)
+    if using in _backends:
+        return _backends[using]
+
+    backend_class = _backend_class(using)
+    backend = backend_class(using)
+    try:
+        available = backend.is_available()
+    except DatabaseError:
+        available = False
+    if not available:
+        logger.warning("%s not installed, using the basic search backend", backend_class.__name__)
+        backend = DatabaseSearchBackend(using)
+    _backends[using] = backend
+    return backend
+
+
+# --- همگام‌سازی نمایه ---
+
+
+def index_instance(instance):
+    spec = SEARCH_REGISTRY.get(type(instance))
+    if spec is None:
+        return
+    backend = get_backend()
+    with transaction.atomic(using=backend.using):
+        document, _ = SearchDocument.objects.using(backend.using).update_or_create(
+            kind=spec.kind,
+            object_id=instance.pk,
+            defaults={
+                "title": str(getattr(instance, spec.title_field) or "")[:512],
+                "state": getattr(instance, "state", None) or "",
+                "city": getattr(instance, "city", None) or "",
+                "body": document_body(instance, spec),
+            },
+        )
+        backend.index_document(document)
+
+
+def remove_instance(model, pk):
+    spec = SEARCH_REGISTRY.get(model)
+    if spec is None:
+        return
+    backend = get_backend()
+    documents = SearchDocument.objects.using(backend.using).filter(kind=spec.kind, object_id=pk)
+    with transaction.atomic(using=backend.using):
+        backend.remove_documents(list(documents.values_list("pk", flat=True)))
+        documents.delete()
+
+
+def rebuild_index(models=None):
+    backend = get_backend()
+    total = 0
+    for model, spec in SEARCH_REGISTRY.items():
+        if models and model not in models:
+            continue
+        with transaction.atomic(using=backend.using):
+            stale = SearchDocument.objects.using(backend.using).filter(kind=spec.kind)
+            backend.remove_documents(list(stale.values_list("pk", flat=True)))
+            stale.delete()
+        for instance in model.objects.iterator(chunk_size=500):
+            index_instance(instance)
+            total += 1
+    return total
+
+
+def search_all(term, kinds=None, limit=20):
+    """
+    جستجوی ترکیبی روی همه مدل‌های ثبت شده با یک کوئری روی نمایه.
+    """
+    return get_backend().search(term, kinds or None, limit)
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    جایگزین SearchFilter برای مدل‌های ثبت شده در نمایه جستجو.
+    نتایج به ترتیب میزان ارتباط مرتب می‌شوند؛ برای مدل‌های ثبت نشده یا
+    در صورت خطای موتور جستجو، رفتار SearchFilter حفظ می‌شود.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, "").strip()
+        if not term or queryset.model not in SEARCH_REGISTRY:
+            return super().filter_queryset(request, queryset, view)
+
+        # نمایه روی همان پایگاه داده‌ای خوانده می‌شود که لیست از آن خوانده می‌شود (مثلا
+        # replica)؛ زیرکوئری بین دو پایگاه داده ممکن نیست. queryset.db با هر بار خواندن
+        # ممکن است replica دیگری انتخاب کند، پس یک بار ثابت می‌شود
+        using = queryset.db
+        queryset = queryset.using(using)
+        try:
+            documents = get_backend().documents(term, [SEARCH_REGISTRY[queryset.model].kind]).using(using)
+        except DatabaseError:
+            logger.exception("Full-text search failed, falling back to SearchFilter")
+            return super().filter_queryset(request, queryset, view)
+
+        # فیلتر با زیرکوئری روی نمایه، بدون سقف تعداد؛ شمارش و صفحه‌بندی دقیق می‌مانند
+        rank = documents.filter(object_id=OuterRef("pk")).values("rank")[:1]
+        return (
+            queryset.filter(pk__in=documents.values("object_id"))
+            .annotate(search_rank=Subquery(rank, output_field=FloatField()))
+            .order_by(F("search_rank").desc(), *queryset.query.order_by)
+        )
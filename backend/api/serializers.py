@@ -1,10 +1,43 @@
+import logging
+
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError as DjangoValidationError
 from .models import *
+from .accounts import activation_user, get_or_provision_user
+from .fieldsets import SparseFieldsetMixin
+from .identity import max_lookup_codes, resolve
 
 User = get_user_model()
+logger = logging.getLogger("api.serializers")
+
+INVALID_ACTIVATION_TOKEN = 'توکن فعال‌سازی نامعتبر یا منقضی شده است'
+
+# فیلدهای کاربر که همراه پروفایل‌های شخص (بیمار، خیر، ...) ارسال می‌شوند
+USER_PROFILE_FIELDS = (
+    'first_name', 'last_name', 'phone_number', 'gender', 'state', 'city',
+    'county', 'homeAddress', 'howKnow', 'education', 'userType',
+)
+
 
-class CustomUserSerializer(serializers.ModelSerializer):
+def pop_user_data(validated_data):
+    """
+    فیلدهای کاربر را از داده‌های اعتبارسنجی شده جدا کرده و آرگومان‌های ساخت کاربر را برمی‌گرداند.
+    """
+    national_code_str = validated_data.pop('national_code')
+    user_data = {
+        'username': national_code_str,
+        'email': f"{national_code_str}@example.com",
+        'national_code': national_code_str,
+        'job': None,
+        'jobAddress': None,
+    }
+    for field in USER_PROFILE_FIELDS:
+        user_data[field] = validated_data.pop(field)
+    return user_data
+
+class CustomUserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = [
@@ -13,7 +46,7 @@ class CustomUserSerializer(serializers.ModelSerializer):
             'homeAddress', 'jobAddress', 'howKnow', 'education', 'userType'
         ]
 
-class PatientSerializer(serializers.ModelSerializer):
+class PatientSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # فیلدهای کاربر
     first_name = serializers.CharField(write_only=True, required=True)
     last_name = serializers.CharField(write_only=True, required=True)
@@ -50,40 +83,14 @@ class PatientSerializer(serializers.ModelSerializer):
         ]
     
     def create(self, validated_data):
-        # استخراج کد ملی به صورت رشته
-        national_code_str = validated_data.pop('national_code')
+        user_data = pop_user_data(validated_data)
         
-        # اطلاعات کاربر
-        user_data = {
-            'username': national_code_str,
-            'password': national_code_str,  # پسورد اولیه
-            'email': f"{national_code_str}@example.com",  # ایمیل پیش‌فرض
-            'first_name': validated_data.pop('first_name'),
-            'last_name': validated_data.pop('last_name'),
-            'phone_number': validated_data.pop('phone_number'),
-            'national_code': national_code_str,
-            'gender': validated_data.pop('gender'),
-            'state': validated_data.pop('state'),
-            'city': validated_data.pop('city'),
-            'county': validated_data.pop('county'),
-            'homeAddress': validated_data.pop('homeAddress'),
-            'howKnow': validated_data.pop('howKnow'),
-            'education': validated_data.pop('education'),
-            'userType': validated_data.pop('userType'),
-            'job': None,
-            'jobAddress': None,
-        }
-        
-        # بررسی وجود کاربر با کد ملی یکسان
+        # بررسی وجود کاربر با کد ملی یکسان یا ایجاد کاربر جدید
         try:
-            user = User.objects.get(national_code=national_code_str)
-        except User.DoesNotExist:
-            # ایجاد کاربر جدید
-            try:
-                user = User.objects.create_user(**user_data)
-            except Exception as e:
-                print(f"Error creating user: {str(e)}")
-                raise serializers.ValidationError({"error": f"خطا در ایجاد کاربر: {str(e)}"})
+            user = get_or_provision_user(user_data)
+        except Exception as e:
+            logger.exception("user provisioning failed")
+            raise serializers.ValidationError({"error": f"خطا در ایجاد کاربر: {str(e)}"})
         
         # ایجاد بیمار با ارجاع به کاربر
         try:
@@ -93,11 +100,11 @@ class PatientSerializer(serializers.ModelSerializer):
             )
             return patient_instance
         except Exception as e:
-            print(f"Error creating patient: {str(e)}")
+            logger.exception("patient create failed")
             raise serializers.ValidationError({"error": f"خطا در ایجاد بیمار: {str(e)}"})
 
 
-class BenefactorPersonSerializer(serializers.ModelSerializer):
+class BenefactorPersonSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # فیلدهای کاربر
     first_name = serializers.CharField(write_only=True, required=True)
     last_name = serializers.CharField(write_only=True, required=True)
@@ -126,36 +133,10 @@ class BenefactorPersonSerializer(serializers.ModelSerializer):
         ]
     
     def create(self, validated_data):
-        # استخراج کد ملی به صورت رشته
-        national_code_str = validated_data.pop('national_code')
-        
-        # اطلاعات کاربر
-        user_data = {
-            'username': national_code_str,
-            'password': national_code_str,
-            'email': f"{national_code_str}@example.com",
-            'first_name': validated_data.pop('first_name'),
-            'last_name': validated_data.pop('last_name'),
-            'phone_number': validated_data.pop('phone_number'),
-            'national_code': national_code_str,
-            'gender': validated_data.pop('gender'),
-            'state': validated_data.pop('state'),
-            'city': validated_data.pop('city'),
-            'county': validated_data.pop('county'),
-            'homeAddress': validated_data.pop('homeAddress'),
-            'howKnow': validated_data.pop('howKnow'),
-            'education': validated_data.pop('education'),
-            'userType': validated_data.pop('userType'),
-            'job': None,
-            'jobAddress': None,
-        }
+        user_data = pop_user_data(validated_data)
         
-        # بررسی وجود کاربر با کد ملی یکسان
-        try:
-            user = User.objects.get(national_code=national_code_str)
-        except User.DoesNotExist:
-            # ایجاد کاربر جدید
-            user = User.objects.create_user(**user_data)
+        # بررسی وجود کاربر با کد ملی یکسان یا ایجاد کاربر جدید
+        user = get_or_provision_user(user_data)
         
         # ایجاد فرد خیر
         benefactor_instance = benefactorPerson.objects.create(
@@ -165,7 +146,7 @@ class BenefactorPersonSerializer(serializers.ModelSerializer):
         return benefactor_instance
     
 
-class HealthAssistPersonSerializer(serializers.ModelSerializer):
+class HealthAssistPersonSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # فیلدهای کاربر
     first_name = serializers.CharField(write_only=True, required=True)
     last_name = serializers.CharField(write_only=True, required=True)
@@ -196,36 +177,10 @@ class HealthAssistPersonSerializer(serializers.ModelSerializer):
         ]
     
     def create(self, validated_data):
-        # استخراج کد ملی به صورت رشته
-        national_code_str = validated_data.pop('national_code')
+        user_data = pop_user_data(validated_data)
         
-        # اطلاعات کاربر
-        user_data = {
-            'username': national_code_str,
-            'password': national_code_str,
-            'email': f"{national_code_str}@example.com",
-            'first_name': validated_data.pop('first_name'),
-            'last_name': validated_data.pop('last_name'),
-            'phone_number': validated_data.pop('phone_number'),
-            'national_code': national_code_str,
-            'gender': validated_data.pop('gender'),
-            'state': validated_data.pop('state'),
-            'city': validated_data.pop('city'),
-            'county': validated_data.pop('county'),
-            'homeAddress': validated_data.pop('homeAddress'),
-            'howKnow': validated_data.pop('howKnow'),
-            'education': validated_data.pop('education'),
-            'userType': validated_data.pop('userType'),
-            'job': None,
-            'jobAddress': None,
-        }
-        
-        # بررسی وجود کاربر با کد ملی یکسان
-        try:
-            user = User.objects.get(national_code=national_code_str)
-        except User.DoesNotExist:
-            # ایجاد کاربر جدید
-            user = User.objects.create_user(**user_data)
+        # بررسی وجود کاربر با کد ملی یکسان یا ایجاد کاربر جدید
+        user = get_or_provision_user(user_data)
         
         # ایجاد شخص سلامت‌یار
         health_assist_instance = healthAssistPerson.objects.create(
@@ -234,7 +189,7 @@ class HealthAssistPersonSerializer(serializers.ModelSerializer):
         )
         return health_assist_instance
 
-class DoctorSerializer(serializers.ModelSerializer):
+class DoctorSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # فیلدهای کاربر
     first_name = serializers.CharField(write_only=True, required=True)
     last_name = serializers.CharField(write_only=True, required=True)
@@ -265,36 +220,10 @@ class DoctorSerializer(serializers.ModelSerializer):
         ]
     
     def create(self, validated_data):
-        # استخراج کد ملی به صورت رشته
-        national_code_str = validated_data.pop('national_code')
+        user_data = pop_user_data(validated_data)
         
-        # اطلاعات کاربر
-        user_data = {
-            'username': national_code_str,
-            'password': national_code_str,
-            'email': f"{national_code_str}@example.com",
-            'first_name': validated_data.pop('first_name'),
-            'last_name': validated_data.pop('last_name'),
-            'phone_number': validated_data.pop('phone_number'),
-            'national_code': national_code_str,
-            'gender': validated_data.pop('gender'),
-            'state': validated_data.pop('state'),
-            'city': validated_data.pop('city'),
-            'county': validated_data.pop('county'),
-            'homeAddress': validated_data.pop('homeAddress'),
-            'howKnow': validated_data.pop('howKnow'),
-            'education': validated_data.pop('education'),
-            'userType': validated_data.pop('userType'),
-            'job': None,
-            'jobAddress': None,
-        }
-        
-        # بررسی وجود کاربر با کد ملی یکسان
-        try:
-            user = User.objects.get(national_code=national_code_str)
-        except User.DoesNotExist:
-            # ایجاد کاربر جدید
-            user = User.objects.create_user(**user_data)
+        # بررسی وجود کاربر با کد ملی یکسان یا ایجاد کاربر جدید
+        user = get_or_provision_user(user_data)
         
         # ایجاد پزشک
         doctor_instance = doctor.objects.create(
@@ -303,7 +232,7 @@ class DoctorSerializer(serializers.ModelSerializer):
         )
         return doctor_instance
 
-class PrivateCompanySerializer(serializers.ModelSerializer):
+class PrivateCompanySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = privateCompany
         fields = [
@@ -333,7 +262,7 @@ class PrivateCompanySerializer(serializers.ModelSerializer):
         
         return data
 
-class PatientServiceRequestSerializer(serializers.ModelSerializer):
+class PatientServiceRequestSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     national_code = serializers.CharField(write_only=True)
     
     user = CustomUserSerializer(source='national_code', read_only=True)
@@ -348,10 +277,10 @@ class PatientServiceRequestSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         national_code_str = validated_data.pop('national_code')
         
-        try:
-            user = customUser.objects.get(national_code=national_code_str)
-        except customUser.DoesNotExist:
+        identity = resolve(national_code_str)
+        if identity is None:
             raise serializers.ValidationError({"error": "کاربر با این کد ملی یافت نشد"})
+        user = identity.user
         
         service_request = patientServicRequest.objects.create(
             national_code=user,
@@ -369,37 +298,37 @@ class PatientServiceRequestSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-class ServiceCenterSerializer(serializers.ModelSerializer):
+class ServiceCenterSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = ServiceCenter
         fields = '__all__'
         read_only_fields = ['created_at']
 
-class MedicalCenterSerializer(serializers.ModelSerializer):
+class MedicalCenterSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = MedicalCenter
         fields = '__all__'
         read_only_fields = ['created_at']
 
-class CharityCenterSerializer(serializers.ModelSerializer):
+class CharityCenterSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = CharityCenter
         fields = '__all__'
         read_only_fields = ['created_at']
 
-class GovernmentOrganizationSerializer(serializers.ModelSerializer):
+class GovernmentOrganizationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = GovernmentOrganization
         fields = '__all__'
         read_only_fields = ['created_at']
 
-class AssociationSerializer(serializers.ModelSerializer):
+class AssociationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Association
         fields = '__all__'
         read_only_fields = ['created_at']
 
-class ConsultationRequestSerializer(serializers.ModelSerializer):
+class ConsultationRequestSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = CustomUserSerializer(read_only=True)
     national_code = serializers.CharField(write_only=True, required=True)
 
@@ -413,15 +342,47 @@ class ConsultationRequestSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         national_code = validated_data.pop('national_code')
-        User = get_user_model()
-        try:
-            user = User.objects.get(national_code=national_code)
-        except User.DoesNotExist:
+        identity = resolve(national_code)
+        if identity is None:
             raise serializers.ValidationError({'national_code': 'بیماری با این کد ملی یافت نشد.'})
 
-        # Check if the user is a patient
-        if not hasattr(user, 'patient'):
+        # نقش‌ها همراه کاربر خوانده شده‌اند و کوئری جداگانه‌ای لازم نیست
+        if not identity.has_role('patient'):
              raise serializers.ValidationError({'national_code': 'کاربر یافت شد اما پروفایل بیمار ندارد.'})
 
-        consultation_request = ConsultationRequest.objects.create(user=user, **validated_data)
-        return consultation_request
\ No newline at end of file
+        consultation_request = ConsultationRequest.objects.create(user=identity.user, **validated_data)
+        return consultation_request
+
+
+class AccountInvitationSerializer(serializers.Serializer):
+    national_code = serializers.CharField()
+
+
+class NationalCodeLookupSerializer(serializers.Serializer):
+    national_codes = serializers.ListField(
+        child=serializers.CharField(max_length=11), allow_empty=False
+    )
+
+    def validate_national_codes(self, value):
+        limit = max_lookup_codes()
+        if len(value) > limit:
+            raise serializers.ValidationError(f'حداکثر {limit} کد ملی در هر درخواست مجاز است')
+        return value
+
+
+class AccountActivationSerializer(serializers.Serializer):
+    national_code = serializers.CharField()
+    token = serializers.CharField()
+    password = serializers.CharField(write_only=True)
+
+    def validate(self, data):
+        # توکن پیش از جستجوی کاربر و اعتبارسنجی رمز بررسی می‌شود و کد ملی ناموجود
+        # همان خطای توکن نامعتبر را می‌گیرد
+        data['user'] = activation_user(data['national_code'], data['token'])
+        if data['user'] is None:
+            raise serializers.ValidationError(INVALID_ACTIVATION_TOKEN)
+        try:
+            validate_password(data['password'], data['user'])
+        except DjangoValidationError as e:
+            raise serializers.ValidationError({'password': list(e.messages)})
+        return data
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.db import router
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+
+from . import search, uploads
+from .counting import invalidate_model_counts
+from .identity import ROLE_MODELS, User, invalidate_identity, national_code_of
+from .models import SearchDocument
+from .response_cache import invalidate_model_responses
+
+
+def _is_api_model(sender):
+    return sender._meta.app_label == "api"
+
+
+@receiver(post_save)
+def invalidate_counts_on_create(sender, instance, created, **kwargs):
+    if created and _is_api_model(sender):
+        invalidate_model_counts(sender)
+
+
+@receiver(post_delete)
+def invalidate_counts_on_delete(sender, instance, **kwargs):
+    if _is_api_model(sender):
+        invalidate_model_counts(sender)
+
+
+@receiver(post_save)
+def update_search_index(sender, instance, **kwargs):
+    if sender in search.SEARCH_REGISTRY and not kwargs.get("raw"):
+        search.index_instance(instance)
+
+
+@receiver(post_delete)
+def remove_from_search_index(sender, instance, **kwargs):
+    if sender in search.SEARCH_REGISTRY:
+        search.remove_instance(sender, instance.pk)
+
+
+@receiver(post_migrate)
+def install_search_backend(sender, using, **kwargs):
+    # جدول FTS5 و ایندکس GIN مدل ندارند؛ بعد از migrate ساخته می‌شوند تا درخواست‌ها DDL اجرا نکنند
+    if sender.label == "api" and router.allow_migrate_model(using, SearchDocument):
+        search.install_backend(using)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_cached_responses(sender, instance, **kwargs):
+    if _is_api_model(sender):
+        invalidate_model_responses(sender, instance.pk)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_cached_identity(sender, instance, **kwargs):
+    if sender is User or sender in ROLE_MODELS.values():
+        national_code = national_code_of(instance)
+        if national_code is not None:
+            invalidate_identity(national_code)
+
+
+@receiver(pre_save)
+def note_new_uploads(sender, instance, raw=False, **kwargs):
+    if _is_api_model(sender) and not raw:
+        instance._new_uploads = uploads.new_uploads(instance)
+
+
+@receiver(post_save)
+def enqueue_upload_processing(sender, instance, **kwargs):
+    # پردازش فایل‌ها در worker؛ درخواست فقط منتظر نوشتن خود فایل روی دیسک است
+    fields = instance.__dict__.pop("_new_uploads", None)
+    if fields:
+        uploads.enqueue_uploads(instance, fields)
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "API_SQLITE_PRAGMAS", {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
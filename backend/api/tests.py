@@ -1,3 +1,965 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, models, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework.throttling import ScopedRateThrottle
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import db_router, identity, imports, jobs, log, metrics, search, uploads
+from .accounts import make_activation_token
+from .management.commands.rekey_user_fks import REKEYED_MODELS
+from .models import ConsultationRequest, Job, ServiceCenter, StoredFile, doctor, patient
+from .query_plan import assert_max_queries, full_scans, plan_checks
+from .urls import router
+
+User = get_user_model()
+
+INVALID_ACTIVATION = {"non_field_errors": ["توکن فعال‌سازی نامعتبر یا منقضی شده است"]}
+
+
+def make_user(national_code, **fields):
+    data = dict(
+        username=national_code,
+        national_code=national_code,
+        phone_number="09120000000",
+        gender="m",
+        state="تهران",
+        city="تهران",
+        county="تهران",
+        homeAddress="-",
+        howKnow="-",
+        education="-",
+        userType="-",
+        first_name="علی",
+        last_name="رضایی",
+    )
+    data.update(fields)
+    return User.objects.create_user(**data)
+
+
+def make(model, using="default", **fields):
+    """
+    رکورد با مقادیر ساختگی برای فیلدهای الزامی؛ مقادیر داده شده جایگزین می‌شوند.
+    """
+    for field in model._meta.concrete_fields:
+        if (
+            field.name in fields
+            or field.primary_key
+            or field.null
+            or field.has_default()
+            or getattr(field, "auto_now", False)
+            or getattr(field, "auto_now_add", False)
+        ):
+            continue
+        if isinstance(field, models.ForeignKey):
+            fields[field.name] = make_user(f"{User.objects.count() + 1:010d}")
+        elif isinstance(field, models.BooleanField):
+            fields[field.name] = False
+        elif isinstance(field, models.IntegerField):
+            fields[field.name] = 1
+        elif isinstance(field, models.DateTimeField):
+            fields[field.name] = timezone.now()
+        elif isinstance(field, models.DateField):
+            fields[field.name] = datetime.date.today()
+        elif isinstance(field, models.TimeField):
+            fields[field.name] = datetime.time(10)
+        else:
+            fields[field.name] = ""
+    return model.objects.using(using).create(**fields)
+
+
+class AuthenticatedAPITestCase(APITestCase):
+    """
+    درخواست‌ها با توکن JWT واقعی ارسال می‌شوند تا کوئری احراز هویت هم شمرده شود.
+    """
+
+    def setUp(self):
+        caches["default"].clear()
+        caches["api-responses"].clear()
+        self.admin = make_user("9999999999", is_staff=True, is_superuser=True)
+        token = RefreshToken.for_user(self.admin).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+
+class AccountActivationTests(APITestCase):
+    url = "/api/accounts/activate/"
+    password = "S3cure-pass-phrase"
+
+    def setUp(self):
+        caches["default"].clear()
+        self.user = make_user("0012345678")
+        self.user.set_unusable_password()
+        self.user.save()
+
+    def activate(self, national_code, token, password=None):
+        return self.client.post(
+            self.url,
+            {"national_code": national_code, "token": token, "password": password or self.password},
+            format="json",
+        )
+
+    def test_valid_token_sets_password_once(self):
+        token = make_activation_token(self.user)
+        response = self.activate("0012345678", token)
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password(self.password))
+        # پس از تعیین رمز همان توکن دیگر معتبر نیست
+        response = self.activate("0012345678", token, password="Another-pass-phrase")
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_code_and_bad_token_are_indistinguishable(self):
+        unknown = self.activate("0099999999", "bogus")
+        registered = self.activate("0012345678", "bogus")
+        self.assertEqual(unknown.status_code, 400)
+        self.assertEqual(unknown.json(), registered.json())
+        self.assertEqual(unknown.json()["errors"], INVALID_ACTIVATION)
+
+    def test_token_is_bound_to_its_national_code(self):
+        other = make_user("0087654321")
+        response = self.activate("0012345678", make_activation_token(other))
+        self.assertEqual(response.json()["errors"], INVALID_ACTIVATION)
+
+    def test_password_is_validated_only_after_token(self):
+        response = self.activate("0012345678", "bogus", password="1")
+        self.assertEqual(response.json()["errors"], INVALID_ACTIVATION)
+        response = self.activate("0012345678", make_activation_token(self.user), password="1")
+        self.assertIn("password", response.json()["errors"])
+
+    @mock.patch.object(ScopedRateThrottle, "THROTTLE_RATES", {"account_activation": "2/hour"})
+    def test_requests_are_throttled(self):
+        codes = [self.activate("0012345678", "bogus").status_code for _ in range(3)]
+        self.assertEqual(codes, [400, 400, 429])
+
+
+class QueryBudgetTests(AuthenticatedAPITestCase):
+    def test_viewset_actions_stay_within_query_budget(self):
+        for prefix, viewset, basename in router.registry:
+            if not viewset.query_budget:
+                continue
+            model = viewset.queryset.model
+            instances = [make(model) for _ in range(3)]
+            urls = {"list": f"/api/{prefix}/", "retrieve": f"/api/{prefix}/{instances[0].pk}/"}
+            for action, budget in viewset.query_budget.items():
+                with self.subTest(viewset=viewset.__name__, action=action):
+                    with assert_max_queries(budget):
+                        response = self.client.get(urls[action])
+                    self.assertEqual(response.status_code, 200)
+
+
+class ListRepresentationTests(AuthenticatedAPITestCase):
+    SAMPLE_VALUES = [
+        (models.FileField, "uploads/sample.pdf"),
+        (models.EmailField, "info@example.ir"),
+        (models.URLField, "https://example.ir"),
+        (models.CharField, "مقدار نمونه"),
+        (models.TextField, "متن نمونه"),
+        (models.BooleanField, True),
+        (models.IntegerField, 7),
+        (models.DateTimeField, datetime.datetime(2024, 3, 20, 8, 30, 15, 123456, tzinfo=datetime.timezone.utc)),
+        (models.JSONField, {"key": "value"}),
+    ]
+
+    def populated(self, model):
+        # فیلدهای اختیاری و فایل‌ها هم پر می‌شوند تا تبدیل هر نوع فیلد مقایسه شود
+        fields = {}
+        for field in model._meta.concrete_fields:
+            if field.is_relation or field.primary_key or not (field.null or isinstance(field, models.FileField)):
+                continue
+            for field_class, value in self.SAMPLE_VALUES:
+                if isinstance(field, field_class):
+                    fields[field.name] = value[: field.max_length] if isinstance(value, str) and field.max_length else value
+                    break
+        return make(model, **fields)
+
+    def test_values_rows_match_the_full_serializer(self):
+        for prefix, viewset, basename in router.registry:
+            model = viewset.queryset.model
+            self.populated(model)
+            make(model)
+            url = f"/api/{prefix}/"
+            with self.subTest(viewset=viewset.__name__):
+                self.assertIsNotNone(viewset(action="list", request=None, format_kwarg=None).get_list_representation())
+                compact = self.client.get(url, {"page_size": 100})
+                with mock.patch.object(viewset, "use_list_representation", False):
+                    full = self.client.get(url, {"page_size": 100})
+                self.assertEqual((compact.status_code, full.status_code), (200, 200))
+                self.assertEqual(compact.json()["data"], full.json()["data"])
+
+
+class CursorPaginationTests(AuthenticatedAPITestCase):
+    url = "/api/doctors/"
+
+    def setUp(self):
+        super().setUp()
+        self.ids = [make(doctor).pk for _ in range(25)][::-1]
+
+    def page(self, **params):
+        response = self.client.get(self.url, dict(params, pagination="cursor", page_size=10))
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        return [row["id"] for row in body["data"]], body["pagination"]
+
+    def test_walks_forward_and_back_without_gaps(self):
+        seen, pages, cursor = [], [], None
+        while True:
+            ids, meta = self.page(**({"cursor": cursor} if cursor else {}))
+            seen += ids
+            pages.append((ids, meta))
+            cursor = meta["next_cursor"]
+            if not meta["has_next"]:
+                break
+        self.assertEqual(seen, self.ids)
+        self.assertEqual([len(ids) for ids, _ in pages], [10, 10, 5])
+        self.assertFalse(pages[0][1]["has_previous"])
+
+        ids, meta = self.page(cursor=pages[2][1]["prev_cursor"])
+        self.assertEqual(ids, pages[1][0])
+        self.assertTrue(meta["has_next"])
+
+    def test_cursor_mode_skips_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.page()
+        self.assertFalse(any("COUNT(" in query["sql"].upper() for query in queries.captured_queries))
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+
+class QueryPlanTests(APITestCase):
+    def test_declared_indexes_exist(self):
+        from django.apps import apps
+
+        with connection.cursor() as cursor:
+            for model in apps.get_app_config("api").get_models():
+                constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+                for index in model._meta.indexes:
+                    with self.subTest(model=model.__name__, index=index.name):
+                        self.assertIn(index.name, constraints)
+
+    def test_list_and_hot_filters_use_indexes(self):
+        for label, queryset in plan_checks():
+            with self.subTest(query=label):
+                scans, plan = full_scans(queryset)
+                self.assertEqual(scans, [], f"full table scan:\n{plan}")
+
+
+class FullTextSearchTests(AuthenticatedAPITestCase):
+    def test_results_are_not_truncated(self):
+        for i in range(505):
+            make(ServiceCenter, name=f"مرکز توانبخشی {i}", city="تهران")
+        make(ServiceCenter, name="مرکز دیگر", city="کرج")
+        response = self.client.get("/api/service-centers/", {"search": "توانبخشی", "page": 51})
+        self.assertEqual(response.status_code, 200)
+        pagination = response.json()["pagination"]
+        self.assertEqual(pagination["total_count"], 505)
+        self.assertEqual(pagination["total_pages"], 51)
+        self.assertEqual(len(response.json()["data"]), 5)
+
+    def test_more_relevant_rows_come_first(self):
+        make(ServiceCenter, name="مرکز", detailedServices="کهریزک در توضیحات خدمات مفصل و طولانی")
+        best = make(ServiceCenter, name="کهریزک")
+        response = self.client.get("/api/service-centers/", {"search": "كهريزك"})
+        ids = [row["id"] for row in response.json()["data"]]
+        self.assertEqual(len(ids), 2)
+        self.assertEqual(ids[0], best.pk)
+
+
+    def test_requests_do_not_create_search_tables(self):
+        search._backends.clear()
+        make(ServiceCenter, name="کهریزک")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/service-centers/", {"search": "کهریزک"})
+        self.assertEqual(len(response.json()["data"]), 1)
+        self.assertFalse(any(query["sql"].upper().startswith("CREATE") for query in queries.captured_queries))
+        # جدول FTS5 را post_migrate هنگام ساخت پایگاه داده تست ساخته است
+        self.assertIsInstance(search.get_backend(), search.SQLiteFTS5Backend)
+
+
+class ReplicaSearchTests(APITransactionTestCase):
+    """
+    جستجوی لیست وقتی خواندن‌ها به replica می‌روند؛ replica1 اتصال دومی به همان
+    پایگاه داده تست است، پس داده‌ها یکی است ولی alias متفاوت.
+    """
+
+    def setUp(self):
+        connections.settings["replica1"] = dict(connections["default"].settings_dict)
+        self.addCleanup(connections.settings.pop, "replica1")
+        self.addCleanup(self.close_replica)
+        routers = override_settings(DATABASE_ROUTERS=["api.db_router.ReplicaRouter"])
+        routers.enable()
+        self.addCleanup(routers.disable)
+        replicas = mock.patch("api.db_router.replica_aliases", return_value=["replica1"])
+        replicas.start()
+        self.addCleanup(replicas.stop)
+        caches["default"].clear()
+        admin = make_user("9999999999", is_staff=True, is_superuser=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(admin).access_token}")
+
+    def close_replica(self):
+        connections["replica1"].close()
+        del connections["replica1"]
+
+    def test_search_list_reads_index_from_the_same_replica(self):
+        center = make(ServiceCenter, name="درمانگاه امید")
+        make(ServiceCenter, name="مرکز دیگر")
+        with CaptureQueriesContext(connections["replica1"]) as replica:
+            response = self.client.get("/api/service-centers/", {"search": "امید"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["id"] for row in response.json()["data"]], [center.pk])
+        self.assertTrue(any("MATCH" in query["sql"].upper() for query in replica.captured_queries))
+
+
+PATIENT_IMPORT_COLUMNS = [
+    "national_code", "first_name", "last_name", "phone_number", "gender", "state", "city",
+    "county", "homeAddress", "howKnow", "education", "userType", "fatherName", "age",
+    "maritalStatus", "headHouseHold", "numberDependents", "familyStatus", "jobStatus", "skill",
+    "homeStatus", "lineNumber", "organ", "bankCardNumber", "insurance", "sicknessDescription",
+    "familiar1Name", "familiar1FamilyName", "familiar1PhoneNumber", "familiar2Name",
+    "familiar2FamilyName", "familiar2PhoneNumber",
+]
+
+
+def shared_caches():
+    """
+    تنظیمات CACHES با backend فایل برای api-responses، مانند یک کش مشترک بین workerها.
+    """
+    directory = tempfile.mkdtemp()
+    return {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "api-responses": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": directory},
+    }, directory
+
+
+class ResponseCacheTests(AuthenticatedAPITestCase):
+    url = "/api/service-centers/"
+
+    def setUp(self):
+        cache_settings, directory = shared_caches()
+        self.addCleanup(shutil.rmtree, directory, True)
+        override = override_settings(CACHES=cache_settings)
+        override.enable()
+        self.addCleanup(override.disable)
+        super().setUp()
+        self.center = make(ServiceCenter)
+
+    def test_process_local_cache_is_not_used(self):
+        with override_settings(CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "api-responses": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        }):
+            self.client.get(self.url)
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Cache", response)
+
+    def test_list_is_invalidated_by_writes(self):
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "HIT")
+        make(ServiceCenter)
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.json()["data"]), 2)
+
+    def test_retrieve_is_invalidated_by_its_own_save(self):
+        url = f"{self.url}{self.center.pk}/"
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+        make(ServiceCenter)
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+        self.center.save()
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+
+    def test_identity_is_invalidated_in_shared_tier(self):
+        user = make_user("0044444444")
+        self.assertFalse(identity.resolve("0044444444").has_role("doctor"))
+        make(doctor, national_code=user)
+        # LRU فرایند دیگری که هنوز کلید را دارد با کش مشترک پر می‌شود
+        identity.local_cache.clear()
+        self.assertTrue(identity.resolve("0044444444").has_role("doctor"))
+
+    def test_identity_skips_process_local_shared_tier(self):
+        with override_settings(API_IDENTITY_CACHE={"alias": "default"}):
+            self.assertIsNone(identity._shared())
+        self.assertIsNotNone(identity._shared())
+
+
+class ConditionalRequestTests(AuthenticatedAPITestCase):
+    def get(self, url, etag=None, **params):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params, **headers)
+        return response, [query["sql"].upper() for query in queries.captured_queries]
+
+    def test_list_etag_comes_from_the_page_without_extra_queries(self):
+        make(ConsultationRequest, user=self.admin)
+        response, plain = self.get("/api/consultation-requests/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any("MAX(" in sql for sql in plain))
+
+        response, queries = self.get("/api/consultation-requests/", response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertLessEqual(len(queries), len(plain))
+
+        User.objects.filter(pk=self.admin.pk).update(updated_at=timezone.now() + datetime.timedelta(seconds=1))
+        self.assertEqual(self.get("/api/consultation-requests/", response["ETag"])[0].status_code, 200)
+
+    def test_retrieve_reads_validators_from_the_fetched_row(self):
+        consultation = make(ConsultationRequest, user=self.admin)
+        url = f"/api/consultation-requests/{consultation.pk}/"
+        response, plain = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum('FROM "API_CONSULTATIONREQUEST"' in sql for sql in plain), 1)
+
+        # ETag ساخته شده از نمونه با ETag پیش‌خوانی درخواست شرطی یکی است
+        response, conditional = self.get(url, response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(sum('FROM "API_CONSULTATIONREQUEST"' in sql for sql in conditional), 1)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_retrieve_with_deferred_version_fields_queries_them(self):
+        center = make(ServiceCenter)
+        url = f"/api/service-centers/{center.pk}/"
+        response = self.get(url, fields="name")[0]
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get(url, response["ETag"], fields="name")[0].status_code, 304)
+
+    def test_search_runs_full_text_query_once_per_statement(self):
+        make(ServiceCenter, name="درمانگاه امید")
+        response, queries = self.get("/api/service-centers/", search="امید")
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        response, conditional = self.get("/api/service-centers/", etag, search="امید")
+        self.assertEqual(response.status_code, 304)
+        self.assertLessEqual(len(conditional), len(queries))
+        self.assertFalse(any("MAX(" in sql for sql in queries + conditional))
+
+    def test_deleted_row_changes_list_etag(self):
+        first, second = make(ServiceCenter), make(ServiceCenter)
+        etag = self.get("/api/service-centers/")[0]["ETag"]
+        first.delete()
+        response = self.get("/api/service-centers/", etag)[0]
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["id"] for row in response.json()["data"]], [second.pk])
+
+    def test_cached_response_keeps_its_validators(self):
+        cache_settings, directory = shared_caches()
+        self.addCleanup(shutil.rmtree, directory, True)
+        make(ServiceCenter)
+        with override_settings(CACHES=cache_settings):
+            etag = self.get("/api/service-centers/")[0]["ETag"]
+            response = self.get("/api/service-centers/", etag)[0]
+        self.assertEqual((response.status_code, response["X-Cache"], response["ETag"]), (304, "HIT", etag))
+
+
+class ReplicaRoutingTests(AuthenticatedAPITestCase):
+    def replica_reads(self, call):
+        """
+        برای هر کوئری، آیا روتر آن را به replica می‌فرستاد.
+        """
+        flags = []
+
+        def record(execute, sql, params, many, context):
+            flags.append(db_router._read_from_replica.get())
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            call()
+        return flags
+
+    def test_safe_requests_read_from_replicas(self):
+        self.assertIn(True, self.replica_reads(lambda: self.client.get("/api/doctors/")))
+
+    def test_cache_filling_reads_use_primary(self):
+        cache_settings, directory = shared_caches()
+        self.addCleanup(shutil.rmtree, directory, True)
+        make(ServiceCenter)
+        with override_settings(CACHES=cache_settings):
+            flags = self.replica_reads(lambda: self.client.get("/api/service-centers/"))
+        self.assertTrue(flags)
+        self.assertNotIn(True, flags)
+
+        make_user("0055555555")
+        with db_router.read_from_replicas():
+            self.assertEqual(self.replica_reads(lambda: identity.resolve("0055555555")), [False])
+
+    def test_writer_is_pinned_to_primary_without_cookie(self):
+        cache_settings, directory = shared_caches()
+        self.addCleanup(shutil.rmtree, directory, True)
+        center = make(ServiceCenter)
+        other = RefreshToken.for_user(make_user("0066666666")).access_token
+        with override_settings(CACHES=cache_settings), mock.patch(
+            "api.middleware.replica_aliases", return_value=["replica1"]
+        ):
+            self.client.patch(f"/api/service-centers/{center.pk}/", {"name": "امید"}, format="json")
+            self.client.cookies.clear()
+            self.assertNotIn(True, self.replica_reads(lambda: self.client.get("/api/doctors/")))
+
+            self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {other}")
+            self.assertIn(True, self.replica_reads(lambda: self.client.get("/api/doctors/")))
+
+
+def patient_csv(*rows):
+    lines = [",".join(PATIENT_IMPORT_COLUMNS)]
+    for code, age in rows:
+        values = dict.fromkeys(PATIENT_IMPORT_COLUMNS, "x")
+        values.update(national_code=code, age=age, headHouseHold="true", jobStatus="false",
+                      numberDependents="1", gender="m")
+        lines.append(",".join(values[column] for column in PATIENT_IMPORT_COLUMNS))
+    upload = io.BytesIO("\n".join(lines).encode())
+    upload.name = "patients.csv"
+    return upload
+
+
+class BulkImportTests(AuthenticatedAPITestCase):
+    def post_import(self, *rows):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/patients/import/", {"file": patient_csv(*rows)}, format="multipart")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def import_patients(self, *rows):
+        return self.post_import(*rows)["data"]
+
+    def counts(self, report):
+        return {key: report[key] for key in ("total_rows", "created", "users_created", "failed")}
+
+    def test_creates_users_and_profiles_and_reports_invalid_rows(self):
+        existing = make_user("0011111111")
+        report = self.import_patients(("0022222222", "30"), ("0011111111", "40"), ("0033333333", "سی"))
+        self.assertEqual(
+            {key: report[key] for key in ("total_rows", "created", "users_created", "failed")},
+            {"total_rows": 3, "created": 2, "users_created": 1, "failed": 1},
+        )
+        self.assertEqual(report["errors"][0]["row"], 4)
+        self.assertIn("age", report["errors"][0]["errors"])
+        self.assertTrue(patient.objects.filter(national_code=existing).exists())
+        self.assertFalse(User.objects.get(national_code="0022222222").has_usable_password())
+
+    def test_refreshes_cached_identity_of_imported_users(self):
+        make_user("0011111111")
+        self.assertFalse(identity.resolve("0011111111").has_role("patient"))
+        self.import_patients(("0011111111", "40"))
+        self.assertTrue(identity.resolve("0011111111").has_role("patient"))
+
+
+    def test_duplicate_code_in_one_file_creates_one_user(self):
+        report = self.import_patients(("0022222222", "30"), ("0022222222", "31"))
+        self.assertEqual(self.counts(report), {"total_rows": 2, "created": 2, "users_created": 1, "failed": 0})
+        user = User.objects.get(national_code="0022222222")
+        self.assertEqual(sorted(patient.objects.filter(national_code=user).values_list("age", flat=True)), [30, 31])
+
+    def test_collision_with_existing_user_falls_back_to_row_by_row(self):
+        # نام کاربری برابر کد ملی است؛ کاربری با همین نام کاربری ولی کد ملی دیگر bulk_create را می‌شکند
+        existing = make_user("0055555555", username="0044444444")
+        report = self.import_patients(("0033333333", "30"), ("0044444444", "40"), ("0066666666", "50"))
+        self.assertEqual(self.counts(report), {"total_rows": 3, "created": 2, "users_created": 2, "failed": 1})
+        self.assertEqual([error["row"] for error in report["errors"]], [3])
+        self.assertIn("UNIQUE", report["errors"][0]["errors"]["error"].upper())
+        self.assertEqual(
+            sorted(patient.objects.values_list("national_code__national_code", flat=True)),
+            ["0033333333", "0066666666"],
+        )
+        self.assertFalse(User.objects.filter(national_code="0044444444").exists())
+        self.assertFalse(patient.objects.filter(national_code=existing).exists())
+
+    def test_report_lists_failures_by_row_across_chunks(self):
+        make_user("0055555555", username="0044444444")
+        rows = [("0011111111", "سی"), ("0044444444", "40"), ("0033333333", "30"), ("0066666666", "50")]
+        with self.captureOnCommitCallbacks(execute=True):
+            report = imports.get_importer("patients", chunk_size=2).run(
+                imports.read_rows(patient_csv(*rows), "patients.csv")
+            )
+        self.assertEqual(self.counts(report), {"total_rows": 4, "created": 2, "users_created": 2, "failed": 2})
+        self.assertEqual([error["row"] for error in report["errors"]], [2, 3])
+        self.assertIn("age", report["errors"][0]["errors"])
+        self.assertIn("error", report["errors"][1]["errors"])
+
+        body = self.post_import(("0077777777", "سی"), ("0088888888", "20"))
+        self.assertFalse(body["ok"])
+        self.assertEqual(body["message"], "1 رکورد از 2 ردیف ثبت شد")
+        self.assertEqual([error["row"] for error in body["data"]["errors"]], [2])
+
+
+class NationalCodeLookupTests(AuthenticatedAPITestCase):
+    url = "/api/patients/lookup/"
+
+    def lookup(self, codes):
+        return self.client.post(self.url, {"national_codes": codes}, format="json")
+
+    def family(self, *codes):
+        members = [make_user(code) for code in codes]
+        for member in members:
+            make(patient, national_code=member)
+        return members
+
+    def test_returns_profiles_in_input_order_and_reports_missing_codes(self):
+        self.family("0022222222")
+        profile = make(patient, national_code=make_user("0011111111"))
+        make(doctor, national_code=User.objects.get(national_code="0011111111"))
+
+        response = self.lookup(["0022222222", "0099999999", "0011111111", "0022222222"])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()["data"]
+        self.assertEqual(list(data["found"]), ["0022222222", "0011111111"])
+        self.assertEqual(data["missing"], ["0099999999"])
+        roles = data["found"]["0011111111"]["roles"]
+        self.assertEqual(roles["patient"]["id"], profile.pk)
+        self.assertNotIn("national_code", roles["patient"])
+        self.assertIsNotNone(roles["doctor"])
+        self.assertIsNone(roles["benefactor"])
+        self.assertEqual(data["found"]["0011111111"]["user"]["national_code"], "0011111111")
+
+    def test_query_count_does_not_grow_with_family_size(self):
+        codes = [f"00{i}0000000" for i in range(1, 9)]
+        self.family(*codes)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.lookup(codes[:2]).status_code, 200)
+        with assert_max_queries(len(small)):
+            self.assertEqual(self.lookup(codes).status_code, 200)
+
+    def test_number_of_codes_is_limited(self):
+        with self.settings(API_LOOKUP_MAX_CODES=2):
+            response = self.lookup(["0011111111", "0022222222", "0033333333"])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.lookup([]).status_code, 400)
+
+
+class MetricsTests(AuthenticatedAPITestCase):
+    def counter(self, metric):
+        return sum(value for (name, _), value in metrics.registry.aggregate().items() if name == metric.name)
+
+    def test_only_validation_errors_count_as_validation_failures(self):
+        before = self.counter(metrics.VALIDATION_FAILURES)
+        self.client.post("/api/doctors/", {"national_code": "1"}, format="json")
+        self.assertEqual(self.counter(metrics.VALIDATION_FAILURES), before + 1)
+        self.client.post("/api/doctors/", "{not json", content_type="application/json")
+        self.assertEqual(self.counter(metrics.VALIDATION_FAILURES), before + 1)
+
+    def test_snapshots_of_dead_workers_are_dropped(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        worker = subprocess.Popen([sys.executable, "-c", "pass"])
+        worker.wait()
+        stale = os.path.join(directory, f"api_metrics_{worker.pid}.json")
+        with open(stale, "w") as stream:
+            json.dump({"pid": worker.pid, "values": [[metrics.JOBS.name, ["x", "done"], 5]]}, stream)
+
+        with self.settings(API_METRICS_DIR=directory):
+            totals = metrics.registry.aggregate()
+        self.assertNotIn((metrics.JOBS.name, ("x", "done")), totals)
+        self.assertFalse(os.path.exists(stale))
+
+
+    def test_endpoint_requires_the_configured_token(self):
+        self.assertEqual(self.client.get("/api/metrics").status_code, 403)
+        with self.settings(API_METRICS_TOKEN="secret"):
+            self.assertEqual(self.client.get("/api/metrics", HTTP_X_METRICS_TOKEN="wrong").status_code, 403)
+            response = self.client.get("/api/metrics", HTTP_X_METRICS_TOKEN="secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(metrics.REQUESTS.name, response.content.decode())
+
+    @override_settings(API_METRICS_TOKEN="secret")
+    def test_scrape_only_reads_the_replica_heartbeat(self):
+        def scrape():
+            return self.client.get("/api/metrics", HTTP_X_METRICS_TOKEN="secret").content.decode()
+
+        with mock.patch("api.db_router.replica_aliases", return_value=["default"]):
+            with CaptureQueriesContext(connection) as queries:
+                output = scrape()
+            self.assertNotIn(f'{metrics.REPLICA_LAG.name}{{alias="default"}}', output)
+            self.assertFalse(
+                [query for query in queries.captured_queries if not query["sql"].upper().startswith("SELECT")]
+            )
+
+            call_command("replica_heartbeat", stdout=io.StringIO())
+            self.assertIn(f'{metrics.REPLICA_LAG.name}{{alias="default"}} 0.0', scrape())
+
+
+class UserKeyMigrationTests(TestCase):
+    """
+    rekey_user_fks روی یک پایگاه داده SQLite جدا با طرح قدیمی، که ستون national_code
+    پروفایل‌ها به customUser.national_code اشاره می‌کند.
+    """
+
+    codes = ["0011111111", "0022222222"]
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        connections.settings["legacy"] = dict(
+            connections["default"].settings_dict, NAME=os.path.join(directory, "legacy.sqlite3")
+        )
+        self.addCleanup(connections.settings.pop, "legacy")
+        self.addCleanup(self.close_legacy)
+        self.legacy = connections["legacy"]
+
+        with self.legacy.schema_editor() as editor:
+            editor.create_model(User)
+            for model in REKEYED_MODELS:
+                editor.create_model(model)
+                old_field = model._meta.get_field("national_code")
+                legacy_field = models.ForeignKey(User, to_field="national_code", on_delete=models.CASCADE)
+                legacy_field.set_attributes_from_name("national_code")
+                legacy_field.model = model
+                editor.alter_field(model, old_field, legacy_field)
+
+        users = User.objects.using("legacy").bulk_create(
+            [User(username=code, national_code=code) for code in self.codes]
+        )
+        # قیدها تا commit به تعویق می‌افتند؛ تا آن زمان شناسه‌ها با کد ملی جایگزین شده‌اند
+        with transaction.atomic(using="legacy"):
+            for model in REKEYED_MODELS:
+                for user in users:
+                    make(model, using="legacy", national_code_id=user.pk)
+                table, column = model._meta.db_table, model._meta.get_field("national_code").column
+                with self.legacy.cursor() as cursor:
+                    cursor.execute(
+                        f'UPDATE "{table}" SET "{column}" = '
+                        f'(SELECT national_code FROM "{User._meta.db_table}" WHERE id = "{table}"."{column}")'
+                    )
+
+    def close_legacy(self):
+        self.legacy.close()
+        del connections["legacy"]
+
+    def joined_by_code(self, model):
+        table, column = model._meta.db_table, model._meta.get_field("national_code").column
+        with self.legacy.cursor() as cursor:
+            cursor.execute(
+                f'SELECT u.national_code FROM "{table}" p '
+                f'JOIN "{User._meta.db_table}" u ON u.national_code = p."{column}"'
+            )
+            return sorted(row[0] for row in cursor.fetchall())
+
+    def resolved(self, model):
+        return sorted(model.objects.using("legacy").values_list("national_code__national_code", flat=True))
+
+    def rekey(self, *args):
+        out = io.StringIO()
+        call_command("rekey_user_fks", "--database", "legacy", *args, stdout=out)
+        return out.getvalue()
+
+    def test_rekey_round_trip_is_idempotent(self):
+        for model in REKEYED_MODELS:
+            self.assertEqual(self.joined_by_code(model), self.codes)
+            self.assertEqual(self.resolved(model), [])
+
+        self.assertIn(f"{patient._meta.db_table}: 2 rows to rekey", self.rekey("--dry-run"))
+        self.assertEqual(self.resolved(patient), [])
+
+        self.assertIn(f"{patient._meta.db_table}: rekeyed 2 rows", self.rekey())
+        for model in REKEYED_MODELS:
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.resolved(model), self.codes)
+                self.assertEqual(self.joined_by_code(model), [])
+
+        output = self.rekey()
+        for model in REKEYED_MODELS:
+            self.assertIn(f"{model._meta.db_table}: rekeyed 0 rows", output)
+            self.assertEqual(self.resolved(model), self.codes)
+
+    def test_benchmark_joins_cleans_up_its_tables(self):
+        for _ in range(2):
+            out = io.StringIO()
+            call_command("benchmark_joins", users=200, repeat=1, stdout=out)
+            lines = out.getvalue().splitlines()
+            self.assertEqual(lines[0], "200 users/profiles, 1 iterations, sqlite")
+            labels = [line.split("  ")[0] for line in lines[1:]]
+            self.assertEqual(labels, ["page", "join count", "user profiles"])
+
+
+class LoggingTests(TestCase):
+    def handler(self, **kwargs):
+        stream = io.StringIO()
+        handler = log.AsyncQueueHandler(stream, **kwargs)
+        handler.setFormatter(log.JsonFormatter())
+        self.addCleanup(handler.close)
+        return handler, stream
+
+    def record(self, msg, *args, **extra):
+        record = logging.LogRecord("api.test", logging.WARNING, __file__, 0, msg, args, None)
+        record.__dict__.update(extra)
+        return record
+
+    def counter(self, metric):
+        return sum(value for (name, _), value in metrics.registry.aggregate().items() if name == metric.name)
+
+    def lines(self, handler, stream):
+        handler.close()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    def test_sensitive_fields_and_text_are_redacted(self):
+        handler, stream = self.handler()
+        handler.handle(
+            self.record(
+                "lookup %s by 09121234567",
+                "0012345678",
+                payload={"national_code": "0012345678", "bankCardNumber": "6037991112345678", "city": "Tehran"},
+                note="card 6037-9911-1234-5678",
+            )
+        )
+        (line,) = self.lines(handler, stream)
+        self.assertEqual(line["message"], "lookup *** by ***")
+        self.assertEqual(line["payload"], {"national_code": "***", "bankCardNumber": "***", "city": "Tehran"})
+        self.assertEqual(line["note"], "card ***")
+        self.assertNotIn("0012345678", stream.getvalue())
+
+    def test_records_beyond_a_full_queue_are_counted_and_reported(self):
+        handler, stream = self.handler(maxsize=2)
+        handler.listener.stop()
+        before = self.counter(metrics.LOG_DROPPED)
+        for index in range(5):
+            handler.handle(self.record(f"record {index}"))
+        self.assertEqual(handler.dropped, 3)
+        self.assertEqual(self.counter(metrics.LOG_DROPPED), before + 3)
+
+        # با خالی شدن صف، تعداد رکوردهای از دست رفته پس از رکورد بعدی نوشته می‌شود
+        handler.listener.start()
+        handler.queue.join()
+        handler.handle(self.record("record 5"))
+        lines = self.lines(handler, stream)
+        self.assertEqual([line["message"] for line in lines[:3]], ["record 0", "record 1", "record 5"])
+        self.assertEqual((lines[3]["level"], lines[3]["dropped"]), ("WARNING", 3))
+
+    def test_forked_worker_starts_its_own_listener(self):
+        script = (
+            "import logging, os, sys\n"
+            "from api.log import AsyncQueueHandler\n"
+            "handler = AsyncQueueHandler(sys.stdout)\n"
+            "logger = logging.getLogger('fork-test')\n"
+            "logger.addHandler(handler)\n"
+            "logger.propagate = False\n"
+            "logger.warning('parent')\n"
+            "pid = os.fork()\n"
+            "if pid == 0:\n"
+            "    logger.warning('child')\n"
+            "    handler.close()\n"
+            "    os._exit(0)\n"
+            "os.waitpid(pid, 0)\n"
+            "handler.close()\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", script], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        self.assertEqual(sorted(output.split()), ["child", "parent"])
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        jobs.HANDLERS["test"] = self.handler
+        self.addCleanup(jobs.HANDLERS.pop, "test")
+
+    def handler(self, fail):
+        self.calls.append(fail)
+        if fail:
+            raise RuntimeError("boom")
+
+    def test_job_is_claimed_once_and_removed_when_done(self):
+        job = jobs.enqueue("test", fail=False)
+        claimed = jobs.claim()
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts), (job.pk, Job.RUNNING, 1))
+        self.assertIsNone(jobs.claim())
+        self.assertEqual(jobs.run(claimed), "done")
+        self.assertEqual(self.calls, [False])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(API_JOBS={"max_attempts": 2, "retry_delay": 30})
+    def test_failed_job_is_retried_later_then_marked_failed(self):
+        jobs.enqueue("test", fail=True)
+        self.assertEqual(jobs.run(jobs.claim()), "retry")
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertGreater(job.run_after, timezone.now() + datetime.timedelta(seconds=25))
+        self.assertIsNone(jobs.claim())
+
+        Job.objects.update(run_after=timezone.now())
+        self.assertEqual(jobs.run(jobs.claim()), "failed")
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn("boom", job.last_error)
+        self.assertIsNone(jobs.claim())
+
+    def test_jobs_of_dead_workers_are_requeued(self):
+        jobs.enqueue("test", fail=False)
+        jobs.claim()
+        self.assertEqual(jobs.requeue_stale(), 0)
+        stale = timezone.now() - datetime.timedelta(seconds=jobs.job_setting("lock_timeout") + 1)
+        Job.objects.update(locked_at=stale)
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.claim().attempts, 2)
+
+
+class UploadProcessingTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def process_all(self):
+        while (job := jobs.claim()) is not None:
+            self.assertEqual(jobs.run(job), "done")
+
+    def test_rejected_upload_is_quarantined_and_cleared(self):
+        center = make(ServiceCenter, licenseFile=SimpleUploadedFile("license.pdf", b"<html>not a pdf</html>"))
+        name = center.licenseFile.name
+        self.process_all()
+
+        center.refresh_from_db()
+        self.assertFalse(center.licenseFile)
+        self.assertFalse(os.path.exists(os.path.join(self.media, name)))
+        stored = StoredFile.objects.get()
+        self.assertFalse(stored.is_valid)
+        self.assertTrue(stored.name.startswith(uploads.upload_setting("quarantine_dir")))
+        self.assertTrue(os.path.exists(os.path.join(self.media, stored.name)))
+
+    def test_rejection_changes_retrieve_validators(self):
+        center = make(ServiceCenter, licenseFile=SimpleUploadedFile("license.pdf", b"<html>not a pdf</html>"))
+        url = f"/api/service-centers/{center.pk}/"
+        etag = self.client.get(url)["ETag"]
+        self.process_all()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()["data"]["licenseFile"])
+
+    def test_valid_upload_is_recorded(self):
+        center = make(ServiceCenter, licenseFile=SimpleUploadedFile("license.pdf", b"%PDF-1.4 ..."))
+        self.process_all()
+        stored = StoredFile.objects.get()
+        self.assertEqual(
+            (stored.name, stored.content_type, stored.is_valid),
+            (center.licenseFile.name, "application/pdf", True),
+        )
+
+    def test_replace_swaps_content_in_place(self):
+        storage = FileSystemStorage(location=self.media)
+        name = storage.save("logos/a.png", SimpleUploadedFile("a.png", b"old"))
+        self.assertEqual(uploads.replace(storage, name, b"new"), name)
+        with storage.open(name) as stream:
+            self.assertEqual(stream.read(), b"new")
+        self.assertEqual(os.listdir(os.path.join(self.media, "logos")), ["a.png"])
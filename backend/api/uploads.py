@@ -0,0 +1,260 @@
+import hashlib
+import io
+import logging
+import os
+import tempfile
+from functools import cache
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import FileField
+
+from . import jobs, metrics
+from .models import StoredFile
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - وابستگی اختیاری
+    Image = None
+
+logger = logging.getLogger("api.uploads")
+
+PROCESS_UPLOAD = "process_upload"
+
+# مقادیر پیش‌فرض؛ با API_UPLOADS در settings قابل تغییرند
+DEFAULTS = {
+    "max_bytes": 10 * 1024 * 1024,
+    "thumbnail_size": 256,
+    "thumbnail_dir": "thumbnails/",
+    "quarantine_dir": "quarantine/",
+    "jpeg_quality": 85,
+}
+
+# فیلدهایی که فقط تصویر می‌پذیرند؛ بقیه فیلدهای فایل PDF هم می‌پذیرند
+IMAGE_ONLY_FIELDS = {"nationalCardImage", "nationalCertificateImage", "collectionLogo", "logo"}
+
+# نوع فایل از چند بایت ابتدای آن تشخیص داده می‌شود، نه از پسوند یا هدر کلاینت
+SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"%PDF-", "application/pdf"),
+)
+# GIF بازنویسی نمی‌شود تا فریم‌های متحرک از دست نروند
+REENCODE_FORMATS = {"image/jpeg": "JPEG", "image/png": "PNG", "image/webp": "WEBP"}
+
+
+class InvalidUpload(Exception):
+    pass
+
+
+def upload_setting(name):
+    return getattr(settings, "API_UPLOADS", {}).get(name, DEFAULTS[name])
+
+
+def sniff(head):
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+@cache
+def file_fields(model):
+    return tuple(field.name for field in model._meta.concrete_fields if isinstance(field, FileField))
+
+
+def new_uploads(instance):
+    """
+    فیلدهای فایلی که در این save تازه ذخیره می‌شوند (پیش از FileField.pre_save).
+    """
+    return [
+        name
+        for name in file_fields(type(instance))
+        if getattr(instance, name) and not getattr(instance, name)._committed
+    ]
+
+
+def enqueue_uploads(instance, fields):
+    for name in fields:
+        jobs.enqueue(
+            PROCESS_UPLOAD,
+            model=instance._meta.label,
+            pk=instance.pk,
+            field=name,
+            name=getattr(instance, name).name,
+        )
+
+
+def validate(data, field):
+    content_type = sniff(data[:16])
+    if content_type is None:
+        raise InvalidUpload("Unsupported file type")
+    if field in IMAGE_ONLY_FIELDS and not content_type.startswith("image/"):
+        raise InvalidUpload("Only images are accepted")
+    return content_type
+
+
+def reencode(image, content_type):
+    """
+    بازنویسی تصویر با جهت اعمال شده و بدون متادیتا (EXIF، مکان عکس و ...).
+    """
+    image = ImageOps.exif_transpose(image)
+    image_format = REENCODE_FORMATS[content_type]
+    options = {"optimize": True}
+    if image_format in ("JPEG", "WEBP"):
+        options["quality"] = upload_setting("jpeg_quality")
+    if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    output = io.BytesIO()
+    image.save(output, image_format, **options)
+    return output.getvalue()
+
+
+def make_thumbnail(storage, digest, image):
+    """
+    نام تصویر کوچک از sha256 فایل نهایی ساخته می‌شود؛ فایل‌های هم‌نام در پوشه‌های
+    مختلف با هم برخورد نمی‌کنند و تصویر تکراری دوباره ساخته نمی‌شود.
+    """
+    path = f"{upload_setting('thumbnail_dir')}{digest}.jpg"
+    if storage.exists(path):
+        return path
+    size = upload_setting("thumbnail_size")
+    thumbnail = ImageOps.exif_transpose(image)
+    thumbnail.thumbnail((size, size))
+    if thumbnail.mode not in ("RGB", "L"):
+        thumbnail = thumbnail.convert("RGB")
+    output = io.BytesIO()
+    thumbnail.save(output, "JPEG", quality=upload_setting("jpeg_quality"))
+    return storage.save(path, ContentFile(output.getvalue()))
+
+
+def process_image(storage, data, content_type):
+    """
+    بازنویسی و ساخت تصویر کوچک؛ خروجی (بایت‌های نهایی، نام تصویر کوچک).
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # load خطای فایل ناقص و DecompressionBombError را همین‌جا بالا می‌آورد
+            image.load()
+            if content_type in REENCODE_FORMATS:
+                data = reencode(image, content_type)
+            return data, make_thumbnail(storage, hashlib.sha256(data).hexdigest(), image)
+    except (OSError, Image.DecompressionBombError) as e:
+        raise InvalidUpload(f"Unreadable image: {e}")
+
+
+def replace(storage, name, data):
+    """
+    جایگزینی محتوای فایل بدون لحظه‌ای که فایل حذف شده یا نیمه‌کاره باشد؛ خروجی نام
+    نهایی. روی دیسک فایل موقت در همان پوشه نوشته و با os.replace جابه‌جا می‌شود.
+    storage بدون مسیر محلی نسخه جدید را با نام تازه ذخیره می‌کند.
+    """
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        return storage.save(name, ContentFile(data))
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".reencode-")
+    try:
+        with os.fdopen(descriptor, "wb") as stream:
+            stream.write(data)
+        os.chmod(temporary, getattr(storage, "file_permissions_mode", None) or 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return name
+
+
+def checksum(storage, name):
+    digest = hashlib.sha256()
+    with storage.open(name, "rb") as stream:
+        for chunk in stream.chunks():
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_field(instance, field):
+    """
+    ذخیره فیلد فایل همراه با فیلدهای auto_now (updated_at)؛ با update_fields این
+    فیلدها فقط در صورت ذکر شدن به‌روز می‌شوند و ETag و Last-Modified به آن‌ها وابسته‌اند.
+    """
+    auto_now = [f.name for f in instance._meta.concrete_fields if getattr(f, "auto_now", False)]
+    instance.save(update_fields=[field, *auto_now])
+
+
+def record(name, size, sha256, **fields):
+    StoredFile.objects.update_or_create(name=name, defaults=dict(fields, size=size, sha256=sha256))
+
+
+def reject(instance, field, storage, name, size, sha256, error):
+    """
+    فایل نامعتبر به پوشه قرنطینه منتقل و فیلد مدل خالی می‌شود تا دیگر از API
+    ارائه نشود؛ رکورد StoredFile با نام جدید دلیل رد شدن را نگه می‌دارد.
+    """
+    with storage.open(name, "rb") as stream:
+        quarantined = storage.save(f"{upload_setting('quarantine_dir')}{name}", stream)
+    setattr(instance, field, None if instance._meta.get_field(field).null else "")
+    save_field(instance, field)
+    storage.delete(name)
+    record(quarantined, size, sha256, is_valid=False, error=error, content_type="", thumbnail="")
+    logger.warning(
+        "upload rejected",
+        extra={"model": instance._meta.label, "field": field, "file": quarantined, "error": error},
+    )
+
+
+@jobs.job(PROCESS_UPLOAD)
+def process_upload(model, pk, field, name):
+    """
+    اعتبارسنجی، بازنویسی تصویر، تصویر کوچک و checksum یک فایل آپلود شده. فایل
+    نامعتبر قرنطینه و با is_valid=False و دلیل آن ثبت می‌شود.
+    """
+    instance = apps.get_model(model).objects.filter(pk=pk).first()
+    if instance is None or getattr(instance, field).name != name:
+        # رکورد حذف یا فایل جایگزین شده؛ فایل جدید کار جداگانه خود را دارد
+        return
+    storage = getattr(instance, field).storage
+
+    size = storage.size(name)
+    if size > upload_setting("max_bytes"):
+        # فایل بزرگ در حافظه خوانده نمی‌شود
+        reject(instance, field, storage, name, size, checksum(storage, name), "File is too large")
+        return
+    with storage.open(name, "rb") as stream:
+        data = stream.read()
+
+    try:
+        content_type = validate(data, field)
+        thumbnail = ""
+        if Image is not None and content_type.startswith("image/"):
+            data, thumbnail = process_image(storage, data, content_type)
+    except InvalidUpload as e:
+        reject(instance, field, storage, name, len(data), hashlib.sha256(data).hexdigest(), str(e))
+        return
+
+    if content_type in REENCODE_FORMATS and Image is not None:
+        saved = replace(storage, name, data)
+        if saved != name:
+            # نسخه جدید با نام دیگری ذخیره شد؛ ابتدا رکورد به آن اشاره می‌کند و سپس فایل قدیمی حذف می‌شود
+            setattr(instance, field, saved)
+            save_field(instance, field)
+            storage.delete(name)
+            name = saved
+    record(
+        name,
+        len(data),
+        hashlib.sha256(data).hexdigest(),
+        is_valid=True,
+        error="",
+        content_type=content_type,
+        thumbnail=thumbnail,
+    )
+
+
+metrics.registry.scrape_callback(metrics.UPLOAD_QUEUE, lambda: jobs.pending_count(PROCESS_UPLOAD))
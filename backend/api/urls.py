@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework_simplejwt.views import (TokenObtainPairView,TokenRefreshView,)
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register(r'patients', views.PatientViewSet)
@@ -22,7 +22,28 @@ urlpatterns = [
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     
     path('hello/', views.HelloView.as_view(), name='hello'),
+    path('accounts/invitations/', views.AccountInvitationAPIView.as_view(), name='account-invitation'),
+    path('accounts/activate/', views.AccountActivationAPIView.as_view(), name='account-activate'),
 
     path('patients/by-national-code/<str:national_code>/', views.PatientByNationalCodeAPIView.as_view(), name='get-patient-by-national-code'),
+    path('search/', views.UnifiedSearchAPIView.as_view(), name='unified-search'),
+    path('profiling/', views.ProfilingReportAPIView.as_view(), name='profiling-report'),
+    path('metrics', views.metrics_view, name='metrics'),
+
+    # نسخه async مسیرهای پرخواندنی برای اجرا با ASGI
+    path('async/patients/by-national-code/<str:national_code>/', async_views.AsyncPatientByNationalCodeView.as_view(), name='async-get-patient-by-national-code'),
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
+
+for _prefix, _viewset in [
+    ('service-centers', views.ServiceCenterViewSet),
+    ('medical-centers', views.MedicalCenterViewSet),
+    ('charity-centers', views.CharityCenterViewSet),
+    ('government-organizations', views.GovernmentOrganizationViewSet),
+    ('associations', views.AssociationViewSet),
+]:
+    _view = async_views.AsyncDirectoryView.as_view(viewset=_viewset)
+    urlpatterns += [
+        path(f'async/{_prefix}/', _view, name=f'async-{_prefix}-list'),
+        path(f'async/{_prefix}/<int:pk>/', _view, name=f'async-{_prefix}-detail'),
+    ]
\ No newline at end of file
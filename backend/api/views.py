@@ -1,12 +1,26 @@
-from rest_framework.pagination import PageNumberPagination
-from rest_framework import viewsets, permissions, status
+from rest_framework import permissions, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.filters import SearchFilter
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from .serializers import *
 from .models import *
+from .accounts import activate_user, make_activation_token
+from .conditional import ConditionalRequestMixin
+from .identity import ROLE_MODELS, lookup_national_codes
+from .imports import BulkImportMixin
+from .metrics import registry as metrics_registry
+from .profiling import store as profile_store
+from .representations import ValuesRepresentation
+from .response_cache import ResponseCacheMixin
+from .search import SEARCH_REGISTRY, FullTextSearchFilter, search_all
+from .viewsets import ApiModelViewSet, log_validation_failure
 
 
 class HelloView(APIView):
@@ -19,481 +33,191 @@ class HelloView(APIView):
 
 User = get_user_model()
 
+# بارگذاری کاربر با join برای سریالایزرهایی که user تو در تو دارند
+USER_SELECT_RELATED = {
+    action: ("national_code",)
+    for action in ("list", "retrieve", "update", "partial_update")
+}
+# احراز هویت + شمارش + صفحه برای list، احراز هویت + رکورد برای retrieve
+USER_QUERY_BUDGET = {"list": 3, "retrieve": 2}
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = "page_size"
-    max_page_size = 100
 
-    def get_paginated_response(self, data):
-        return Response(
-            {
-                "count": self.page.paginator.count,
-                "total_pages": self.page.paginator.num_pages,
-                "current_page": self.page.number,
-                "page_size": self.page_size,
-                "results": data,
-            }
-        )
+# سریالایزر پروفایل هر نقش در پاسخ استعلام گروهی کد ملی
+LOOKUP_ROLE_SERIALIZERS = {
+    "patient": PatientSerializer,
+    "doctor": DoctorSerializer,
+    "benefactor": BenefactorPersonSerializer,
+    "health_assist": HealthAssistPersonSerializer,
+}
 
 
-class PatientViewSet(viewsets.ModelViewSet):
-    queryset = patient.objects.all()
-    serializer_class = PatientSerializer
-    permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+def lookup_role_profiles(found, request):
+    """
+    جایگزینی شناسه پروفایل‌های نقش با خود پروفایل‌ها (بدون کاربر تو در تو که در
+    پاسخ آمده است)؛ برای هر نقش یک کوئری values()، مستقل از تعداد کدهای ملی.
+    """
+    for role, serializer_class in LOOKUP_ROLE_SERIALIZERS.items():
+        ids = [identity["roles"][role] for identity in found.values() if identity["roles"][role] is not None]
+        if not ids:
+            continue
+        model = ROLE_MODELS[role]
+        serializer = serializer_class(context={"request": request})
+        serializer.fields.pop("national_code", None)
+        profiles = model.objects.filter(pk__in=ids)
+        representation = ValuesRepresentation.compile(serializer, model)
+        if representation is None:
+            rows = {profile.pk: serializer.to_representation(profile) for profile in profiles}
+        else:
+            rows = {
+                values["pk"]: representation.row(values, request)
+                for values in profiles.values("pk", *representation.paths)
+            }
+        for identity in found.values():
+            identity["roles"][role] = rows.get(identity["roles"][role])
+    return found
 
-    def create(self, request, *args, **kwargs):
-        # اضافه کردن logging برای بررسی داده‌های ورودی
-        print("Received data:", request.data)
 
-        serializer = self.get_serializer(data=request.data)
+class PatientViewSet(BulkImportMixin, ApiModelViewSet):
+    queryset = patient.objects.all().order_by("-created_at")
+    serializer_class = PatientSerializer
+    count_strategy = "cached"
+    select_related_map = USER_SELECT_RELATED
+    query_budget = USER_QUERY_BUDGET
+    import_resource = "patients"
+    resource_name = "بیمار"
+    catch_create_errors = True
+
+    @action(detail=False, methods=["post"], url_path="lookup")
+    def lookup(self, request, *args, **kwargs):
+        """
+        استعلام گروهی کد ملی (مثلا همه اعضای یک خانواده): کاربر و پروفایل‌های نقش
+        هر کد با یک کوئری برای کاربران و یک کوئری برای هر نقش.
+        """
+        serializer = NationalCodeLookupSerializer(data=request.data)
         if not serializer.is_valid():
-            # چاپ خطاها برای اشکال‌زدایی بهتر
-            print("Validation errors:", serializer.errors)
-            return Response(
-                {
-                    "ok": False,
-                    "errors": serializer.errors,
-                    "message": "خطا در اعتبارسنجی داده‌ها",
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        try:
-            instance = serializer.save()
-            headers = self.get_success_headers(serializer.data)
-            return Response(
-                {
-                    "ok": True,
-                    "data": self.get_serializer(instance).data,
-                    "message": "بیمار با موفقیت ثبت شد",
-                },
-                status=status.HTTP_201_CREATED,
-                headers=headers,
-            )
-        except Exception as e:
-            # گزارش خطا
-            print(f"Error in create: {str(e)}")
-            return Response(
-                {"ok": False, "message": f"خطا در ثبت بیمار: {str(e)}"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
-
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            result = self.get_paginated_response(serializer.data)
-            data = result.data
-            return Response(
-                {
-                    "ok": True,
-                    "data": data["results"],
-                    "pagination": {
-                        "total_count": data["count"],
-                        "page_size": data["page_size"],
-                        "current_page": data["current_page"],
-                        "total_pages": data["total_pages"],
-                    },
-                }
-            )
-
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({"ok": True, "data": serializer.data})
-
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        return Response({"ok": True, "data": serializer.data})
-
-    def update(self, request, *args, **kwargs):
-        partial = kwargs.pop("partial", False)
-        instance = self.get_object()
-        serializer = self.get_serializer(instance, data=request.data, partial=partial)
-        serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
-
+            return self.invalid(serializer)
+        result = lookup_national_codes(serializer.validated_data["national_codes"])
+        lookup_role_profiles(result["found"], request)
         return Response(
             {
                 "ok": True,
-                "data": serializer.data,
-                "message": "اطلاعات بیمار با موفقیت بروزرسانی شد",
+                "data": result,
+                "message": f"{len(result['found'])} کد ملی یافت شد، {len(result['missing'])} کد یافت نشد",
             }
         )
 
-    def destroy(self, request, *args, **kwargs):
-        instance = self.get_object()
-        self.perform_destroy(instance)
-        return Response(
-            {"ok": True, "message": "بیمار با موفقیت حذف شد"}, status=status.HTTP_200_OK
-        )
-
 
 # افزودن به views.py
 
 
-class BenefactorPersonViewSet(viewsets.ModelViewSet):
-    queryset = benefactorPerson.objects.all()
+class BenefactorPersonViewSet(BulkImportMixin, ApiModelViewSet):
+    queryset = benefactorPerson.objects.all().order_by("-created_at")
     serializer_class = BenefactorPersonSerializer
-    permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    select_related_map = USER_SELECT_RELATED
+    query_budget = USER_QUERY_BUDGET
+    import_resource = "benefactors"
+    resource_name = "فرد خیر"
+    catch_create_errors = True
 
-    def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        if not serializer.is_valid():
-            return Response(
-                {
-                    "ok": False,
-                    "errors": serializer.errors,
-                    "message": "خطا در اعتبارسنجی داده‌ها",
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
 
-        try:
-            instance = serializer.save()
-            headers = self.get_success_headers(serializer.data)
-            return Response(
-                {
-                    "ok": True,
-                    "data": self.get_serializer(instance).data,
-                    "message": "فرد خیر با موفقیت ثبت شد",
-                },
-                status=status.HTTP_201_CREATED,
-                headers=headers,
-            )
-        except Exception as e:
-            return Response(
-                {"ok": False, "message": f"خطا در ثبت فرد خیر: {str(e)}"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
-
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            result = self.get_paginated_response(serializer.data)
-            data = result.data
-            return Response(
-                {
-                    "ok": True,
-                    "data": data["results"],
-                    "pagination": {
-                        "total_count": data["count"],
-                        "page_size": data["page_size"],
-                        "current_page": data["current_page"],
-                        "total_pages": data["total_pages"],
-                    },
-                }
-            )
-
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({"ok": True, "data": serializer.data})
-
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        return Response({"ok": True, "data": serializer.data})
-
-    def update(self, request, *args, **kwargs):
-        partial = kwargs.pop("partial", False)
-        instance = self.get_object()
-        serializer = self.get_serializer(instance, data=request.data, partial=partial)
-        serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
-
-        return Response(
-            {
-                "ok": True,
-                "data": serializer.data,
-                "message": "اطلاعات فرد خیر با موفقیت بروزرسانی شد",
-            }
-        )
-
-    def destroy(self, request, *args, **kwargs):
-        instance = self.get_object()
-        self.perform_destroy(instance)
-        return Response(
-            {"ok": True, "message": "فرد خیر با موفقیت حذف شد"},
-            status=status.HTTP_200_OK,
-        )
-
-
-class HealthAssistPersonViewSet(viewsets.ModelViewSet):
-    queryset = healthAssistPerson.objects.all()
+class HealthAssistPersonViewSet(ApiModelViewSet):
+    queryset = healthAssistPerson.objects.all().order_by("-created_at")
     serializer_class = HealthAssistPersonSerializer
-    permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
-
-    def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        if not serializer.is_valid():
-            return Response(
-                {
-                    "ok": False,
-                    "errors": serializer.errors,
-                    "message": "خطا در اعتبارسنجی داده‌ها",
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        try:
-            instance = serializer.save()
-            headers = self.get_success_headers(serializer.data)
-            return Response(
-                {
-                    "ok": True,
-                    "data": self.get_serializer(instance).data,
-                    "message": "شخص سلامت‌یار با موفقیت ثبت شد",
-                },
-                status=status.HTTP_201_CREATED,
-                headers=headers,
-            )
-        except Exception as e:
-            return Response(
-                {"ok": False, "message": f"خطا در ثبت شخص سلامت‌یار: {str(e)}"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+    select_related_map = USER_SELECT_RELATED
+    query_budget = USER_QUERY_BUDGET
+    resource_name = "شخص سلامت‌یار"
+    catch_create_errors = True
 
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
 
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            result = self.get_paginated_response(serializer.data)
-            data = result.data
-            return Response(
-                {
-                    "ok": True,
-                    "data": data["results"],
-                    "pagination": {
-                        "total_count": data["count"],
-                        "page_size": data["page_size"],
-                        "current_page": data["current_page"],
-                        "total_pages": data["total_pages"],
-                    },
-                }
-            )
+class DoctorViewSet(ApiModelViewSet):
+    queryset = doctor.objects.all().order_by("-created_at")
+    serializer_class = DoctorSerializer
+    select_related_map = USER_SELECT_RELATED
+    query_budget = USER_QUERY_BUDGET
+    resource_name = "پزشک"
+    catch_create_errors = True
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({"ok": True, "data": serializer.data})
 
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        return Response({"ok": True, "data": serializer.data})
+# افزودن به views.py
 
-    def update(self, request, *args, **kwargs):
-        partial = kwargs.pop("partial", False)
-        instance = self.get_object()
-        serializer = self.get_serializer(instance, data=request.data, partial=partial)
-        serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
 
-        return Response(
-            {
-                "ok": True,
-                "data": serializer.data,
-                "message": "اطلاعات شخص سلامت‌یار با موفقیت بروزرسانی شد",
-            }
-        )
+class PrivateCompanyViewSet(ApiModelViewSet):
+    queryset = privateCompany.objects.all().order_by("-created_at")
+    serializer_class = PrivateCompanySerializer
+    resource_name = "شرکت خصوصی"
+    catch_create_errors = True
 
-    def destroy(self, request, *args, **kwargs):
-        instance = self.get_object()
-        self.perform_destroy(instance)
-        return Response(
-            {"ok": True, "message": "شخص سلامت‌یار با موفقیت حذف شد"},
-            status=status.HTTP_200_OK,
-        )
 
+# views.py - اضافه به فایل موجود
 
-class DoctorViewSet(viewsets.ModelViewSet):
-    queryset = doctor.objects.all()
-    serializer_class = DoctorSerializer
-    permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
 
-    def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        if not serializer.is_valid():
-            return Response(
-                {
-                    "ok": False,
-                    "errors": serializer.errors,
-                    "message": "خطا در اعتبارسنجی داده‌ها",
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+# صدور توکن دعوت برای حساب‌هایی که با رمز غیرقابل استفاده ساخته شده‌اند
+class AccountInvitationAPIView(APIView):
+    permission_classes = [permissions.IsAdminUser]
 
+    def post(self, request):
+        serializer = AccountInvitationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         try:
-            instance = serializer.save()
-            headers = self.get_success_headers(serializer.data)
-            return Response(
-                {
-                    "ok": True,
-                    "data": self.get_serializer(instance).data,
-                    "message": "پزشک با موفقیت ثبت شد",
-                },
-                status=status.HTTP_201_CREATED,
-                headers=headers,
-            )
-        except Exception as e:
-            return Response(
-                {"ok": False, "message": f"خطا در ثبت پزشک: {str(e)}"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
-
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            result = self.get_paginated_response(serializer.data)
-            data = result.data
+            user = User.objects.get(national_code=serializer.validated_data["national_code"])
+        except User.DoesNotExist:
             return Response(
-                {
-                    "ok": True,
-                    "data": data["results"],
-                    "pagination": {
-                        "total_count": data["count"],
-                        "page_size": data["page_size"],
-                        "current_page": data["current_page"],
-                        "total_pages": data["total_pages"],
-                    },
-                }
+                {"ok": False, "message": "کاربر با این کد ملی یافت نشد"},
+                status=status.HTTP_404_NOT_FOUND,
             )
-
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({"ok": True, "data": serializer.data})
-
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        return Response({"ok": True, "data": serializer.data})
-
-    def update(self, request, *args, **kwargs):
-        partial = kwargs.pop("partial", False)
-        instance = self.get_object()
-        serializer = self.get_serializer(instance, data=request.data, partial=partial)
-        serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
-
         return Response(
             {
                 "ok": True,
-                "data": serializer.data,
-                "message": "اطلاعات پزشک با موفقیت بروزرسانی شد",
+                "data": {
+                    "national_code": user.national_code,
+                    "token": make_activation_token(user),
+                    "activated": user.has_usable_password(),
+                },
             }
         )
 
-    def destroy(self, request, *args, **kwargs):
-        instance = self.get_object()
-        self.perform_destroy(instance)
-        return Response(
-            {"ok": True, "message": "پزشک با موفقیت حذف شد"}, status=status.HTTP_200_OK
-        )
 
+# فعال‌سازی حساب و تعیین رمز عبور با توکن دعوت
+class AccountActivationAPIView(APIView):
+    permission_classes = [permissions.AllowAny]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "account_activation"
 
-# افزودن به views.py
-
-
-class PrivateCompanyViewSet(viewsets.ModelViewSet):
-    queryset = privateCompany.objects.all()
-    serializer_class = PrivateCompanySerializer
-    permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
-
-    def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
+    def post(self, request):
+        serializer = AccountActivationSerializer(data=request.data)
         if not serializer.is_valid():
+            log_validation_failure(self, serializer.errors)
             return Response(
-                {
-                    "ok": False,
-                    "errors": serializer.errors,
-                    "message": "خطا در اعتبارسنجی داده‌ها",
-                },
+                {"ok": False, "errors": serializer.errors, "message": "خطا در اعتبارسنجی داده‌ها"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        data = serializer.validated_data
+        activate_user(data["user"], data["password"])
+        return Response({"ok": True, "message": "حساب کاربری با موفقیت فعال شد"})
 
-        try:
-            instance = serializer.save()
-            headers = self.get_success_headers(serializer.data)
-            return Response(
-                {
-                    "ok": True,
-                    "data": self.get_serializer(instance).data,
-                    "message": "شرکت خصوصی با موفقیت ثبت شد",
-                },
-                status=status.HTTP_201_CREATED,
-                headers=headers,
-            )
-        except Exception as e:
-            return Response(
-                {"ok": False, "message": f"خطا در ثبت شرکت خصوصی: {str(e)}"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
 
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            result = self.get_paginated_response(serializer.data)
-            data = result.data
-            return Response(
-                {
-                    "ok": True,
-                    "data": data["results"],
-                    "pagination": {
-                        "total_count": data["count"],
-                        "page_size": data["page_size"],
-                        "current_page": data["current_page"],
-                        "total_pages": data["total_pages"],
-                    },
-                }
-            )
+# گزارش زمان و تعداد کوئری هر مسیر در پنجره اخیر
+class ProfilingReportAPIView(APIView):
+    permission_classes = [permissions.IsAdminUser]
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({"ok": True, "data": serializer.data})
-
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        return Response({"ok": True, "data": serializer.data})
-
-    def update(self, request, *args, **kwargs):
-        partial = kwargs.pop("partial", False)
-        instance = self.get_object()
-        serializer = self.get_serializer(instance, data=request.data, partial=partial)
-        serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
-
-        return Response(
-            {
-                "ok": True,
-                "data": serializer.data,
-                "message": "اطلاعات شرکت خصوصی با موفقیت بروزرسانی شد",
-            }
-        )
-
-    def destroy(self, request, *args, **kwargs):
-        instance = self.get_object()
-        self.perform_destroy(instance)
-        return Response(
-            {"ok": True, "message": "شرکت خصوصی با موفقیت حذف شد"},
-            status=status.HTTP_200_OK,
-        )
-
-
-# views.py - اضافه به فایل موجود
+    def get(self, request):
+        return Response({"ok": True, "data": profile_store.snapshot()})
+
+    def delete(self, request):
+        profile_store.reset()
+        return Response({"ok": True, "message": "آمار پروفایل پاک شد"})
+
+
+# خروجی متریک‌ها برای Prometheus؛ خارج از DRF تا خودش در آمار احراز هویت و رندر اثر نگذارد.
+# بدون API_METRICS_TOKEN در دسترس نیست
+def metrics_view(request):
+    token = getattr(settings, "API_METRICS_TOKEN", None)
+    supplied = request.headers.get("X-Metrics-Token") or request.GET.get("token")
+    if not token or not supplied or not constant_time_compare(supplied, token):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics_registry.exposition(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 
 # دریافت بیمار با کد ملی
@@ -502,494 +226,133 @@ class PatientByNationalCodeAPIView(APIView):
 
     def get(self, request, national_code):
         try:
-            user = customUser.objects.get(national_code=national_code)
-            patient_obj = patient.objects.get(national_code=user)
+            # در حالت معمول یک کوئری join شده کافی است
+            patient_obj = patient.objects.select_related("national_code").get(
+                national_code__national_code=national_code
+            )
             serializer = PatientSerializer(patient_obj)
             return Response({"ok": True, "data": serializer.data})
-        except customUser.DoesNotExist:
-            return Response(
-                {"ok": False, "message": "کاربر با این کد ملی یافت نشد"},
-                status=status.HTTP_404_NOT_FOUND,
-            )
         except patient.DoesNotExist:
+            if not customUser.objects.filter(national_code=national_code).exists():
+                return Response(
+                    {"ok": False, "message": "کاربر با این کد ملی یافت نشد"},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
             return Response(
                 {"ok": False, "message": "این کد ملی متعلق به بیمار نیست"},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
 
-# ویوست درخواست سرویس بیمار
-class PatientServiceRequestViewSet(viewsets.ModelViewSet):
-    queryset = patientServicRequest.objects.all().order_by("-created_at")
-    serializer_class = PatientServiceRequestSerializer
-    permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+# جستجوی یکپارچه در همه مراکز و سازمان‌ها
+class UnifiedSearchAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    default_limit = 20
+    max_limit = 100
 
-    def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        if not serializer.is_valid():
+    def get(self, request):
+        term = request.query_params.get("q", "").strip()
+        if not term:
             return Response(
-                {
-                    "ok": False,
-                    "errors": serializer.errors,
-                    "message": "خطا در اعتبارسنجی داده‌ها",
-                },
+                {"ok": False, "message": "عبارت جستجو (q) الزامی است"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        try:
-            instance = serializer.save()
-            headers = self.get_success_headers(serializer.data)
+        known_kinds = {spec.kind for spec in SEARCH_REGISTRY.values()}
+        kinds = [k for k in request.query_params.get("types", "").split(",") if k]
+        unknown = set(kinds) - known_kinds
+        if unknown:
             return Response(
                 {
-                    "ok": True,
-                    "data": self.get_serializer(instance).data,
-                    "message": "درخواست سرویس با موفقیت ثبت شد",
+                    "ok": False,
+                    "message": f"نوع نامعتبر: {', '.join(sorted(unknown))}",
+                    "types": sorted(known_kinds),
                 },
-                status=status.HTTP_201_CREATED,
-                headers=headers,
-            )
-        except Exception as e:
-            return Response(
-                {"ok": False, "message": f"خطا در ثبت درخواست سرویس: {str(e)}"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
-
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            result = self.get_paginated_response(serializer.data)
-            data = result.data
-            return Response(
-                {
-                    "ok": True,
-                    "data": data["results"],
-                    "pagination": {
-                        "total_count": data["count"],
-                        "page_size": data["page_size"],
-                        "current_page": data["current_page"],
-                        "total_pages": data["total_pages"],
-                    },
-                }
-            )
-
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({"ok": True, "data": serializer.data})
-
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        return Response({"ok": True, "data": serializer.data})
-
-    def update(self, request, *args, **kwargs):
-        partial = kwargs.pop("partial", False)
-        instance = self.get_object()
-        serializer = self.get_serializer(instance, data=request.data, partial=partial)
-        serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
+        try:
+            limit = min(int(request.query_params.get("limit", self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
 
+        hits = search_all(term, kinds, max(limit, 1))
         return Response(
             {
                 "ok": True,
-                "data": serializer.data,
-                "message": "درخواست سرویس با موفقیت بروزرسانی شد",
+                "data": [
+                    {
+                        "type": hit.kind,
+                        "id": hit.object_id,
+                        "title": hit.title,
+                        "state": hit.state,
+                        "city": hit.city,
+                        "score": hit.score,
+                    }
+                    for hit in hits
+                ],
             }
         )
 
-    def destroy(self, request, *args, **kwargs):
-        instance = self.get_object()
-        self.perform_destroy(instance)
-        return Response(
-            {"ok": True, "message": "درخواست سرویس با موفقیت حذف شد"},
-            status=status.HTTP_200_OK,
-        )
+
+# ویوست درخواست سرویس بیمار
+class PatientServiceRequestViewSet(ApiModelViewSet):
+    queryset = patientServicRequest.objects.all().order_by("-created_at")
+    serializer_class = PatientServiceRequestSerializer
+    count_strategy = "cached"
+    select_related_map = USER_SELECT_RELATED
+    query_budget = USER_QUERY_BUDGET
+    resource_name = "درخواست سرویس"
+    catch_create_errors = True
+    messages = {"updated": "درخواست سرویس با موفقیت بروزرسانی شد"}
 
 
-class ServiceCenterViewSet(viewsets.ModelViewSet):
+class ServiceCenterViewSet(ResponseCacheMixin, ConditionalRequestMixin, ApiModelViewSet):
     queryset = ServiceCenter.objects.all().order_by("-created_at")
     serializer_class = ServiceCenterSerializer
-    permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
-    filter_backends = [SearchFilter]
+    filter_backends = [FullTextSearchFilter]
     search_fields = ["name", "serviceCategory", "city", "state"]
+    resource_name = "مرکز خدمات"
+    always_partial = True
 
-    def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        if not serializer.is_valid():
-            return Response(
-                {
-                    "ok": False,
-                    "errors": serializer.errors,
-                    "message": "خطا در اعتبارسنجی داده‌ها",
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
 
-        instance = serializer.save()
-        return Response(
-            {
-                "ok": True,
-                "data": self.get_serializer(instance).data,
-                "message": "مرکز خدمات با موفقیت ثبت شد",
-            },
-            status=status.HTTP_201_CREATED,
-        )
-
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
-
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            result = self.get_paginated_response(serializer.data)
-            data = result.data
-            return Response(
-                {
-                    "ok": True,
-                    "data": data["results"],
-                    "pagination": {
-                        "total_count": data["count"],
-                        "page_size": data["page_size"],
-                        "current_page": data["current_page"],
-                        "total_pages": data["total_pages"],
-                    },
-                }
-            )
-
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({"ok": True, "data": serializer.data})
-
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        return Response({"ok": True, "data": serializer.data})
-
-    def update(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
-        return Response(
-            {
-                "ok": True,
-                "data": serializer.data,
-                "message": "اطلاعات مرکز خدمات با موفقیت بروزرسانی شد",
-            }
-        )
-
-    def destroy(self, request, *args, **kwargs):
-        instance = self.get_object()
-        self.perform_destroy(instance)
-        return Response(
-            {"ok": True, "message": "مرکز خدمات با موفقیت حذف شد"},
-            status=status.HTTP_200_OK,
-        )
-
-
-class MedicalCenterViewSet(viewsets.ModelViewSet):
+class MedicalCenterViewSet(ResponseCacheMixin, ConditionalRequestMixin, ApiModelViewSet):
     queryset = MedicalCenter.objects.all().order_by("-created_at")
     serializer_class = MedicalCenterSerializer
-    permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
-    filter_backends = [SearchFilter]
+    filter_backends = [FullTextSearchFilter]
     search_fields = ["name", "type", "city", "state"]
+    resource_name = "مرکز درمانی"
+    always_partial = True
 
-    def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        if not serializer.is_valid():
-            return Response(
-                {
-                    "ok": False,
-                    "errors": serializer.errors,
-                    "message": "خطا در اعتبارسنجی داده‌ها",
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
 
-        instance = serializer.save()
-        headers = self.get_success_headers(serializer.data)
-        return Response(
-            {
-                "ok": True,
-                "data": self.get_serializer(instance).data,
-                "message": "مرکز درمانی با موفقیت ثبت شد",
-            },
-            status=status.HTTP_201_CREATED,
-            headers=headers,
-        )
-
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
-
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            result = self.get_paginated_response(serializer.data)
-            data = result.data
-            return Response(
-                {
-                    "ok": True,
-                    "data": data["results"],
-                    "pagination": {
-                        "total_count": data["count"],
-                        "page_size": data["page_size"],
-                        "current_page": data["current_page"],
-                        "total_pages": data["total_pages"],
-                    },
-                }
-            )
-
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({"ok": True, "data": serializer.data})
-
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        return Response({"ok": True, "data": serializer.data})
-
-    def update(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
-        return Response(
-            {
-                "ok": True,
-                "data": serializer.data,
-                "message": "اطلاعات مرکز درمانی با موفقیت بروزرسانی شد",
-            }
-        )
-
-    def destroy(self, request, *args, **kwargs):
-        instance = self.get_object()
-        self.perform_destroy(instance)
-        return Response(
-            {"ok": True, "message": "مرکز درمانی با موفقیت حذف شد"},
-            status=status.HTTP_200_OK,
-        )
-
-
-class CharityCenterViewSet(viewsets.ModelViewSet):
+class CharityCenterViewSet(ResponseCacheMixin, ConditionalRequestMixin, ApiModelViewSet):
     queryset = CharityCenter.objects.all().order_by("-created_at")
     serializer_class = CharityCenterSerializer
-    permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
-    filter_backends = [SearchFilter]
+    filter_backends = [FullTextSearchFilter]
     search_fields = ["name", "mainActivityArea", "city", "state"]
+    resource_name = "مرکز نیکوکاری"
+    always_partial = True
 
-    def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        instance = serializer.save()
-        headers = self.get_success_headers(serializer.data)
-        return Response(
-            {
-                "ok": True,
-                "data": self.get_serializer(instance).data,
-                "message": "مرکز نیکوکاری با موفقیت ثبت شد",
-            },
-            status=status.HTTP_201_CREATED,
-            headers=headers,
-        )
-
-    def list(self, request, *args, **kwargs):
-        # ... (منطق لیست مشابه ViewSet های قبلی)
-        queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            result = self.get_paginated_response(serializer.data)
-            data = result.data
-            return Response(
-                {
-                    "ok": True,
-                    "data": data["results"],
-                    "pagination": {
-                        "total_count": data["count"],
-                        "page_size": data["page_size"],
-                        "current_page": data["current_page"],
-                        "total_pages": data["total_pages"],
-                    },
-                }
-            )
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({"ok": True, "data": serializer.data})
-
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        return Response({"ok": True, "data": serializer.data})
-
-    def update(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
-        return Response(
-            {
-                "ok": True,
-                "data": serializer.data,
-                "message": "اطلاعات مرکز نیکوکاری با موفقیت بروزرسانی شد",
-            }
-        )
 
-    def destroy(self, request, *args, **kwargs):
-        instance = self.get_object()
-        self.perform_destroy(instance)
-        return Response(
-            {"ok": True, "message": "مرکز نیکوکاری با موفقیت حذف شد"},
-            status=status.HTTP_200_OK,
-        )
-
-
-class GovernmentOrganizationViewSet(viewsets.ModelViewSet):
+class GovernmentOrganizationViewSet(ResponseCacheMixin, ConditionalRequestMixin, ApiModelViewSet):
     queryset = GovernmentOrganization.objects.all().order_by("-created_at")
     serializer_class = GovernmentOrganizationSerializer
-    permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
-    filter_backends = [SearchFilter]
+    filter_backends = [FullTextSearchFilter]
     search_fields = ["name", "type", "activityArea", "city"]
+    resource_name = "سازمان دولتی"
+    always_partial = True
 
-    def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
-        headers = self.get_success_headers(serializer.data)
-        return Response(
-            {
-                "ok": True,
-                "data": serializer.data,
-                "message": "سازمان دولتی با موفقیت ثبت شد",
-            },
-            status=status.HTTP_201_CREATED,
-            headers=headers,
-        )
-
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            result = self.get_paginated_response(serializer.data)
-            data = result.data
-            return Response(
-                {
-                    "ok": True,
-                    "data": data["results"],
-                    "pagination": {
-                        "total_count": data["count"],
-                        "page_size": data["page_size"],
-                        "current_page": data["current_page"],
-                        "total_pages": data["total_pages"],
-                    },
-                }
-            )
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({"ok": True, "data": serializer.data})
-
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        return Response({"ok": True, "data": serializer.data})
-
-    def update(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
-        return Response(
-            {
-                "ok": True,
-                "data": serializer.data,
-                "message": "اطلاعات سازمان دولتی با موفقیت بروزرسانی شد",
-            }
-        )
 
-    def destroy(self, request, *args, **kwargs):
-        instance = self.get_object()
-        self.perform_destroy(instance)
-        return Response(
-            {"ok": True, "message": "سازمان دولتی با موفقیت حذف شد"},
-            status=status.HTTP_200_OK,
-        )
-
-
-class AssociationViewSet(viewsets.ModelViewSet):
+class AssociationViewSet(ResponseCacheMixin, ConditionalRequestMixin, ApiModelViewSet):
     queryset = Association.objects.all().order_by("-created_at")
     serializer_class = AssociationSerializer
-    permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
-    filter_backends = [SearchFilter]
+    filter_backends = [FullTextSearchFilter]
     search_fields = ["name", "type", "mainActivityArea", "city"]
+    resource_name = "تشکل"
+    always_partial = True
 
-    def create(self, request, *args, **kwargs):
-        # ... (منطق create مشابه ViewSet های قبلی)
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
-        headers = self.get_success_headers(serializer.data)
-        return Response(
-            {"ok": True, "data": serializer.data, "message": "تشکل با موفقیت ثبت شد"},
-            status=status.HTTP_201_CREATED,
-            headers=headers,
-        )
 
-    def list(self, request, *args, **kwargs):
-        # ... (منطق list مشابه ViewSet های قبلی)
-        queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            result = self.get_paginated_response(serializer.data)
-            data = result.data
-            return Response(
-                {
-                    "ok": True,
-                    "data": data["results"],
-                    "pagination": {
-                        "total_count": data["count"],
-                        "page_size": data["page_size"],
-                        "current_page": data["current_page"],
-                        "total_pages": data["total_pages"],
-                    },
-                }
-            )
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({"ok": True, "data": serializer.data})
-
-    def retrieve(self, request, *args, **kwargs):
-        # ... (منطق retrieve مشابه ViewSet های قبلی)
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        return Response({"ok": True, "data": serializer.data})
-
-    def update(self, request, *args, **kwargs):
-        # ... (منطق update مشابه ViewSet های قبلی)
-        instance = self.get_object()
-        serializer = self.get_serializer(instance, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
-        return Response(
-            {
-                "ok": True,
-                "data": serializer.data,
-                "message": "اطلاعات تشکل با موفقیت بروزرسانی شد",
-            }
-        )
-
-    def destroy(self, request, *args, **kwargs):
-        # ... (منطق destroy مشابه ViewSet های قبلی)
-        instance = self.get_object()
-        self.perform_destroy(instance)
-        return Response(
-            {"ok": True, "message": "تشکل با موفقیت حذف شد"}, status=status.HTTP_200_OK
-        )
-
-
-class ConsultationRequestViewSet(viewsets.ModelViewSet):
+class ConsultationRequestViewSet(ConditionalRequestMixin, ApiModelViewSet):
     """
     ViewSet برای مدیریت درخواست‌های مشاوره.
     """
@@ -998,8 +361,8 @@ class ConsultationRequestViewSet(viewsets.ModelViewSet):
         ConsultationRequest.objects.select_related("user").all().order_by("-created_at")
     )
     serializer_class = ConsultationRequestSerializer
-    permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    count_strategy = "cached"
+    conditional_related = ("user",)
     filter_backends = [SearchFilter]
     search_fields = [
         "user__first_name",
@@ -1007,100 +370,7 @@ class ConsultationRequestViewSet(viewsets.ModelViewSet):
         "user__national_code",
         "subject",
     ]
+    resource_name = "درخواست مشاوره"
+    always_partial = True
+    messages = {"updated": "درخواست مشاوره با موفقیت بروزرسانی شد"}
 
-    def get_serializer_context(self):
-        """
-        اطمینان از پاس دادن request به context سریالایزر.
-        """
-        context = super().get_serializer_context()
-        context.update({"request": self.request})
-        return context
-
-    def create(self, request, *args, **kwargs):
-        """
-        ایجاد یک درخواست مشاوره جدید.
-        منطق اصلی پیدا کردن کاربر با کد ملی در سریالایزر انجام می‌شود.
-        """
-        serializer = self.get_serializer(data=request.data)
-        if serializer.is_valid():
-            instance = serializer.save()
-            # سریالایزر برای نمایش پاسخ، شامل اطلاعات کامل کاربر است
-            response_serializer = self.get_serializer(instance)
-            return Response(
-                {
-                    "ok": True,
-                    "data": response_serializer.data,
-                    "message": "درخواست مشاوره با موفقیت ثبت شد",
-                },
-                status=status.HTTP_201_CREATED,
-            )
-        return Response(
-            {"ok": False, "errors": serializer.errors},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
-
-    def list(self, request, *args, **kwargs):
-        """
-        لیست تمام درخواست‌های مشاوره با قابلیت جستجو و صفحه‌بندی.
-        """
-        queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            result = self.get_paginated_response(serializer.data)
-            data = result.data
-            return Response(
-                {
-                    "ok": True,
-                    "data": data["results"],
-                    "pagination": {
-                        "total_count": data["count"],
-                        "page_size": self.pagination_class.page_size,
-                        "current_page": int(request.query_params.get("page", 1)),
-                        "total_pages": (
-                            data["count"] + self.pagination_class.page_size - 1
-                        )
-                        // self.pagination_class.page_size,
-                    },
-                }
-            )
-
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({"ok": True, "data": serializer.data})
-
-    def retrieve(self, request, *args, **kwargs):
-        """
-        دریافت جزئیات یک درخواست مشاوره خاص.
-        """
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        return Response({"ok": True, "data": serializer.data})
-
-    def update(self, request, *args, **kwargs):
-        """
-        بروزرسانی یک درخواست مشاوره (برای مثال تغییر وضعیت توسط ادمین).
-        """
-        instance = self.get_object()
-        # در این سناریو، فقط فیلدهای خاصی مثل status باید قابل آپدیت باشند
-        # این منطق را می‌توان در سریالایزر با read_only_fields مدیریت کرد
-        serializer = self.get_serializer(instance, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
-        return Response(
-            {
-                "ok": True,
-                "data": serializer.data,
-                "message": "درخواست مشاوره با موفقیت بروزرسانی شد",
-            }
-        )
-
-    def destroy(self, request, *args, **kwargs):
-        """
-        حذف یک درخواست مشاوره.
-        """
-        instance = self.get_object()
-        self.perform_destroy(instance)
-        return Response(
-            {"ok": True, "message": "درخواست مشاوره با موفقیت حذف شد"},
-            status=status.HTTP_200_OK,
-        )
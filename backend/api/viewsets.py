@@ -0,0 +1,138 @@
+import logging
+
+from rest_framework import permissions, status, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import exception_handler as drf_exception_handler
+
+from .exports import ExportMixin
+from .fieldsets import SparseQuerysetMixin
+from .log import summarize_payload
+from .pagination import StandardResultsSetPagination
+from .query_plan import QueryPlanMixin
+from .representations import ListRepresentationMixin
+
+logger = logging.getLogger("api.views")
+
+VALIDATION_ERROR_MESSAGE = "خطا در اعتبارسنجی داده‌ها"
+
+
+def log_validation_failure(view, errors):
+    logger.info(
+        "validation failed",
+        extra={"view": type(view).__name__, "action": getattr(view, "action", None), "errors": errors},
+    )
+    # علامت برای MetricsMiddleware؛ فقط خطاهای اعتبارسنجی شمرده می‌شوند نه هر پاسخ 400
+    request = getattr(view, "request", None)
+    if request is not None:
+        getattr(request, "_request", request).api_validation_failed = True
+
+
+def exception_handler(exc, context):
+    """
+    هندلر پیش‌فرض DRF؛ ValidationErrorهای raise شده هم مانند خطاهای بازگردانده
+    شده سریالایزر ثبت می‌شوند.
+    """
+    response = drf_exception_handler(exc, context)
+    if isinstance(exc, ValidationError) and context.get("view") is not None:
+        log_validation_failure(context["view"], exc.detail)
+    return response
+
+
+class ApiModelViewSet(
+    ExportMixin,
+    ListRepresentationMixin,
+    SparseQuerysetMixin,
+    QueryPlanMixin,
+    viewsets.ModelViewSet,
+):
+    """
+    پایه مشترک ViewSetهای API با پاسخ {"ok", "data", "message", "pagination"}.
+
+    پیام‌ها از resource_name ساخته می‌شوند و با messages قابل تغییرند. بهینه‌سازی‌های
+    لیست (values()، فیلدهای انتخابی، برنامه کوئری و خروجی فایل) از mixinها می‌آیند و
+    همه منابع از یک مسیر پاسخ استفاده می‌کنند.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = StandardResultsSetPagination
+
+    # نام فارسی منبع برای پیام‌ها، مثلا "بیمار"
+    resource_name = None
+    messages = {}
+    # PUT هم مانند PATCH فقط فیلدهای ارسال شده را تغییر می‌دهد
+    always_partial = False
+    # خطاهای ذخیره در create به جای 500 با پیام 400 برگردانده می‌شوند
+    catch_create_errors = False
+
+    def get_message(self, key):
+        if key in self.messages:
+            return self.messages[key]
+        name = self.resource_name
+        return {
+            "created": f"{name} با موفقیت ثبت شد",
+            "updated": f"اطلاعات {name} با موفقیت بروزرسانی شد",
+            "deleted": f"{name} با موفقیت حذف شد",
+            "create_failed": f"خطا در ثبت {name}",
+        }[key]
+
+    def invalid(self, serializer):
+        log_validation_failure(self, serializer.errors)
+        return Response(
+            {"ok": False, "errors": serializer.errors, "message": VALIDATION_ERROR_MESSAGE},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    def create(self, request, *args, **kwargs):
+        # فقط نام فیلدها و فایل‌ها؛ مقادیر (کد ملی، شماره کارت و ...) ثبت نمی‌شوند
+        logger.debug(
+            "create", extra={"view": type(self).__name__, "payload": summarize_payload(request.data)}
+        )
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return self.invalid(serializer)
+
+        try:
+            self.perform_create(serializer)
+        except Exception as e:
+            if not self.catch_create_errors:
+                raise
+            logger.exception("create failed", extra={"view": type(self).__name__})
+            return Response(
+                {"ok": False, "message": f"{self.get_message('create_failed')}: {str(e)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(
+            {"ok": True, "data": serializer.data, "message": self.get_message("created")},
+            status=status.HTTP_201_CREATED,
+            headers=self.get_success_headers(serializer.data),
+        )
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response({"ok": True, "data": self.get_serializer(queryset, many=True).data})
+
+        data = self.get_serializer(page, many=True).data
+        return Response(
+            {"ok": True, "data": data, "pagination": self.paginator.get_pagination_meta()}
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return Response({"ok": True, "data": self.get_serializer(instance).data})
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop("partial", False) or self.always_partial
+        instance = self.get_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        if not serializer.is_valid():
+            return self.invalid(serializer)
+        self.perform_update(serializer)
+        return Response({"ok": True, "data": serializer.data, "message": self.get_message("updated")})
+
+    def destroy(self, request, *args, **kwargs):
+        instance = self.get_object()
+        self.perform_destroy(instance)
+        return Response({"ok": True, "message": self.get_message("deleted")})
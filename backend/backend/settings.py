@@ -10,9 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
+import django
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -46,10 +50,140 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # orjson when installed, otherwise stdlib json without ASCII escaping
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # DRF's handler, also recording raised ValidationErrors as validation failures
+    'EXCEPTION_HANDLER': 'api.viewsets.exception_handler',
+    # Per-IP limits for unauthenticated endpoints that take a secret (ScopedRateThrottle)
+    'DEFAULT_THROTTLE_RATES': {
+        'account_activation': os.environ.get('API_ACTIVATION_RATE', '10/hour'),
+    },
 }
 
 AUTH_USER_MODEL = 'api.customUser'
 
+# Log viewset actions that run more queries than their declared budget
+QUERY_BUDGET_ENFORCE = DEBUG
+
+# Accounts auto-created by registration get an unusable password until they are
+# activated; set to 'immediate' to hash the national code as the initial password
+API_ACCOUNT_PROVISIONING = 'deferred'
+
+# Per-request wall/DB time and query counts, aggregated per route name and
+# exposed to admins at /api/profiling/
+API_PROFILING = {
+    'ENABLED': True,
+    'HEADER': DEBUG,
+    'WINDOW': 500,
+    'SLOW_MS': 500,
+    'MAX_QUERIES': 20,
+}
+
+# Prometheus exposition at /api/metrics. With several gunicorn workers point
+# this at a shared directory so every worker's samples are aggregated.
+API_METRICS_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+# Scrapers must send it as X-Metrics-Token (or ?token=); unset, the endpoint is disabled
+API_METRICS_TOKEN = os.environ.get('API_METRICS_TOKEN')
+
+# Cache for directory list/retrieve responses. API_RESPONSE_CACHE_URL picks the
+# backend: redis://host:6379/1 or file:///var/tmp/sbuk-cache (shared by all
+# workers). Without it response caching is off: an in-process cache cannot see
+# the invalidations made by other workers.
+API_RESPONSE_CACHE_URL = os.environ.get('API_RESPONSE_CACHE_URL', '')
+if API_RESPONSE_CACHE_URL.startswith(('redis://', 'rediss://')):
+    _response_cache = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': API_RESPONSE_CACHE_URL,
+    }
+elif API_RESPONSE_CACHE_URL.startswith('file://'):
+    _response_cache = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': API_RESPONSE_CACHE_URL[len('file://'):],
+    }
+else:
+    _response_cache = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'api-responses': _response_cache,
+}
+API_RESPONSE_CACHE_ALIAS = 'api-responses'
+API_RESPONSE_CACHE_TIMEOUT = 300
+
+# national code -> user + role ids. A short-lived per-process LRU in front of the
+# shared response cache backend (skipped when that backend is not shared);
+# entries are dropped on user/role saves.
+API_IDENTITY_CACHE = {
+    'alias': 'api-responses',
+    'timeout': 300,
+    'local_size': 1024,
+    'local_ttl': 5,
+}
+
+# Background jobs (`manage.py run_jobs`). Failed jobs are retried after
+# retry_delay seconds, doubling each attempt; running jobs whose worker died
+# are picked up again after lock_timeout seconds.
+API_JOBS = {
+    'max_attempts': 3,
+    'retry_delay': 30,
+    'lock_timeout': 600,
+    'poll_interval': 1.0,
+}
+
+# Uploaded files are validated, re-encoded without metadata, thumbnailed and
+# checksummed by the job worker; re-encoding and thumbnails need Pillow. Rejected
+# files are moved to quarantine_dir and cleared from their record.
+API_UPLOADS = {
+    'max_bytes': 10 * 1024 * 1024,
+    'thumbnail_size': 256,
+    'thumbnail_dir': 'thumbnails/',
+    'quarantine_dir': 'quarantine/',
+    'jpeg_quality': 85,
+}
+
+# JSON log lines written from a background thread; national codes, card and
+# phone numbers are redacted. INFO and below are sampled at API_LOG_SAMPLE_RATE.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'api.log.JsonFormatter'},
+    },
+    'filters': {
+        'sampling': {
+            '()': 'api.log.SamplingFilter',
+            'rate': float(os.environ.get('API_LOG_SAMPLE_RATE', '1.0')),
+        },
+    },
+    'handlers': {
+        'async': {
+            'class': 'api.log.AsyncQueueHandler',
+            'formatter': 'json',
+            'filters': ['sampling'],
+        },
+    },
+    'loggers': {
+        'api': {
+            'handlers': ['async'],
+            'level': os.environ.get('API_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        'django.request': {
+            'handlers': ['async'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -67,6 +201,9 @@ SIMPLE_JWT = {
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
+    'api.middleware.RequestProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -99,11 +236,71 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=postgres selects the production profile; anything else keeps SQLite.
+# Connections are reused for DB_CONN_MAX_AGE seconds and health-checked before
+# reuse. DB_POOL=1 uses psycopg's built-in pool instead (Django 5.1+ only; older
+# versions refuse to start rather than silently ignore it).
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'backend'),
+            'USER': os.environ.get('DB_USER', 'backend'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get('DB_POOL') == '1':
+        if django.VERSION < (5, 1):
+            raise ImproperlyConfigured(
+                'DB_POOL=1 needs Django 5.1+ (psycopg pool support); unset it to '
+                'use persistent connections (DB_CONN_MAX_AGE) instead.'
+            )
+        # pooled connections are returned to the pool instead of being kept open
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '20')),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+
+# Read replicas: DB_REPLICAS is a comma separated list of replica hosts (Postgres)
+# or database files (SQLite, kept in sync with `manage.py sync_sqlite_replicas`).
+# Safe-method requests read from a random replica; a client that just wrote is
+# pinned to the primary for API_REPLICA_PIN_SECONDS, by cookie and, when the
+# response cache backend is shared, by the user id of its JWT.
+DB_REPLICAS = [name for name in os.environ.get('DB_REPLICAS', '').split(',') if name]
+for _index, _replica in enumerate(DB_REPLICAS, 1):
+    DATABASES[f'replica{_index}'] = {
+        **DATABASES['default'],
+        'HOST' if DB_ENGINE == 'postgres' else 'NAME': _replica,
+        'OPTIONS': dict(DATABASES['default'].get('OPTIONS', {})),
+        'TEST': {'MIRROR': 'default'},
     }
+if DB_REPLICAS:
+    DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+API_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', '5'))
+
+# Applied to every new SQLite connection (api.signals.configure_sqlite_connection).
+API_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
 }
 
 